@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
 from typing import Annotated
 from backend.dependencies import get_openai_service
 from backend.services.openai_service import OpenAIService
@@ -10,7 +11,11 @@ async def chat(
   model: str,
   user_message: str,
   system_prompt: Annotated[str | None, Query()] = None,
+  stream: Annotated[bool, Query()] = False,
   openai_service: OpenAIService = Depends(get_openai_service)
 ):
+  """With `stream=true` the completion is sent as plain text chunks as they arrive."""
   prompt = system_prompt if system_prompt else "You are a helpful assistant"
-  return await openai_service.chat(user_message, model, system_prompt if system_prompt else "You are a helpful assistant")
\ No newline at end of file
+  if stream:
+    return StreamingResponse(openai_service.chat_stream(user_message, model, prompt), media_type="text/plain")
+  return await openai_service.chat(user_message, model, prompt)
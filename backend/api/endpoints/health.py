@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import JSONResponse
+import logging
+
+from backend.core.clients import redis_pool_stats, reddit_pool_stats
+from backend.dependencies import get_redis
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/health", tags=["Health"])
+
+@router.get("/")
+async def health(
+  request: Request,
+  redis_client = Depends(get_redis)
+):
+  redis_ok = True
+  try:
+    await redis_client.ping()
+  except Exception as e:
+    logger.error(f"Redis health check failed: {e}")
+    redis_ok = False
+
+  body = {
+    "status": "ok" if redis_ok else "degraded",
+    "redis": {"ok": redis_ok, "pool": redis_pool_stats(redis_client)},
+    "reddit": {"pool": reddit_pool_stats(request.app.state.reddit)}
+  }
+  return JSONResponse(body, status_code=200 if redis_ok else 503)
\ No newline at end of file
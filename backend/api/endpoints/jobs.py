@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends, HTTPException
+
+from backend.models.job import JobStatus, JobSubmitted
+from backend.models.product_search_request import ProductSearchRequest
+from backend.dependencies import get_job_queue
+from backend.services.job_queue import JobQueue
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+@router.post("/", response_model=JobSubmitted, status_code=202)
+async def submit_search_job(
+  search_request: ProductSearchRequest,
+  job_queue: JobQueue = Depends(get_job_queue)
+):
+  job_id = await job_queue.submit(search_request)
+  return JobSubmitted(job_id=job_id)
+
+@router.get("/{job_id}", response_model=JobStatus)
+async def search_job_status(
+  job_id: str,
+  job_queue: JobQueue = Depends(get_job_queue)
+):
+  job = await job_queue.get(job_id)
+  if job is None:
+    raise HTTPException(status_code=404, detail="Job not found")
+  return job
\ No newline at end of file
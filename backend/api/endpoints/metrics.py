@@ -0,0 +1,9 @@
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+router = APIRouter(tags=["Metrics"])
+
+@router.get("/metrics")
+async def metrics():
+  # Prometheus text format; each worker process exposes its own series
+  return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
\ No newline at end of file
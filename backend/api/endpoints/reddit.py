@@ -30,4 +30,4 @@ async def submission_comments(
   reddit_service: RedditService = Depends(get_reddit_service)
 ):
   comments = await reddit_service.submission_comments(submission_id)
-  return comments
\ No newline at end of file
+  return comments.tree()
\ No newline at end of file
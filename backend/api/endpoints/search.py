@@ -1,106 +1,375 @@
-from fastapi import APIRouter, Depends, HTTPException
-from transformers import pipeline
-from typing import Dict, List, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from typing import TYPE_CHECKING, Callable, Dict, List, Sequence, Tuple
+import asyncio
+import functools
+from contextlib import aclosing
 import logging
 
 from backend.models.product_search_request import ProductSearchRequest
+from backend.models.comment_store import CommentRef, CommentStore, CommentView
+from backend.models.submission import SubmissionBase
 from backend.models.product import Product, ProductList, ProductWithScore
-from backend.dependencies import get_reddit_service, get_openai_service
+from backend.models.search_event import SearchEvent
+from backend.models.batch_search import BatchSearchItem, BatchSearchRequest, BatchSearchResponse
+from backend.core.config import Config
+from backend.core.logger import truncate
+from backend.core.metrics import observe_batch, use_request_timings
+from backend.dependencies import get_reddit_service, get_openai_service, get_model_registry, get_search_cache, get_corpus, get_sentiment_cache
 from backend.services.reddit_service import RedditService
 from backend.services.openai_service import OpenAIService
+from backend.services.model_registry import ModelRegistry
+from backend.services.inference_client import RemotePipeline
+from backend.services.ner_filter import ner_pipeline_for
+from backend.services.sentiment_cache import SentimentCache
+from backend.services.search_cache import search_request_key
+from backend.services.product_matcher import normalize_phrase
+from backend.utils.timing import StageTimings
+
+if TYPE_CHECKING:
+  from backend.services.corpus_service import CorpusService
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/search", tags=["Search"])
 
 class SearchController:
-  def __init__(self, reddit_service: RedditService, openai_service: OpenAIService):
+  def __init__(self, reddit_service: RedditService, openai_service: OpenAIService, model_registry: ModelRegistry,
+               corpus: "CorpusService | None" = None, sentiment_cache: SentimentCache | None = None):
     self.reddit_service = reddit_service
     self.openai_service = openai_service
-    # pipelines
-    self._ner_pipeline = None
-    self._sentiment_pipeline = None
+    # when set, comments are served from (and saved to) the local corpus
+    self.corpus = corpus
+    # when set, sentiment inference only runs for comment bodies not scored before
+    self.sentiment_cache = sentiment_cache
+    # pipelines are shared across requests through the registry
+    self.model_registry = model_registry
 
   @property
   def ner_pipeline(self):
-    if not self._ner_pipeline:
-      self._ner_pipeline = pipeline("ner", grouped_entities=True, device=0)
-    return self._ner_pipeline
+    return ner_pipeline_for(self.model_registry)
   
   @property
   def sentiment_pipeline(self):
-    if not self._sentiment_pipeline:
-      self._sentiment_pipeline = pipeline(
-        task="sentiment-analysis",
-        model="distilbert-base-uncased-finetuned-sst-2-english"
-      )
-    return self._sentiment_pipeline
+    return self.model_registry.get("sentiment")
   
-  async def execute_search(self, search_request: ProductSearchRequest) -> ProductList:
+  async def execute_search(self, search_request: ProductSearchRequest,
+                           on_event: Callable[[SearchEvent], None] | None = None,
+                           on_progress: Callable[[str], None] | None = None) -> ProductList:
+    """
+    Runs the search as a graph of stages:
+
+      subject_phrases ----------------------------------------.
+      fetch --> per submission: ner --> extraction ------------+--> ranking
+                                    `--> sentiment ----------'
+
+    Subject phrases only need the category, so they start immediately. Each
+    submission's comments are filtered, extracted and scored while later
+    submissions are still loading. If `on_event` is given it receives progress
+    events and a provisional ranking after every processed submission;
+    `on_progress` only gets the progress messages, so no provisional rankings
+    are computed for it.
+    """
     logger.info(f"Received search request: {search_request}")
+    timings = use_request_timings()
+    category = search_request.product_category
 
-    # Fetch and filter comments.
-    top_comments = await self.reddit_service.fetch_top_submission_comments(search_request)
-    logger.info(f"Fetched {len(top_comments)} top comments")
-    filtered_comments = await self.reddit_service.filter_comments(top_comments, self.ner_pipeline)
-    logger.info(f"Filtered comments: {len(filtered_comments)}")
+    filtered_comments: List[CommentRef] = []
+    comment_scores: List[float] = []
+    extracted_products: List[Product] = []
+
+    def emit(event: SearchEvent):
+      if on_event is not None:
+        on_event(event)
+      if on_progress is not None and event.event == "progress" and event.message:
+        on_progress(event.message)
 
-    # Extract products from comments.
-    products_list = await self.reddit_service.find_products_from_comments(filtered_comments, search_request.product_category)
-    logger.info(f"Found products: {products_list}")
+    def subject_phrases_so_far():
+      if subject_task.done() and not subject_task.cancelled() and subject_task.exception() is None:
+        return subject_task.result()
+      return None
 
-    # Retrieve subject phrases via OpenAI.
-    subject_phrases = await self.openai_service.find_subject_phrases(search_request.product_category)
-    logger.info(f"Subject phrases: {subject_phrases}")
+    async def process_and_report(comments: CommentStore):
+      submission_comments, scores, products = await self.process_submission(comments, timings, extract=cached_products is None)
+      filtered_comments.extend(submission_comments)
+      comment_scores.extend(scores)
+      extracted_products.extend(products)
+      emit(SearchEvent(event="progress", message=f"Processed {len(comments)} comments, kept {len(submission_comments)}"))
+      if on_event is not None:
+        provisional_products = cached_products if cached_products is not None else self.reddit_service.dedupe_products(extracted_products)
+        emit(SearchEvent(event="ranking", data=self.rank_products(
+          filtered_comments, comment_scores, provisional_products, subject_phrases_so_far(), category
+        )))
 
-    # Clean products list against subject phrases.
-    cleaned_products = self.clean_products(products_list, subject_phrases, search_request.product_category)
-    logger.info(f"Cleaned products list: {cleaned_products}")
+    subject_task = asyncio.create_task(timings.run("subject_phrases", self.openai_service.find_subject_phrases(category)))
+    submission_tasks = []
+    try:
+      await self.reddit_service.refresh_catalogue()
+      cached_products = await timings.run("products_cache", self.reddit_service.cached_products(category))
 
-    # 5. Perform sentiment analysis.
-    product_sentiments = self.analyze_sentiments(filtered_comments, cleaned_products)
-    # 6. Compute average sentiments.
+      async with timings.span("fetch"):
+        corpus_loaders = {
+          "list_submissions": functools.partial(self.corpus.list_submissions, self.reddit_service),
+          "load_comments": functools.partial(self.corpus.sync_submissions, self.reddit_service)
+        } if self.corpus else {}
+        async for comments in self.reddit_service.iter_submission_comments(
+          search_request, **corpus_loaders,
+          on_progress=lambda message: emit(SearchEvent(event="progress", message=message))
+        ):
+          emit(SearchEvent(event="progress", message=f"Fetched a submission with {len(comments)} comments"))
+          submission_tasks.append(asyncio.create_task(process_and_report(comments)))
+      await asyncio.gather(*submission_tasks)
+      subject_phrases = await subject_task
+    except BaseException:
+      for task in [subject_task, *submission_tasks]:
+        task.cancel()
+      raise
+    logger.info(f"Filtered comments: {len(filtered_comments)}")
+
+    if cached_products is None:
+      products_list = self.reddit_service.dedupe_products(extracted_products)
+      await timings.run("products_cache", self.reddit_service.cache_products(category, products_list))
+      if self.corpus:
+        await timings.run("corpus", self.corpus.save_products(category, products_list))
+    else:
+      products_list = cached_products
+    logger.info(f"Found {len(products_list)} products: {truncate(products_list)}")
+    logger.info(f"Subject phrases: {truncate(subject_phrases)}")
+
+    async with timings.span("ranking"):
+      result = self.rank_products(filtered_comments, comment_scores, products_list, subject_phrases, category)
+    logger.info(f"Stage timings: {timings.summary()}")
+    logger.info(f"Returning {len(result.products)} ranked products: {truncate(result.products)}")
+    return result
+
+  def rank_products(self, comments: Sequence[CommentRef], comment_scores: List[float], products: List[Product],
+                    subject_phrases, category: str) -> ProductList:
+    # Clean products list against subject phrases (skipped while they're still loading).
+    cleaned_products = self.clean_products(products, subject_phrases, category) if subject_phrases else products
+    # Match pre-computed comment sentiment to products.
+    product_sentiments = self.analyze_sentiments(comments, cleaned_products, comment_scores)
+    # Compute average sentiments.
     product_avg_sentiment = self.compute_average_sentiments(product_sentiments)
-    # 7. Rank products.
+    # Rank products.
     ranked_products = sorted(product_avg_sentiment.items(), key=lambda item: item[1], reverse=True)
-    logger.info(f"Ranked Products: {ranked_products}")
 
     # Package result.
-    product_list_with_scores = [
+    return ProductList(products=[
         ProductWithScore(product=Product(brand_name=brand, product_name=product), score=score)
         for (brand, product), score in ranked_products
+    ])
+
+  async def execute_batch(self, search_requests: List[ProductSearchRequest]) -> List[BatchSearchItem]:
+    """
+    Run many searches together. Submissions that several categories share are
+    fetched once, every comment body goes through NER and sentiment in a single
+    batch, and extraction prompts are packed across categories. A failure in one
+    category is reported on its item without failing the others. Equivalent
+    requests (same search_request_key) are answered by one item.
+    """
+    timings = use_request_timings()
+    unique_requests: Dict[str, ProductSearchRequest] = {}
+    for request in search_requests:
+      unique_requests.setdefault(search_request_key(request), request)
+    categories = list(dict.fromkeys(request.product_category for request in unique_requests.values()))
+    errors: Dict[str, str] = {}
+    logger.info(f"Received batch search for {len(categories)} categories")
+
+    subject_tasks = {
+      category: asyncio.create_task(timings.run("subject_phrases", self.openai_service.find_subject_phrases(category)))
+      for category in categories
+    }
+    try:
+      await self.reddit_service.refresh_catalogue()
+      cached_products = dict(zip(categories, await timings.run("products_cache", asyncio.gather(
+        *[self.reddit_service.cached_products(category) for category in categories]
+      ))))
+
+      # List submissions for every (subreddit, category) pair, then fetch each distinct submission once.
+      pairs = [(subreddit, category) for category in categories for subreddit in Config.SEARCH_SUBREDDITS]
+      async with timings.span("fetch"):
+        listings = await asyncio.gather(*[
+          self.corpus.list_submissions(self.reddit_service, subreddit, category) if self.corpus else
+          self.reddit_service.scheduler.run(self.reddit_service.search_submissions, subreddit, category)
+          for subreddit, category in pairs
+        ], return_exceptions=True)
+        # a category fails only if none of its subreddits could be searched
+        failed_listings: Dict[str, List[str]] = {}
+        for (subreddit, category), listing in zip(pairs, listings):
+          if isinstance(listing, BaseException):
+            failed_listings.setdefault(category, []).append(f"r/{subreddit}: {listing}")
+        for category, failures in failed_listings.items():
+          if len(failures) == len(Config.SEARCH_SUBREDDITS):
+            errors[category] = f"Error fetching submissions: {'; '.join(failures)}"
+          else:
+            logger.warning(f"Some submission searches for '{category}' failed, continuing without them: {'; '.join(failures)}")
+
+        submissions: Dict[str, Tuple[str, str, SubmissionBase]] = {}
+        submission_categories: Dict[str, set] = {}
+        for (subreddit, category), listing in zip(pairs, listings):
+          if isinstance(listing, BaseException):
+            continue
+          for submission in listing:
+            submissions.setdefault(submission.id, (subreddit, category, submission))
+            submission_categories.setdefault(submission.id, set()).add(category)
+        logger.info(f"Fetching {len(submissions)} distinct submissions for {len(pairs)} subreddit searches")
+
+        async def load_from_corpus(subreddit: str, subreddit_submissions: List[SubmissionBase]) -> Dict[str, CommentStore]:
+          async with aclosing(self.corpus.sync_submissions(self.reddit_service, subreddit, subreddit_submissions)) as loaded:
+            return {submission.id: comments async for submission, comments in loaded}
+
+        if self.corpus:
+          by_subreddit: Dict[str, List[SubmissionBase]] = {}
+          for subreddit, _, submission in submissions.values():
+            by_subreddit.setdefault(subreddit, []).append(submission)
+          loaded: Dict[str, CommentStore] = {}
+          for found in await asyncio.gather(*[load_from_corpus(*entry) for entry in by_subreddit.items()]):
+            loaded.update(found)
+          stores = [loaded[submission_id] for submission_id in submissions]
+        else:
+          stores = await asyncio.gather(*[
+            self.reddit_service.scheduler.run(self.reddit_service.submission_comments, submission.id)
+            for _, _, submission in submissions.values()
+          ])
+
+      all_comments = CommentStore()
+      comment_submission: Dict[str, str] = {}
+      for submission_id, store in zip(submissions, stores):
+        for comment_id in store:
+          comment_submission.setdefault(comment_id, submission_id)
+        all_comments.merge(store)
+
+      # One NER pass and one sentiment pass over every comment in the batch.
+      filtered_store = await timings.run("ner", self.reddit_service.filter_comments(all_comments, self.ner_pipeline))
+      filtered_comments = filtered_store.sorted_by_score()
+      scores = await timings.run("sentiment", self.score_comments(filtered_comments)) if filtered_comments else []
+      comment_scores = {comment.id: score for comment, score in zip(filtered_comments, scores)}
+
+      comments_by_category: Dict[str, List[CommentRef]] = {category: [] for category in categories}
+      for comment in filtered_comments:
+        for category in submission_categories[comment_submission[comment.id]]:
+          comments_by_category[category].append(comment)
+
+      # Extraction isn't category-specific, so pack every uncached category's comments into shared prompts.
+      to_extract = {category for category in categories if cached_products[category] is None}
+      extraction_comments = [
+        comment for comment in filtered_comments
+        if to_extract & submission_categories[comment_submission[comment.id]]
+      ]
+      extracted = self.reddit_service.dedupe_products(
+        await timings.run("extraction", self.reddit_service.extract_products(extraction_comments))
+      ) if extraction_comments else []
+      extracted_matcher = self.reddit_service.product_matcher(extracted)
+
+      subject_results = dict(zip(categories, await asyncio.gather(*subject_tasks.values(), return_exceptions=True)))
+    except BaseException:
+      for task in subject_tasks.values():
+        task.cancel()
+      raise
+
+    items: Dict[str, BatchSearchItem] = {}
+    # products extracted for each category, written to the caches once ranking is done
+    extracted_by_category: Dict[str, List[Product]] = {}
+    async with timings.span("ranking"):
+      for category in categories:
+        subject_phrases = subject_results[category]
+        if category in errors or isinstance(subject_phrases, BaseException):
+          items[category] = BatchSearchItem(product_category=category, error=errors.get(category) or f"Error fetching subject phrases: {subject_phrases}")
+          continue
+        category_comments = comments_by_category[category]
+        products = cached_products[category]
+        if products is None:
+          # attribute the shared extraction results to the categories whose comments mention them
+          mentioned = set()
+          for comment in category_comments:
+            mentioned |= extracted_matcher.match(comment.body)
+          products = [extracted[i] for i in sorted(mentioned)]
+          extracted_by_category[category] = products
+        try:
+          result = self.rank_products(
+            category_comments, [comment_scores[comment.id] for comment in category_comments], products, subject_phrases, category
+          )
+          items[category] = BatchSearchItem(product_category=category, result=result)
+        except Exception as e:
+          logger.exception(f"Error ranking products for {category}")
+          items[category] = BatchSearchItem(product_category=category, error=f"Internal Server Error: {e}")
+
+    writes = [self.reddit_service.cache_products(category, products) for category, products in extracted_by_category.items()]
+    if self.corpus:
+      writes += [self.corpus.save_products(category, products) for category, products in extracted_by_category.items()]
+    for write in await timings.run("products_cache", asyncio.gather(*writes, return_exceptions=True)):
+      if isinstance(write, BaseException):
+        logger.error(f"Error saving extracted products: {write}")
+    logger.info(f"Batch stage timings: {timings.summary()}")
+
+    by_key = {key: items[request.product_category] for key, request in unique_requests.items()}
+    return [by_key[search_request_key(request)] for request in search_requests]
+
+  async def process_submission(self, comments: CommentStore, timings: StageTimings, extract: bool = True) -> Tuple[CommentView, List[float], List[Product]]:
+    """Filter one submission's comments, then extract products and score sentiment concurrently."""
+    filtered_store = await timings.run("ner", self.reddit_service.filter_comments(comments, self.ner_pipeline))
+    # downstream stages see each comment exactly once, highest score first
+    filtered_comments = filtered_store.sorted_by_score()
+    if not filtered_comments:
+      return filtered_comments, [], []
+
+    scores_coro = timings.run("sentiment", self.score_comments(filtered_comments))
+    if extract:
+      scores, products = await asyncio.gather(
+        scores_coro, timings.run("extraction", self.reddit_service.extract_products(filtered_comments))
+      )
+    else:
+      scores, products = await scores_coro, []
+    return filtered_comments, scores, products
+
+  async def score_comments(self, comments: Sequence[CommentRef]) -> List[float]:
+    """Signed sentiment per comment (positive > 0), computed off the event loop."""
+    async def infer(bodies: List[str]) -> List[float]:
+      observe_batch("sentiment", len(bodies))
+      sentiment_pipeline = self.sentiment_pipeline
+      if isinstance(sentiment_pipeline, RemotePipeline):
+        sentiment_results = await sentiment_pipeline.infer(bodies)
+      else:
+        sentiment_results = await asyncio.to_thread(sentiment_pipeline, bodies, truncation=True, max_length=512)
+      return self.signed_scores(sentiment_results)
+
+    bodies = [comment.body for comment in comments]
+    if self.sentiment_cache is None:
+      return await infer(bodies)
+    return await self.sentiment_cache.score(bodies, infer)
+
+  @staticmethod
+  def signed_scores(sentiment_results) -> List[float]:
+    return [
+      result['score'] if result['label'] == 'POSITIVE' else -result['score']
+      for result in sentiment_results
     ]
-    logger.info(f"Returning ProductList: {product_list_with_scores}")
-    return ProductList(products=product_list_with_scores)
   
   def clean_products(self, products_list: List[Product], subject_phrases, category: str) -> List[Product]:
+    # normalized once into a set, so each product is two hash lookups however long the exclusion list is
+    excluded = {normalize_phrase(word) for word in subject_phrases.excluded_words}
+    excluded.discard("")
+    category = normalize_phrase(category)
     cleaned = []
     for product in products_list:
-      if (product.brand_name in subject_phrases.excluded_words or 
-        product.product_name in subject_phrases.excluded_words):
-        continue
-      if product.product_name.lower() == category.lower():
+      product_name = normalize_phrase(product.product_name)
+      if product_name in excluded or product_name == category or normalize_phrase(product.brand_name) in excluded:
         continue
       cleaned.append(product)
     return cleaned
   
-  def analyze_sentiments(self, comments, products: List[Product]) -> Dict[Tuple[str, str], List[float]]:
-    sentiment_results = self.sentiment_pipeline(
-        [comment.body for comment in comments], truncation=True, max_length=512
-    )
-    logger.info(f"Sentiment results count: {len(sentiment_results)}")
+  def analyze_sentiments(self, comments, products: List[Product], comment_scores: List[float]) -> Dict[Tuple[str, str], List[float]]:
+    """Scores of the comments mentioning each product; `comment_scores` comes from score_comments, in comment order."""
     product_sentiments: Dict[Tuple[str, str], List[float]] = {
         (product.brand_name, product.product_name): [] for product in products
     }
 
+    # one pass per comment over a token index, instead of comments x products substring scans;
+    # catalogued aliases count as mentions of their product
+    matcher = self.reddit_service.product_matcher(products)
     for i, comment in enumerate(comments):
-      for product in products:
-        if (product.brand_name.lower() in comment.body.lower() or 
-          product.product_name.lower() in comment.body.lower()):
-          sentiment = sentiment_results[i]['label']
-          score = sentiment_results[i]['score']
-          sentiment_score = score if sentiment == 'POSITIVE' else -score
-          product_sentiments[(product.brand_name, product.product_name)].append(sentiment_score)
+      for product in matcher.match_products(comment.body):
+        product_sentiments[(product.brand_name, product.product_name)].append(comment_scores[i])
     return product_sentiments
   
   def compute_average_sentiments(self, sentiments: Dict[Tuple[str, str], List[float]]) -> Dict[Tuple[str, str], float]:
@@ -113,12 +382,102 @@ class SearchController:
 async def search(
   search_request: ProductSearchRequest,
   reddit_service = Depends(get_reddit_service),
-  openai_service = Depends(get_openai_service)
+  openai_service = Depends(get_openai_service),
+  model_registry = Depends(get_model_registry),
+  search_cache = Depends(get_search_cache),
+  corpus = Depends(get_corpus),
+  sentiment_cache = Depends(get_sentiment_cache)
 ):
-  controller = SearchController(reddit_service, openai_service)
+  controller = SearchController(reddit_service, openai_service, model_registry, corpus, sentiment_cache)
   try:
-    result = await controller.execute_search(search_request)
+    result = await search_cache.get_or_compute(search_request, lambda: controller.execute_search(search_request))
     return result
   except Exception as e:
     logger.exception("Error during search execution")
-    raise HTTPException(status_code=500, detail=f"Internal Server Error: {e}")
\ No newline at end of file
+    raise HTTPException(status_code=500, detail=f"Internal Server Error: {e}")
+
+async def wait_for_disconnect(request: Request, interval: float = 0.5):
+  while not await request.is_disconnected():
+    await asyncio.sleep(interval)
+
+@router.post("/stream")
+async def search_stream(
+  request: Request,
+  search_request: ProductSearchRequest,
+  reddit_service = Depends(get_reddit_service),
+  openai_service = Depends(get_openai_service),
+  model_registry = Depends(get_model_registry),
+  search_cache = Depends(get_search_cache),
+  corpus = Depends(get_corpus),
+  sentiment_cache = Depends(get_sentiment_cache)
+):
+  """
+  Streams the search as NDJSON SearchEvent lines: progress events, provisional
+  rankings as submissions are scored, then a final "result" (or "error") event.
+  """
+  controller = SearchController(reddit_service, openai_service, model_registry, corpus, sentiment_cache)
+
+  async def events():
+    # shared with identical searches (streamed or not), and cached when it completes
+    stream = search_cache.stream(search_request, lambda on_event: controller.execute_search(search_request, on_event=on_event))
+    # watched alongside the search, so a client that leaves during a long stage is noticed straight away
+    disconnected = asyncio.create_task(wait_for_disconnect(request))
+    next_event = None
+    try:
+      while True:
+        next_event = asyncio.ensure_future(anext(stream, None))
+        await asyncio.wait({next_event, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+        if not next_event.done():
+          logger.info("Client disconnected, leaving the streamed search")
+          return
+        event = next_event.result()
+        if event is None:
+          return
+        yield event.model_dump_json() + "\n"
+    except Exception as e:
+      logger.exception("Error during streamed search execution")
+      yield SearchEvent(event="error", message=f"Internal Server Error: {e}").model_dump_json() + "\n"
+    finally:
+      # also reached when the response itself is cancelled; the search is cancelled once no client waits on it
+      disconnected.cancel()
+      if next_event is not None and not next_event.done():
+        next_event.cancel()
+        await asyncio.gather(next_event, return_exceptions=True)
+      await stream.aclose()
+
+  return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@router.post("/batch", response_model=BatchSearchResponse)
+async def search_batch(
+  batch_request: BatchSearchRequest,
+  reddit_service = Depends(get_reddit_service),
+  openai_service = Depends(get_openai_service),
+  model_registry = Depends(get_model_registry),
+  search_cache = Depends(get_search_cache),
+  corpus = Depends(get_corpus),
+  sentiment_cache = Depends(get_sentiment_cache)
+):
+  if len(batch_request.requests) > Config.BATCH_SEARCH_MAX_REQUESTS:
+    raise HTTPException(status_code=400, detail=f"At most {Config.BATCH_SEARCH_MAX_REQUESTS} requests per batch")
+
+  cached = await asyncio.gather(*[search_cache.get(request) for request in batch_request.requests])
+  pending = [request for request, result in zip(batch_request.requests, cached) if result is None]
+
+  controller = SearchController(reddit_service, openai_service, model_registry, corpus, sentiment_cache)
+  try:
+    computed = await controller.execute_batch(pending) if pending else []
+  except Exception as e:
+    logger.exception("Error during batch search execution")
+    raise HTTPException(status_code=500, detail=f"Internal Server Error: {e}")
+
+  computed_items = iter(computed)
+  results = []
+  for request, result in zip(batch_request.requests, cached):
+    if result is not None:
+      results.append(BatchSearchItem(product_category=request.product_category, result=result))
+      continue
+    item = next(computed_items)
+    if item.result is not None:
+      await search_cache.set(request, item.result)
+    results.append(item)
+  return BatchSearchResponse(results=results)
\ No newline at end of file
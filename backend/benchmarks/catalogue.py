@@ -0,0 +1,128 @@
+"""
+Product catalogue at scale: build time and memory (RSS growth) of the index,
+lookup latency for exact names, spelling/format variants and unseen products,
+and how often variants resolve to the right entry (and unseen products to
+none). A linear trigram scan over a sample of the queries shows what the index
+saves.
+
+  python -m backend.benchmarks.catalogue --sizes 10000 100000
+"""
+import argparse
+import random
+import statistics
+import string
+import resource
+import time
+from typing import List, Tuple
+
+from backend.models.product import Product
+from backend.services.product_catalogue import ProductCatalogue, product_key, trigrams
+
+WORDS = [
+  "cast", "iron", "skillet", "dutch", "oven", "rice", "cooker", "chef", "knife", "hiker", "sock", "boot", "blender",
+  "kettle", "toaster", "peeler", "grill", "pan", "pot", "wok", "mixer", "stand", "press", "french", "pour", "over",
+  "jacket", "rain", "shell", "fleece", "wallet", "belt", "backpack", "duffel", "tent", "stove", "lantern", "mug"
+]
+
+SIZES = ["5.5qt", "12 inch", '10"', "2 pack"]
+
+def random_word(rng: random.Random, length: int) -> str:
+  return "".join(rng.choice(string.ascii_lowercase) for _ in range(length))
+
+def random_product(rng: random.Random, brands: List[str]) -> Product:
+  words = [random_word(rng, rng.randint(4, 8))] + rng.sample(WORDS, rng.randint(1, 3))
+  if rng.random() < 0.3:
+    words.append(str(rng.randint(100, 9999)))
+  return Product(brand_name=rng.choice(brands), product_name=" ".join(words).title())
+
+def variant(rng: random.Random, product: Product) -> Product:
+  """The kind of drift extraction produces: brand spacing, plurals, sizes, a dropped letter."""
+  brand, name = product.brand_name, product.product_name
+  kind = rng.choice(["spacing", "plural", "size", "typo", "brand_prefix"])
+  if kind == "spacing":
+    brand = brand.replace(" ", "") if " " in brand else f"{brand[:3]} {brand[3:]}"
+  elif kind == "plural":
+    name = name + "s" if not name[-1].isdigit() else name
+  elif kind == "size":
+    name = f"{rng.choice(SIZES)} {name}"
+  elif kind == "typo":
+    words = name.split()
+    i = max(range(len(words)), key=lambda j: len(words[j]) if not words[j].isdigit() else 0)
+    k = rng.randrange(1, len(words[i]) - 1)
+    words[i] = words[i][:k] + words[i][k + 1:]
+    name = " ".join(words)
+  else:
+    name = f"{brand} {name}"
+  return Product(brand_name=brand, product_name=name)
+
+def build_data(size: int, queries: int, seed: int = 7) -> Tuple[List[Product], List[Product], List[Product]]:
+  rng = random.Random(seed)
+  brands = [random_word(rng, rng.randint(3, 6)).title() + rng.choice(["", " " + random_word(rng, 4).title()]) for _ in range(size // 20)]
+  catalogue, seen = [], set()
+  while len(catalogue) < size:
+    product = random_product(rng, brands)
+    if product_key(product) not in seen:
+      seen.add(product_key(product))
+      catalogue.append(product)
+  sample = rng.sample(catalogue, queries)
+  variants = [variant(rng, product) for product in sample]
+  return catalogue, sample, variants
+
+def linear_find(catalogue: ProductCatalogue, product: Product, threshold: float):
+  grams = trigrams(product_key(product))
+  best = None
+  for i, key in enumerate(catalogue.keys):
+    other = trigrams(key)
+    if len(grams & other) / len(grams | other) >= threshold:
+      best = i
+  return best
+
+def timed(func, items) -> Tuple[List, List[float]]:
+  results, latencies = [], []
+  for item in items:
+    started = time.perf_counter()
+    results.append(func(item))
+    latencies.append(time.perf_counter() - started)
+  return results, latencies
+
+def report(label: str, latencies: List[float], extra: str = ""):
+  ordered = sorted(latencies)
+  p99 = ordered[min(int(0.99 * len(ordered)), len(ordered) - 1)]
+  print(f"    {label:<10} mean {statistics.mean(latencies) * 1e6:8.1f} us  p99 {p99 * 1e6:8.1f} us  {extra}")
+
+def run(size: int, queries: int, linear_sample: int):
+  products, sample, variants = build_data(size, queries)
+  rng = random.Random(size)
+  unseen_brands = [random_word(rng, 7).title() for _ in range(50)]
+  unseen = [random_product(rng, unseen_brands) for _ in range(queries)]
+
+  # ru_maxrss is in kilobytes on Linux; the build is where the process grows
+  rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  catalogue = ProductCatalogue(None)
+  started = time.perf_counter()
+  for product in products:
+    catalogue.add(product)
+  build_seconds = time.perf_counter() - started
+  held_mb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024
+  print(f"  {size} entries: built in {build_seconds:.2f}s ({size / build_seconds:,.0f} inserts/s), index {held_mb:.1f} MB")
+
+  expected = [catalogue.ids[product_key(product)] for product in sample]
+  found, latencies = timed(catalogue.find, sample)
+  report("exact", latencies, f"{sum(f == e for f, e in zip(found, expected)) / queries:.1%} found")
+  found, latencies = timed(catalogue.find, variants)
+  report("variant", latencies, f"{sum(f == e for f, e in zip(found, expected)) / queries:.1%} resolved correctly")
+  found, latencies = timed(catalogue.find, unseen)
+  report("unseen", latencies, f"{sum(f is None for f in found) / queries:.1%} correctly new")
+  if linear_sample:
+    _, latencies = timed(lambda product: linear_find(catalogue, product, catalogue.threshold), variants[:linear_sample])
+    report("linear", latencies, f"(full trigram scan, {linear_sample} variant queries)")
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+  parser.add_argument("--queries", type=int, default=2000)
+  parser.add_argument("--linear-sample", type=int, default=20, help="queries to time against a linear scan (0 to skip)")
+  args = parser.parse_args()
+
+  for size in args.sizes:
+    run(size, args.queries, args.linear_sample)
@@ -0,0 +1,196 @@
+"""
+/chat/openai against a local fake OpenAI server (OPENAI_BASE_URL is pointed at
+it, so no key or network is needed). The fake answers with a fixed number of
+tokens at a fixed pace and counts the completions it was asked for.
+
+Reports time to first token and total time for a blocking request, a streamed
+one and a cached one, and how many upstream calls concurrent identical prompts
+make. Exits non-zero if streaming doesn't deliver early, the cache or coalescing
+don't hold, or the endpoint's streamed body differs from the completion, so it
+doubles as a check of the endpoint.
+
+  python -m backend.benchmarks.chat_stream --tokens 40 --token-delay 0.02 --clients 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+MODEL = "gpt-fake"
+
+class FakeOpenAI:
+  """
+  Just enough of POST /v1/chat/completions: a JSON completion, or
+  server-sent events with one token per `token_delay` when `stream` is set.
+  """
+  def __init__(self, tokens: int, token_delay: float, first_token_delay: float):
+    self.tokens = tokens
+    self.token_delay = token_delay
+    self.first_token_delay = first_token_delay
+    self.requests = 0
+    self.server = None
+
+  def completion_tokens(self, message: str):
+    return [f"{message}-{i} " for i in range(self.tokens)]
+
+  async def start(self) -> str:
+    self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+    host, port = self.server.sockets[0].getsockname()[:2]
+    return f"http://{host}:{port}/v1"
+
+  async def stop(self):
+    self.server.close()
+    await self.server.wait_closed()
+
+  async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+      while True:
+        request_line = await reader.readline()
+        if not request_line:
+          return
+        headers = {}
+        while (line := await reader.readline()) not in (b"\r\n", b""):
+          name, _, value = line.decode().partition(":")
+          headers[name.strip().lower()] = value.strip()
+        body = json.loads(await reader.readexactly(int(headers.get("content-length", 0))) or b"{}")
+        await self.respond(writer, body)
+    except (ConnectionError, asyncio.IncompleteReadError):
+      pass
+    finally:
+      writer.close()
+
+  async def respond(self, writer: asyncio.StreamWriter, body: dict):
+    self.requests += 1
+    tokens = self.completion_tokens(body["messages"][-1]["content"])
+    await asyncio.sleep(self.first_token_delay)
+    if not body.get("stream"):
+      await asyncio.sleep(self.token_delay * (len(tokens) - 1))
+      payload = json.dumps({
+        "id": "chatcmpl-fake", "object": "chat.completion", "created": 0, "model": body["model"],
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)}, "finish_reason": "stop"}]
+      }).encode()
+      writer.write(b"HTTP/1.1 200 OK\r\ncontent-type: application/json\r\ncontent-length: %d\r\n\r\n%s" % (len(payload), payload))
+      await writer.drain()
+      return
+
+    def chunk(data: bytes) -> bytes:
+      return b"%x\r\n%s\r\n" % (len(data), data)
+
+    writer.write(b"HTTP/1.1 200 OK\r\ncontent-type: text/event-stream\r\ntransfer-encoding: chunked\r\n\r\n")
+    for i, token in enumerate(tokens):
+      if i:
+        await asyncio.sleep(self.token_delay)
+      event = {
+        "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": 0, "model": body["model"],
+        "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]
+      }
+      writer.write(chunk(b"data: " + json.dumps(event).encode() + b"\n\n"))
+      await writer.drain()
+    writer.write(chunk(b"data: [DONE]\n\n") + chunk(b""))
+    await writer.drain()
+
+async def timed_stream(chunks) -> tuple:
+  started = time.perf_counter()
+  first, parts = None, []
+  async for part in chunks:
+    if first is None:
+      first = time.perf_counter() - started
+    parts.append(part)
+  return first, time.perf_counter() - started, "".join(parts)
+
+async def run(args) -> list:
+  fake = FakeOpenAI(args.tokens, args.token_delay, args.first_token_delay)
+  os.environ["OPENAI_BASE_URL"] = await fake.start()
+  os.environ.setdefault("OPENAI_API_KEY", "fake")
+
+  import httpx
+  from backend.core.config import Config
+  from backend.services.chat_cache import ChatResponseCache
+  from backend.services.openai_service import OpenAIService, create_openai_client
+
+  Config.OPENAI_BASE_URL = os.environ["OPENAI_BASE_URL"]
+  client = create_openai_client()
+  # LRU only, so repeated runs don't hit each other's entries
+  cache = ChatResponseCache(None, ttl=3600)
+  service = OpenAIService(client, chat_cache=cache)
+  failures = []
+
+  def row(label, first, total, calls):
+    print(f"  {label:<34} first token {first * 1000:8.1f} ms  total {total * 1000:8.1f} ms  upstream calls {calls}")
+
+  try:
+    expected = "".join(fake.completion_tokens("blocking"))
+    before = fake.requests
+    started = time.perf_counter()
+    text = await service.chat("blocking", MODEL)
+    blocking = time.perf_counter() - started
+    row("blocking", blocking, blocking, fake.requests - before)
+    if text != expected:
+      failures.append("blocking completion differs from what the server sent")
+
+    before = fake.requests
+    first, total, text = await timed_stream(service.chat_stream("streamed", MODEL))
+    row("streamed", first, total, fake.requests - before)
+    if text != "".join(fake.completion_tokens("streamed")):
+      failures.append("streamed completion differs from what the server sent")
+    if first >= blocking / 2:
+      failures.append(f"first streamed token took {first * 1000:.0f} ms, not much earlier than blocking")
+
+    before = fake.requests
+    first, total, cached = await timed_stream(service.chat_stream("streamed", MODEL))
+    row("streamed, cached", first, total, fake.requests - before)
+    started = time.perf_counter()
+    cached_blocking = await service.chat("blocking", MODEL)
+    elapsed = time.perf_counter() - started
+    row("blocking, cached", elapsed, elapsed, fake.requests - before)
+    if fake.requests != before or cached != text or cached_blocking != expected:
+      failures.append("repeated prompts were not served from the cache")
+
+    before = fake.requests
+    results = await asyncio.gather(*[timed_stream(service.chat_stream("concurrent", MODEL)) for _ in range(args.clients)])
+    results += await asyncio.gather(*[service.chat("concurrent-blocking", MODEL) for _ in range(args.clients)])
+    firsts = sorted(result[0] for result in results[:args.clients])
+    row(f"{args.clients}+{args.clients} concurrent identical", firsts[len(firsts) // 2], max(r[1] for r in results[:args.clients]),
+        fake.requests - before)
+    if fake.requests - before != 2:
+      failures.append(f"{args.clients} concurrent identical prompts (streamed and blocking) made {fake.requests - before} upstream calls, expected 2")
+    if len({result[2] for result in results[:args.clients]}) != 1 or len(set(results[args.clients:])) != 1:
+      failures.append("concurrent identical prompts got different completions")
+
+    # the endpoint itself, through the app
+    from fastapi import FastAPI
+    from backend.api.endpoints.chat import router
+    from backend.dependencies import get_openai_service
+
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_openai_service] = lambda: OpenAIService(client, chat_cache=ChatResponseCache(None, ttl=0))
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://chat") as http:
+      streamed = await http.get(f"/chat/openai/{MODEL}/endpoint", params={"stream": "true"})
+      blocking = await http.get(f"/chat/openai/{MODEL}/endpoint")
+    if streamed.text != "".join(fake.completion_tokens("endpoint")) or blocking.json() != streamed.text:
+      failures.append("endpoint responses differ from the completion")
+    print(f"  endpoint: streamed {streamed.headers['content-type']}, {len(streamed.text)} chars; blocking {blocking.status_code}")
+    print(f"Cache: {cache.stats()}")
+  finally:
+    await client.close()
+    await fake.stop()
+  return failures
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--tokens", type=int, default=40)
+  parser.add_argument("--token-delay", type=float, default=0.02, help="seconds between streamed tokens")
+  parser.add_argument("--first-token-delay", type=float, default=0.1, help="seconds before the first token")
+  parser.add_argument("--clients", type=int, default=20, help="concurrent identical prompts")
+  args = parser.parse_args()
+
+  print(f"Fake OpenAI: {args.tokens} tokens, {args.first_token_delay * 1000:.0f} ms to first, {args.token_delay * 1000:.0f} ms apart")
+  failures = asyncio.run(run(args))
+  for failure in failures:
+    print(f"FAIL: {failure}")
+  if failures:
+    sys.exit(1)
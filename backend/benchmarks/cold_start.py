@@ -0,0 +1,132 @@
+"""
+Worker cold start: how long `import backend.main` and app startup take in a
+fresh interpreter, how long the first `/` and `/subreddits/{name}` responses
+take, and which heavy libraries those routes pulled in. Each run is a separate
+process (Reddit is served from a one-entry replay fixture, so no network or
+credentials are needed).
+
+Exits non-zero if serving those routes loaded transformers or torch, so it
+doubles as a check that the ML stack stays off the cheap routes.
+
+  python -m backend.benchmarks.cold_start --runs 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HEAVY_MODULES = ["transformers", "torch", "optimum", "openai", "asyncpraw", "aiohttp", "sqlalchemy"]
+# must never be loaded by the routes measured here
+FORBIDDEN_MODULES = ["transformers", "torch"]
+SUBREDDIT = "buyitforlife"
+
+def write_fixture(path: str):
+  from backend.core.replay import FIXTURE_VERSION
+
+  interaction = {
+    "service": "reddit", "keys": [f"subreddit {SUBREDDIT}"], "elapsed": 0,
+    "response": {"id": "2s3ia", "display_name": SUBREDDIT, "created_utc": 0, "subscribers": 1000, "over18": False}
+  }
+  with open(path, "w") as f:
+    json.dump({"version": FIXTURE_VERSION, "interactions": [interaction]}, f)
+
+async def serve_routes(app) -> dict:
+  import httpx
+
+  timings = {}
+  async with app.router.lifespan_context(app):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://cold-start") as client:
+      for path in ["/", f"/subreddits/{SUBREDDIT}"]:
+        started = time.perf_counter()
+        response = await client.get(path)
+        timings[path] = time.perf_counter() - started
+        if response.status_code != 200:
+          raise RuntimeError(f"GET {path} returned {response.status_code}: {response.text}")
+  return timings
+
+class ImportAttempts:
+  """Records every attempt to import `modules`, including ones that fail because they aren't installed."""
+  def __init__(self, modules):
+    self.modules = set(modules)
+    self.attempted = set()
+
+  def find_spec(self, name, path=None, target=None):
+    if name.partition(".")[0] in self.modules:
+      self.attempted.add(name.partition(".")[0])
+    # leave the actual import to the other finders
+    return None
+
+def child():
+  """One cold start, reported as JSON on stdout."""
+  attempts = ImportAttempts(HEAVY_MODULES)
+  sys.meta_path.insert(0, attempts)
+  started = time.perf_counter()
+  from backend.core.startup import import_timer
+  import_timer.install()
+  import backend.main
+  import_seconds = time.perf_counter() - started
+
+  started = time.perf_counter()
+  first_response = asyncio.run(serve_routes(backend.main.app))
+  print(json.dumps({
+    "import_seconds": import_seconds,
+    "serve_seconds": time.perf_counter() - started,
+    "first_response": first_response,
+    "loaded": {module: module in sys.modules or module in attempts.attempted for module in HEAVY_MODULES},
+    "slowest": import_timer.report(10)["slowest"]
+  }))
+
+def run_once(fixture: str) -> dict:
+  env = {
+    **os.environ, "REPLAY_MODE": "replay", "REPLAY_FIXTURE": fixture, "REPLAY_LATENCY_SCALE": "0",
+    "STARTUP_REPORT": "false"
+  }
+  started = time.perf_counter()
+  result = subprocess.run(
+    [sys.executable, "-m", "backend.benchmarks.cold_start", "--child"],
+    env=env, capture_output=True, text=True, check=True
+  )
+  report = json.loads(result.stdout.strip().splitlines()[-1])
+  report["process_seconds"] = time.perf_counter() - started
+  return report
+
+def main(args):
+  with tempfile.TemporaryDirectory() as directory:
+    fixture = os.path.join(directory, "cold_start.json")
+    write_fixture(fixture)
+    reports = [run_once(fixture) for _ in range(args.runs)]
+
+  def row(label, values):
+    print(f"  {label:<38} {statistics.median(values) * 1000:8.1f} ms")
+
+  print(f"{args.runs} cold starts (median):")
+  row("import backend.main", [r["import_seconds"] for r in reports])
+  row("startup + first requests", [r["serve_seconds"] for r in reports])
+  for path in reports[0]["first_response"]:
+    row(f"first GET {path}", [r["first_response"][path] for r in reports])
+  row("whole process", [r["process_seconds"] for r in reports])
+  print("Slowest imports (last run): " + ", ".join(f"{package} {seconds * 1000:.0f} ms" for package, seconds in reports[-1]["slowest"].items()))
+  loaded = reports[-1]["loaded"]
+  print("Loaded: " + ", ".join(f"{module}={'yes' if loaded[module] else 'no'}" for module in HEAVY_MODULES))
+
+  forbidden = [module for module in FORBIDDEN_MODULES if any(r["loaded"][module] for r in reports)]
+  if forbidden:
+    print(f"FAIL: serving / and /subreddits loaded {', '.join(forbidden)}")
+    sys.exit(1)
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--runs", type=int, default=5)
+  parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+  args = parser.parse_args()
+
+  if args.child:
+    child()
+  else:
+    main(args)
@@ -0,0 +1,117 @@
+"""
+Memory and throughput of the columnar CommentStore against one pydantic Comment
+object per comment (how the pipeline held comments before), on large threads.
+Each run builds the thread from a flattened PRAW listing, filters half the
+comments (keeping ancestors), sorts by score and reads every body; the API
+boundary step (nested Comment trees) is timed separately: the columnar store
+has to build every Comment there, where the object store already holds them.
+
+  python -m backend.benchmarks.comment_batch --sizes 10000 50000 100000
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from backend.models.comment import Comment
+from backend.models.comment_store import CommentStore
+
+@dataclass
+class FakePrawComment:
+  id: str
+  body: str
+  score: int
+  parent_id: str
+  created_utc: int = 0
+
+def random_thread(n: int, seed: int = 7) -> List[FakePrawComment]:
+  rng = random.Random(seed)
+  comments = []
+  for i in range(n):
+    # roughly half the comments are top level, the rest reply to an earlier comment
+    parent = f"t1_c{rng.randrange(i)}" if i and rng.random() < 0.5 else "t3_sub"
+    body = " ".join(rng.choice(["great", "pan", "Lodge", "broke", "still", "works", "years"]) for _ in range(rng.randint(5, 60)))
+    comments.append(FakePrawComment(id=f"c{i}", body=body, score=rng.randint(-10, 500), parent_id=parent, created_utc=i))
+  return comments
+
+class ObjectStore:
+  """A dict of pydantic Comments plus parent links, as the pipeline used before."""
+  def __init__(self):
+    self.comments: Dict[str, Comment] = {}
+    self.parents: Dict[str, Optional[str]] = {}
+    self.children: Dict[str, List[str]] = {}
+
+  @classmethod
+  def from_praw(cls, praw_comments) -> "ObjectStore":
+    store = cls()
+    for praw_comment in praw_comments:
+      parent_id = praw_comment.parent_id[3:] if praw_comment.parent_id.startswith("t1_") else None
+      store.comments[praw_comment.id] = Comment(
+        id=praw_comment.id, body=praw_comment.body, score=praw_comment.score, created_utc=praw_comment.created_utc
+      )
+      store.parents[praw_comment.id] = parent_id
+      if parent_id is not None:
+        store.children.setdefault(parent_id, []).append(praw_comment.id)
+    return store
+
+  def prune(self, keep_ids) -> "ObjectStore":
+    keep = set()
+    for cid in keep_ids:
+      while cid is not None and cid in self.comments and cid not in keep:
+        keep.add(cid)
+        cid = self.parents[cid]
+    pruned = ObjectStore()
+    for cid, comment in self.comments.items():
+      if cid in keep:
+        pruned.comments[cid] = comment
+        pruned.parents[cid] = self.parents[cid]
+        if self.parents[cid] is not None:
+          pruned.children.setdefault(self.parents[cid], []).append(cid)
+    return pruned
+
+  def sorted_by_score(self) -> List[Comment]:
+    return sorted(self.comments.values(), key=lambda c: c.score, reverse=True)
+
+  def tree(self) -> List[Comment]:
+    roots = [cid for cid, parent in self.parents.items() if parent is None or parent not in self.comments]
+    order = list(roots)
+    for cid in order:
+      order.extend(child for child in self.children.get(cid, []) if child in self.comments)
+    built: Dict[str, Comment] = {}
+    for cid in reversed(order):
+      replies = [built[child] for child in self.children.get(cid, []) if child in built]
+      built[cid] = self.comments[cid].model_copy(update={"replies": replies})
+    return [built[cid] for cid in roots]
+
+def pipeline(store_class, praw_comments):
+  store = store_class.from_praw(praw_comments)
+  keep_ids = [comment.id for comment in praw_comments[::2]]
+  filtered = store.prune(keep_ids).sorted_by_score()
+  total_chars = sum(len(comment.body) for comment in filtered)
+  return store, filtered, total_chars
+
+def measure(store_class, praw_comments):
+  tracemalloc.start()
+  started = time.perf_counter()
+  store, filtered, _ = pipeline(store_class, praw_comments)
+  pipeline_seconds = time.perf_counter() - started
+  current, peak = tracemalloc.get_traced_memory()
+  started = time.perf_counter()
+  store.tree()
+  tree_seconds = time.perf_counter() - started
+  tracemalloc.stop()
+  return pipeline_seconds, tree_seconds, current / 1024 / 1024, peak / 1024 / 1024
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 100000])
+  args = parser.parse_args()
+
+  print(f"  {'comments':>8} {'store':<10} {'pipeline/s':>12} {'tree ms':>9} {'held MB':>8} {'peak MB':>8}")
+  for n in args.sizes:
+    praw_comments = random_thread(n)
+    for name, store_class in [("pydantic", ObjectStore), ("columnar", CommentStore)]:
+      pipeline_seconds, tree_seconds, held_mb, peak_mb = measure(store_class, praw_comments)
+      print(f"  {n:>8} {name:<10} {n / pipeline_seconds:>12.0f} {tree_seconds * 1000:>9.1f} {held_mb:>8.1f} {peak_mb:>8.1f}")
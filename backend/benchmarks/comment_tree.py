@@ -0,0 +1,81 @@
+"""
+Regression benchmark for comment tree building.
+
+Builds synthetic deep (single chain) and wide (one level of replies) threads and
+counts how many Comment objects each approach creates. The legacy approach
+serialized every entry of the flattened list together with its whole subtree.
+
+  python -m backend.benchmarks.comment_tree
+"""
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from backend.models.comment import Comment
+from backend.models.comment_store import CommentStore
+
+@dataclass
+class FakePrawComment:
+  id: str
+  body: str
+  score: int
+  parent_id: str
+  replies: List["FakePrawComment"] = field(default_factory=list)
+
+def deep_thread(n: int) -> List[FakePrawComment]:
+  comments = []
+  parent: Optional[FakePrawComment] = None
+  for i in range(n):
+    comment = FakePrawComment(
+      id=f"c{i}", body=f"comment {i}", score=i,
+      parent_id=f"t1_{parent.id}" if parent else "t3_sub"
+    )
+    if parent:
+      parent.replies.append(comment)
+    comments.append(comment)
+    parent = comment
+  return comments
+
+def wide_thread(n: int) -> List[FakePrawComment]:
+  root = FakePrawComment(id="c0", body="comment 0", score=0, parent_id="t3_sub")
+  comments = [root]
+  for i in range(1, n):
+    reply = FakePrawComment(id=f"c{i}", body=f"comment {i}", score=i, parent_id="t1_c0")
+    root.replies.append(reply)
+    comments.append(reply)
+  return comments
+
+def legacy_serialize(praw_comments: List[FakePrawComment]) -> int:
+  # mirrors the old serialize_comment recursion over every entry of comments.list()
+  created = 0
+  def serialize(praw_comment):
+    nonlocal created
+    replies = [serialize(reply) for reply in praw_comment.replies]
+    created += 1
+    return Comment(id=praw_comment.id, body=praw_comment.body, score=praw_comment.score, replies=replies)
+  for praw_comment in praw_comments:
+    serialize(praw_comment)
+  return created
+
+def run(shape: str, sizes: List[int]):
+  build = deep_thread if shape == "deep" else wide_thread
+  print(f"{shape} thread")
+  print(f"  {'comments':>8} {'legacy objs':>12} {'legacy ms':>10} {'store objs':>11} {'store ms':>9}")
+  for n in sizes:
+    praw_comments = build(n)
+
+    started = time.perf_counter()
+    legacy_objects = legacy_serialize(praw_comments)
+    legacy_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    store = CommentStore.from_praw(praw_comments)
+    store_ms = (time.perf_counter() - started) * 1000
+
+    print(f"  {n:>8} {legacy_objects:>12} {legacy_ms:>10.1f} {len(store):>11} {store_ms:>9.1f}")
+
+if __name__ == "__main__":
+  # the legacy recursion hits the interpreter recursion limit past a few hundred levels
+  sizes = [50, 100, 200, 400]
+  run("deep", sizes)
+  run("wide", sizes)
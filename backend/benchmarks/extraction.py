@@ -0,0 +1,113 @@
+"""
+Offline benchmark for the product extraction backends: comments/second and
+recall of labeled (brand, product) mentions.
+
+The dataset is either synthetic or a JSONL file with one
+{"body": ..., "products": [{"brand_name": ..., "product_name": ...}]} per line.
+Half of the labeled products are learned into a scratch gazetteer first, as if
+they'd been extracted by earlier searches; it lives in an in-memory fakeredis,
+so the benchmark never touches a real Redis. The local backend runs the real NER
+model through the ModelRegistry; OpenAI and hybrid only run with --with-openai.
+
+  python -m backend.benchmarks.extraction --comments 500
+  python -m backend.benchmarks.extraction --dataset labeled.jsonl --with-openai
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import List, Set, Tuple
+
+from backend.models.comment import Comment
+from backend.models.product import Product
+from backend.services.extractors import create_extractor
+from backend.services.gazetteer import BrandGazetteer
+from backend.services.model_registry import ModelRegistry
+from backend.services.openai_service import create_openai_client
+from backend.services.product_matcher import tokenize
+
+BRANDS = ["Zojirushi", "Lodge", "Le Creuset", "Vitamix", "Tiger", "Cuisinart", "Breville", "Aroma", "Instant Pot", "Staub"]
+PRODUCTS = ["Neuro Fuzzy", "Dutch Oven", "A3500", "Pro 750", "JKT-D10U", "Smart Oven", "Precision Brewer", "Duo Plus", "Cocotte", "Induction Heating"]
+TEMPLATES = [
+  "I've had my {brand} {product} for ten years and it still works great.",
+  "Get the {brand} {product}, nothing else comes close.",
+  "Honestly the {product} from {brand} is overpriced but it lasts.",
+  "My parents swear by their {brand} {product}.",
+  "Skip the cheap ones, {brand} makes the {product} and it's worth it.",
+]
+FILLER = [
+  "Buy once, cry once.",
+  "Whatever you do, avoid anything with a nonstick coating.",
+  "Check the warranty before you buy.",
+]
+
+def normalize(product: Product) -> Tuple[str, str]:
+  return " ".join(tokenize(product.brand_name)), " ".join(tokenize(product.product_name))
+
+def synthetic_dataset(num_comments: int, seed: int = 7) -> List[Tuple[Comment, Set[Tuple[str, str]]]]:
+  rng = random.Random(seed)
+  pairs = [Product(brand_name=brand, product_name=product) for brand, product in zip(BRANDS, PRODUCTS)]
+  dataset = []
+  for i in range(num_comments):
+    if rng.random() < 0.2:
+      dataset.append((Comment(id=f"c{i}", body=rng.choice(FILLER), score=1), set()))
+      continue
+    product = rng.choice(pairs)
+    body = rng.choice(TEMPLATES).format(brand=product.brand_name, product=product.product_name)
+    dataset.append((Comment(id=f"c{i}", body=body, score=1), {normalize(product)}))
+  return dataset
+
+def load_dataset(path: str) -> List[Tuple[Comment, Set[Tuple[str, str]]]]:
+  dataset = []
+  with open(path) as f:
+    for i, line in enumerate(f):
+      if not line.strip():
+        continue
+      row = json.loads(line)
+      labels = {normalize(Product(**product)) for product in row.get("products", [])}
+      dataset.append((Comment(id=row.get("id", f"c{i}"), body=row["body"], score=row.get("score", 1)), labels))
+  return dataset
+
+def recall(products: List[Product], dataset) -> float:
+  expected = set().union(*(labels for _, labels in dataset))
+  if not expected:
+    return 1.0
+  found = {normalize(product) for product in products}
+  return len(expected & found) / len(expected)
+
+async def main(args):
+  dataset = load_dataset(args.dataset) if args.dataset else synthetic_dataset(args.comments)
+  comments = [comment for comment, _ in dataset]
+  labeled = sorted({label for _, labels in dataset for label in labels})
+  print(f"{len(comments)} comments, {len(labeled)} labeled products")
+
+  try:
+    import fakeredis.aioredis
+  except ImportError as e:
+    print(f"skipped, the scratch gazetteer needs fakeredis ({e})")
+    return
+  gazetteer = BrandGazetteer(fakeredis.aioredis.FakeRedis(), namespace="benchmark:gazetteer")
+  await gazetteer.learn([Product(brand_name=brand, product_name=product) for brand, product in labeled[::2]])
+
+  model_registry = ModelRegistry()
+  model_registry.warm(["ner"])
+  openai_client = create_openai_client()
+  backends = ["local", "hybrid", "openai"] if args.with_openai else ["local"]
+  try:
+    for backend in backends:
+      extractor = create_extractor(backend, openai_client, model_registry, gazetteer)
+      started = time.perf_counter()
+      products = await extractor.extract(comments)
+      elapsed = time.perf_counter() - started
+      print(f"  {backend:<7} {len(comments) / elapsed:9.1f} comments/s  recall {recall(products, dataset):.2f}")
+  finally:
+    await openai_client.close()
+    model_registry.close()
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--comments", type=int, default=500)
+  parser.add_argument("--dataset", help="labeled JSONL file instead of synthetic comments")
+  parser.add_argument("--with-openai", action="store_true", help="also run the openai and hybrid backends (needs an API key)")
+  asyncio.run(main(parser.parse_args()))
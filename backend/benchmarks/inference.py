@@ -0,0 +1,99 @@
+"""
+Compare the model backends (eager, int8 dynamic quantization, ONNX Runtime) on
+latency and on agreement with eager fp32 output, for both the NER and the
+sentiment model. Runs on the CPU.
+
+  python -m backend.benchmarks.inference --threads 4
+  python -m backend.benchmarks.inference --dataset comments.txt --backends eager quantized
+"""
+import argparse
+import random
+import statistics
+import time
+from typing import List
+
+from backend.services.model_registry import MODEL_BACKENDS, ModelRegistry
+
+SAMPLE_COMMENTS = [
+  "I've had my Zojirushi Neuro Fuzzy for ten years and it still works great.",
+  "The Lodge cast iron skillet is indestructible, best forty dollars I ever spent.",
+  "My Vitamix 5200 died after two years, really disappointed with support.",
+  "Honestly the Instant Pot Duo is fine but the seal smells after a while.",
+  "Le Creuset dutch ovens are overpriced but they last forever.",
+  "Avoid anything from Hamilton Beach, mine broke in a month.",
+  "Darn Tough socks have a lifetime warranty and they actually honor it.",
+  "Buy once, cry once. Nothing else to say.",
+]
+
+def load_comments(path: str | None, count: int) -> List[str]:
+  if path:
+    with open(path) as f:
+      return [line.strip() for line in f if line.strip()][:count]
+  rng = random.Random(7)
+  return [rng.choice(SAMPLE_COMMENTS) for _ in range(count)]
+
+def entity_set(entities) -> set:
+  return {(e["entity_group"], e["word"]) for e in entities}
+
+def time_batches(model, comments: List[str], batch_size: int, **kwargs):
+  latencies = []
+  outputs = []
+  for start in range(0, len(comments), batch_size):
+    batch = comments[start:start + batch_size]
+    started = time.perf_counter()
+    outputs.extend(model(batch, **kwargs))
+    latencies.append((time.perf_counter() - started) * 1000)
+  return outputs, latencies
+
+def ner_agreement(outputs, reference) -> float:
+  # micro F1 of entity (group, word) pairs against eager output
+  true_positives = predicted = expected = 0
+  for got, want in zip(outputs, reference):
+    got, want = entity_set(got), entity_set(want)
+    true_positives += len(got & want)
+    predicted += len(got)
+    expected += len(want)
+  if not predicted and not expected:
+    return 1.0
+  return 2 * true_positives / (predicted + expected)
+
+def sentiment_agreement(outputs, reference) -> float:
+  return sum(got["label"] == want["label"] for got, want in zip(outputs, reference)) / max(len(reference), 1)
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--comments", type=int, default=256)
+  parser.add_argument("--dataset", help="text file with one comment per line")
+  parser.add_argument("--batch-size", type=int, default=32)
+  parser.add_argument("--threads", type=int, default=0)
+  parser.add_argument("--backends", nargs="+", default=list(MODEL_BACKENDS), choices=MODEL_BACKENDS)
+  args = parser.parse_args()
+
+  comments = load_comments(args.dataset, args.comments)
+  print(f"{len(comments)} comments, batch size {args.batch_size}, threads {args.threads or 'default'}")
+
+  reference = {}
+  backends = ["eager"] + [backend for backend in args.backends if backend != "eager"]
+  for backend in backends:
+    registry = ModelRegistry(device=-1, backend=backend, threads=args.threads)
+    try:
+      registry.warm()
+    except ImportError as e:
+      print(f"  {backend:<10} skipped ({e})")
+      continue
+    for name, kwargs, agreement in [
+      ("ner", {}, ner_agreement),
+      ("sentiment", {"truncation": True, "max_length": 512}, sentiment_agreement),
+    ]:
+      model = registry.get(name)
+      # first call pays for lazy initialisation; keep it out of the numbers
+      model(comments[:1], **kwargs)
+      outputs, latencies = time_batches(model, comments, args.batch_size, **kwargs)
+      reference.setdefault(name, outputs)
+      stats = registry.stats()[name]
+      print(
+        f"  {backend:<10} {name:<10} load {stats.load_seconds:6.1f}s  +{stats.rss_delta_mb:7.1f} MB  "
+        f"p50 {statistics.median(latencies):8.1f} ms/batch  {len(comments) / (sum(latencies) / 1000):8.1f} comments/s  "
+        f"agreement {agreement(outputs, reference[name]):.3f}"
+      )
+    registry.close()
@@ -0,0 +1,196 @@
+"""
+Memory per node and inference throughput as the number of workers grows, with
+every worker loading its own models ("local") versus all of them sharing the
+inference sidecar ("sidecar"). Each worker process runs search-sized requests
+(NER over a page of comments, then sentiment) from several concurrent tasks for
+a fixed time. Bodies are unique, so the NER cache never answers.
+
+By default the models are synthetic: each holds `--ner-mb`/`--sentiment-mb` of
+weights and costs a fixed overhead per call plus a cost per input, spent
+hashing its weights (which, like real inference, releases the GIL). That keeps
+the run cheap and shows what batching and sharing buy; `--real` loads the
+actual models instead.
+
+  python -m backend.benchmarks.inference_sidecar --workers 1 2 4 --duration 10
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import string
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+def rss_mb() -> float:
+  with open("/proc/self/status") as f:
+    for line in f:
+      if line.startswith("VmRSS:"):
+        return int(line.split()[1]) / 1024
+  return 0.0
+
+class SyntheticModel:
+  def __init__(self, task: str, weights_mb: int, call_ms: float, item_ms: float):
+    self.task = task
+    # filled rather than zeroed, so the pages are really resident
+    self.weights = bytes(range(256)) * (weights_mb * 4096)
+    self.call_ms = call_ms
+    self.item_ms = item_ms
+
+  def _compute(self, milliseconds: float):
+    # measured in CPU time, so workers competing for cores each still do the full amount
+    deadline = time.thread_time() + milliseconds / 1000
+    view = memoryview(self.weights)
+    offset = 0
+    while time.thread_time() < deadline:
+      hashlib.sha256(view[offset:offset + (256 << 10)]).digest()
+      offset = (offset + (256 << 10)) % len(self.weights)
+
+  def __call__(self, bodies: List[str], **kwargs):
+    self._compute(self.call_ms + self.item_ms * len(bodies))
+    if self.task == "ner":
+      return [[{"entity_group": "ORG", "word": body.split()[0], "score": 0.9}] for body in bodies]
+    return [{"label": "POSITIVE", "score": 0.9} for _ in bodies]
+
+def create_registry(args, remote: bool):
+  if remote:
+    from backend.services.inference_client import InferenceClient, RemoteModelRegistry
+    return RemoteModelRegistry(InferenceClient(args.socket))
+  from backend.services.model_registry import ModelRegistry
+  if args.real:
+    return ModelRegistry(device=-1)
+  sizes = {"ner": args.ner_mb, "sentiment": args.sentiment_mb}
+  return ModelRegistry(
+    device=-1,
+    loader=lambda task, **kwargs: SyntheticModel(task, sizes["ner" if task == "ner" else "sentiment"], args.call_ms, args.item_ms)
+  )
+
+async def run_worker(args) -> dict:
+  from backend.services.inference_client import RemotePipeline
+  from backend.services.ner_filter import extract_entities
+
+  registry = create_registry(args, args.client == "sidecar")
+  await asyncio.to_thread(registry.warm)
+  rng = random.Random(os.getpid())
+  deadline = time.monotonic() + args.duration
+  counts = {"requests": 0, "comments": 0}
+
+  async def score(bodies: List[str]):
+    sentiment = registry.get("sentiment")
+    if isinstance(sentiment, RemotePipeline):
+      return await sentiment.infer(bodies)
+    return await asyncio.to_thread(sentiment, bodies, truncation=True, max_length=512)
+
+  async def requests():
+    while time.monotonic() < deadline:
+      bodies = [
+        f"{''.join(rng.choices(string.ascii_letters, k=12))} is the best thing I ever bought" for _ in range(args.comments)
+      ]
+      await extract_entities(bodies, registry.get("ner"))
+      await score(bodies)
+      counts["requests"] += 1
+      counts["comments"] += len(bodies)
+
+  started = time.monotonic()
+  await asyncio.gather(*[requests() for _ in range(args.concurrency)])
+  report = {**counts, "seconds": time.monotonic() - started, "rss_mb": rss_mb()}
+  registry.close()
+  return report
+
+async def sidecar_stats(path: str) -> dict:
+  from backend.services.inference_client import InferenceClient
+
+  client = InferenceClient(path)
+  try:
+    return await client.stats()
+  finally:
+    client.close()
+
+def child_command(args, *extra) -> List[str]:
+  command = [
+    sys.executable, "-m", "backend.benchmarks.inference_sidecar", "--socket", args.socket,
+    "--duration", str(args.duration), "--concurrency", str(args.concurrency), "--comments", str(args.comments),
+    "--ner-mb", str(args.ner_mb), "--sentiment-mb", str(args.sentiment_mb),
+    "--call-ms", str(args.call_ms), "--item-ms", str(args.item_ms), *extra
+  ]
+  return command + ["--real"] if args.real else command
+
+def run_level(args, mode: str, workers: int) -> dict:
+  sidecar = None
+  if mode == "sidecar":
+    sidecar = subprocess.Popen(child_command(args, "--serve"), stderr=subprocess.DEVNULL)
+    while not os.path.exists(args.socket):
+      if sidecar.poll() is not None:
+        raise RuntimeError("inference sidecar exited during startup")
+      time.sleep(0.05)
+  try:
+    clients = [
+      subprocess.Popen(child_command(args, "--client", mode), stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+      for _ in range(workers)
+    ]
+    reports = []
+    for client in clients:
+      stdout, stderr = client.communicate()
+      if client.returncode != 0:
+        raise RuntimeError(f"{mode} worker exited with {client.returncode}: {stderr[-2000:]}")
+      reports.append(json.loads(stdout.strip().splitlines()[-1]))
+    stats = asyncio.run(sidecar_stats(args.socket)) if sidecar is not None else None
+  finally:
+    if sidecar is not None:
+      sidecar.terminate()
+      sidecar.wait()
+
+  seconds = max(report["seconds"] for report in reports)
+  result = {
+    "node_mb": sum(report["rss_mb"] for report in reports) + (stats["max_rss_mb"] if stats else 0),
+    "comments_per_second": sum(report["comments"] for report in reports) / seconds,
+    "mean_batch": None
+  }
+  if stats:
+    batchers = stats["batchers"].values()
+    result["mean_batch"] = sum(b["items"] for b in batchers) / max(sum(b["batches"] for b in batchers), 1)
+    result["rejected"] = sum(b["rejected"] for b in batchers)
+  return result
+
+def main(args):
+  print(
+    f"{'real' if args.real else 'synthetic'} models, {args.concurrency} concurrent requests of {args.comments} comments "
+    f"per worker, {args.duration:.0f}s per run"
+  )
+  print(f"  {'workers':>7}  {'mode':<8} {'node RSS':>10} {'comments/s':>11} {'mean batch':>11}")
+  with tempfile.TemporaryDirectory() as directory:
+    args.socket = os.path.join(directory, "inference.sock")
+    for workers in args.workers:
+      for mode in ("local", "sidecar"):
+        result = run_level(args, mode, workers)
+        batch = f"{result['mean_batch']:11.1f}" if result["mean_batch"] is not None else f"{'-':>11}"
+        rejected = f"  ({result['rejected']} requests turned away)" if result.get("rejected") else ""
+        print(f"  {workers:>7}  {mode:<8} {result['node_mb']:7.0f} MB {result['comments_per_second']:11.0f} {batch}{rejected}")
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+  parser.add_argument("--duration", type=float, default=10)
+  parser.add_argument("--concurrency", type=int, default=2, help="concurrent requests per worker")
+  parser.add_argument("--comments", type=int, default=32, help="comments per request")
+  parser.add_argument("--real", action="store_true", help="load the real models instead of synthetic ones")
+  parser.add_argument("--ner-mb", type=int, default=300, help="synthetic NER weights")
+  parser.add_argument("--sentiment-mb", type=int, default=100, help="synthetic sentiment weights")
+  parser.add_argument("--call-ms", type=float, default=20, help="synthetic cost per model call")
+  parser.add_argument("--item-ms", type=float, default=1, help="synthetic cost per input")
+  parser.add_argument("--socket", help=argparse.SUPPRESS)
+  parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+  parser.add_argument("--client", choices=["local", "sidecar"], help=argparse.SUPPRESS)
+  args = parser.parse_args()
+
+  if args.serve:
+    from backend.inference_server import serve
+    asyncio.run(serve(create_registry(args, remote=False), args.socket))
+  elif args.client:
+    print(json.dumps(asyncio.run(run_worker(args))))
+  else:
+    main(args)
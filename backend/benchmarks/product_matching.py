@@ -0,0 +1,58 @@
+"""
+Benchmark product-to-comment matching: the old nested substring loop from
+analyze_sentiments against ProductMatcher.
+
+  python -m backend.benchmarks.product_matching --comments 10000 --products 1000
+"""
+import argparse
+import random
+import string
+import time
+
+from backend.models.product import Product
+from backend.services.product_matcher import ProductMatcher
+
+def random_word(rng: random.Random, length: int) -> str:
+  return "".join(rng.choice(string.ascii_lowercase) for _ in range(length))
+
+def build_data(num_comments: int, num_products: int, seed: int = 7):
+  rng = random.Random(seed)
+  products = [
+    Product(brand_name=random_word(rng, rng.randint(3, 9)).title(), product_name=f"{random_word(rng, 6)} {random_word(rng, 5)}")
+    for _ in range(num_products)
+  ]
+  vocabulary = [random_word(rng, rng.randint(2, 8)) for _ in range(5000)]
+  comments = []
+  for _ in range(num_comments):
+    words = rng.choices(vocabulary, k=rng.randint(20, 80))
+    for _ in range(rng.randint(0, 3)):
+      product = rng.choice(products)
+      words.insert(rng.randrange(len(words) + 1), rng.choice([product.brand_name, product.product_name]))
+    comments.append(" ".join(words))
+  return comments, products
+
+def legacy_match(comments, products) -> int:
+  matches = 0
+  for body in comments:
+    for product in products:
+      if (product.brand_name.lower() in body.lower() or
+        product.product_name.lower() in body.lower()):
+        matches += 1
+  return matches
+
+def matcher_match(comments, products) -> int:
+  matcher = ProductMatcher(products)
+  return sum(len(matcher.match(body)) for body in comments)
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--comments", type=int, default=10000)
+  parser.add_argument("--products", type=int, default=1000)
+  args = parser.parse_args()
+
+  comments, products = build_data(args.comments, args.products)
+  print(f"{args.comments} comments x {args.products} products")
+  for name, func in [("legacy loop", legacy_match), ("ProductMatcher", matcher_match)]:
+    started = time.perf_counter()
+    matches = func(comments, products)
+    print(f"  {name:<15} {time.perf_counter() - started:8.2f}s  {matches} matches")
@@ -0,0 +1,199 @@
+"""
+End-to-end POST /search/ benchmark against a replay fixture: no network, no
+Redis. Reports p50/p99 latency, throughput at each concurrency level and peak
+memory.
+
+Record a fixture from real searches by running the API with REPLAY_MODE=record
+(it's written to REPLAY_FIXTURE on shutdown), or generate a synthetic one:
+
+  python -m backend.benchmarks.search_replay --generate fixtures/replay.json
+  python -m backend.benchmarks.search_replay --fixture fixtures/replay.json --concurrency 1 4 16
+  python -m backend.benchmarks.search_replay --latency-scale 0 --fake-models   # pipeline overhead only
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import resource
+import statistics
+import time
+import tracemalloc
+from typing import Dict, List
+
+import httpx
+
+from backend.core.config import Config
+from backend.core.replay import FIXTURE_VERSION, Cassette
+from backend.services.model_registry import ModelRegistry
+from backend.services.ner_filter import ner_cache
+
+BRANDS = ["Lodge", "Zojirushi", "Vitamix", "Darn Tough", "Le Creuset", "Cuisinart", "Victorinox", "Red Wing"]
+PRODUCTS = ["Skillet", "Neuro Fuzzy", "5200", "Hiker Socks", "Dutch Oven", "Toaster", "Fibrox", "Iron Ranger"]
+OPINIONS = ["still going strong after years", "was a waste of money", "is the best thing I own", "broke after a month", "is fine I guess"]
+
+def chat_completion(model: str, content: dict) -> dict:
+  return {
+    "id": "chatcmpl-replay",
+    "object": "chat.completion",
+    "created": 0,
+    "model": model,
+    "choices": [{
+      "index": 0,
+      "finish_reason": "stop",
+      "message": {"role": "assistant", "content": json.dumps(content)}
+    }]
+  }
+
+def openai_interaction(model: str, content: dict, elapsed: float) -> dict:
+  return {
+    "service": "openai",
+    "keys": [f"POST /chat/completions {model}"],
+    "response": {"status": 200, "content_type": "application/json", "body": json.dumps(chat_completion(model, content))},
+    "elapsed": elapsed
+  }
+
+def generate_fixture(path: str, submissions: int, comments: int, seed: int = 7):
+  rng = random.Random(seed)
+  interactions = []
+  for subreddit in Config.SEARCH_SUBREDDITS:
+    interactions.append({
+      "service": "reddit", "keys": [f"subreddit {subreddit.lower()}"], "elapsed": 0.15,
+      "response": {"id": subreddit, "display_name": subreddit, "created_utc": 0, "subscribers": 1000, "over18": False}
+    })
+    listing = [
+      {"id": f"{subreddit}{i}", "title": f"Submission {i}", "created_utc": 0, "name": f"t3_{subreddit}{i}",
+       "score": rng.randint(1, 500), "upvote_ratio": 0.9, "over_18": False, "num_comments": comments}
+      for i in range(submissions)
+    ]
+    interactions.append({"service": "reddit", "keys": [f"search {subreddit.lower()}"], "response": listing, "elapsed": 0.4})
+    for submission in listing:
+      thread = []
+      for j in range(comments):
+        i = rng.randrange(len(BRANDS))
+        body = f"My {BRANDS[i]} {PRODUCTS[i]} {rng.choice(OPINIONS)}." if rng.random() < 0.6 else f"I'd say it {rng.choice(OPINIONS)}."
+        parent = f"t1_{submission['id']}c{rng.randrange(j)}" if j and rng.random() < 0.5 else f"t3_{submission['id']}"
+        thread.append({"id": f"{submission['id']}c{j}", "body": body, "score": rng.randint(-5, 200), "parent_id": parent, "created_utc": j})
+      interactions.append({"service": "reddit", "keys": [f"comments {submission['id']}"], "response": thread, "elapsed": 0.6})
+
+  interactions.append(openai_interaction("gpt-4o-2024-08-06", {"included_words": [], "excluded_words": ["toaster"]}, 1.2))
+  interactions.append(openai_interaction("gpt-4o-mini-2024-07-18", {"products": [
+    {"product": {"brand_name": brand, "product_name": product}, "score": 0}
+    for brand, product in zip(BRANDS, PRODUCTS)
+  ]}, 2.0))
+  with open(path, "w") as f:
+    json.dump({"version": FIXTURE_VERSION, "interactions": interactions}, f)
+  print(f"Wrote {len(interactions)} interactions to {path}")
+
+def fake_model_loader(task: str, **kwargs):
+  """Keyword models, for measuring the pipeline without inference cost."""
+  capitalized = re.compile(r"(?<=\s)[A-Z][a-z]+")
+  if task == "ner":
+    return lambda bodies, **kw: [
+      [{"entity_group": "ORG", "word": word, "score": 0.9} for word in capitalized.findall(body)] for body in bodies
+    ]
+  return lambda bodies, **kw: [
+    {"label": "NEGATIVE" if re.search(r"waste|broke", body) else "POSITIVE", "score": 0.9} for body in bodies
+  ]
+
+def percentile(values: List[float], q: float) -> float:
+  ordered = sorted(values)
+  return ordered[min(int(round(q * (len(ordered) - 1))), len(ordered) - 1)]
+
+def search_terms(cassette: Cassette) -> List[str]:
+  terms = set()
+  for interaction in cassette.interactions:
+    for key in interaction["keys"]:
+      parts = key.split(" ")
+      if parts[0] == "search" and len(parts) > 3:
+        terms.add(" ".join(parts[2:-1]))
+  return sorted(terms) or ["rice cooker"]
+
+async def run_level(client: httpx.AsyncClient, categories: List[str], concurrency: int, requests: int,
+                    request_offset: int, cold: bool, app) -> Dict[str, float]:
+  latencies = []
+  errors = 0
+  queue = list(range(requests))
+
+  async def worker():
+    nonlocal errors
+    while queue:
+      i = queue.pop()
+      if cold:
+        ner_cache.clear()
+        app.state.sentiment_cache.cache.local.clear()
+      # a distinct price per request keeps the search cache and request coalescing out of the way
+      body = {"product_category": categories[i % len(categories)], "min_price": request_offset + i,
+              "max_price": 1_000_000, "sites": [], "retailers": []}
+      started = time.perf_counter()
+      response = await client.post("/search/", json=body)
+      latencies.append(time.perf_counter() - started)
+      errors += response.status_code != 200
+
+  tracemalloc.reset_peak()
+  started = time.perf_counter()
+  await asyncio.gather(*[worker() for _ in range(concurrency)])
+  elapsed = time.perf_counter() - started
+  return {
+    "p50": statistics.median(latencies),
+    "p99": percentile(latencies, 0.99),
+    "throughput": requests / elapsed,
+    "errors": errors,
+    "peak_mb": tracemalloc.get_traced_memory()[1] / 1024 / 1024
+  }
+
+async def main(args):
+  Config.REPLAY_MODE = "replay"
+  Config.REPLAY_FIXTURE = args.fixture
+  Config.REPLAY_LATENCY_SCALE = args.latency_scale
+  Config.METRICS_ENABLED = False
+  from backend.main import app
+
+  tracemalloc.start()
+  async with app.router.lifespan_context(app):
+    if args.fake_models:
+      app.state.models = ModelRegistry(device=-1, loader=fake_model_loader)
+    app.state.replay.latency.update(args.latency)
+    categories = args.category or search_terms(app.state.replay)
+    print(f"Replaying {len(app.state.replay.interactions)} interactions for {categories}")
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://replay", timeout=None) as client:
+      # first request pays for model loading
+      await run_level(client, categories, 1, 1, -1, args.cold, app)
+      offset = 0
+      for concurrency in args.concurrency:
+        result = await run_level(client, categories, concurrency, args.requests, offset, args.cold, app)
+        offset += args.requests
+        print(
+          f"  concurrency {concurrency:>3}  p50 {result['p50'] * 1000:8.1f} ms  p99 {result['p99'] * 1000:8.1f} ms  "
+          f"{result['throughput']:7.2f} req/s  peak {result['peak_mb']:7.1f} MB traced  errors {result['errors']}"
+        )
+  # ru_maxrss is reported in kilobytes on Linux
+  print(f"Peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MB, replay misses {app.state.replay.misses}")
+
+def latency_arg(value: str):
+  service, _, seconds = value.partition("=")
+  return service, float(seconds)
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--fixture", default=Config.REPLAY_FIXTURE)
+  parser.add_argument("--generate", metavar="PATH", help="write a synthetic fixture to PATH and exit")
+  parser.add_argument("--submissions", type=int, default=10, help="per subreddit, with --generate")
+  parser.add_argument("--comments", type=int, default=100, help="per submission, with --generate")
+  parser.add_argument("--category", action="append", help="search categories (default: those in the fixture)")
+  parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+  parser.add_argument("--requests", type=int, default=32, help="searches per concurrency level")
+  parser.add_argument("--latency-scale", type=float, default=1.0, help="multiplier for recorded latencies")
+  parser.add_argument("--latency", type=latency_arg, action="append", default=[], metavar="SERVICE=SECONDS",
+                      help="fixed latency for a service (reddit, openai, redis)")
+  parser.add_argument("--fake-models", action="store_true", help="keyword NER/sentiment instead of the real models")
+  parser.add_argument("--cold", action="store_true", help="clear the in-process NER and sentiment caches before every search")
+  args = parser.parse_args()
+  args.latency = dict(args.latency)
+
+  if args.generate:
+    generate_fixture(args.generate, args.submissions, args.comments)
+  else:
+    asyncio.run(main(args))
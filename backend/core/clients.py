@@ -0,0 +1,113 @@
+import inspect
+import logging
+from typing import TYPE_CHECKING, Any, Callable
+
+import redis.asyncio as aioredis
+
+from backend.core.config import Config
+from backend.core.metrics import external_call
+
+if TYPE_CHECKING:
+  import asyncpraw
+
+logger = logging.getLogger(__name__)
+
+class InstrumentedRedis(aioredis.Redis):
+  """Times every command (pipelines as a whole) as an external call."""
+  async def execute_command(self, *args, **options):
+    async with external_call("redis", str(args[0]).lower()):
+      return await super().execute_command(*args, **options)
+
+  def pipeline(self, transaction: bool = True, shard_hint=None):
+    return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+class InstrumentedPipeline(aioredis.client.Pipeline):
+  async def execute(self, raise_on_error: bool = True):
+    async with external_call("redis", "pipeline"):
+      return await super().execute(raise_on_error)
+
+def create_redis_client() -> aioredis.Redis:
+  """App-scoped Redis client backed by a bounded connection pool."""
+  pool = aioredis.ConnectionPool.from_url(
+    Config.REDIS_URL,
+    max_connections=Config.REDIS_MAX_CONNECTIONS,
+    health_check_interval=Config.REDIS_HEALTH_CHECK_INTERVAL
+  )
+  return InstrumentedRedis(connection_pool=pool)
+
+async def close_redis_client(redis_client: aioredis.Redis):
+  await redis_client.close()
+  await redis_client.connection_pool.disconnect()
+
+class LazyClient:
+  """
+  Builds a client on first attribute access instead of at startup, so workers
+  that never touch a service don't pay for importing or constructing its client.
+  Everything else is delegated to the built client.
+  """
+  def __init__(self, factory: Callable[[], Any]):
+    self._factory = factory
+    self._client = None
+
+  @property
+  def built(self) -> bool:
+    return self._client is not None
+
+  def get(self) -> Any:
+    if self._client is None:
+      self._client = self._factory()
+    return self._client
+
+  def __getattr__(self, name: str):
+    return getattr(self.get(), name)
+
+  async def close(self):
+    # nothing to close if it was never built
+    if self._client is not None:
+      result = self._client.close()
+      if inspect.isawaitable(result):
+        await result
+
+def create_reddit_client() -> "asyncpraw.Reddit":
+  """
+  App-scoped asyncpraw client. Sharing it keeps the OAuth token and the aiohttp
+  connection pool alive across requests. Must be called from a running event loop.
+  """
+  # asyncpraw and aiohttp are slow to import and only needed once Reddit is called
+  import aiohttp
+  import asyncpraw
+
+  session = aiohttp.ClientSession(
+    connector=aiohttp.TCPConnector(limit=Config.REDDIT_MAX_CONNECTIONS, keepalive_timeout=30)
+  )
+  return asyncpraw.Reddit(
+    client_id=Config.REDDIT_CLIENT_ID,
+    client_secret=Config.REDDIT_CLIENT_SECRET,
+    user_agent=Config.REDDIT_USER_AGENT,
+    requestor_kwargs={"session": session}
+  )
+
+def redis_pool_stats(redis_client: aioredis.Redis) -> dict:
+  pool = redis_client.connection_pool
+  # private attributes, but they're the only view redis-py gives of pool usage
+  in_use = len(getattr(pool, "_in_use_connections", ()))
+  available = len(getattr(pool, "_available_connections", ()))
+  return {
+    "max_connections": pool.max_connections,
+    "open": in_use + available,
+    "available": available,
+    "in_use": in_use
+  }
+
+def reddit_pool_stats(reddit_client: "asyncpraw.Reddit") -> dict:
+  if isinstance(reddit_client, LazyClient) and not reddit_client.built:
+    return {}
+  # the aiohttp session isn't public API, so report what we can find
+  session = getattr(getattr(reddit_client, "requestor", None), "_http", None)
+  connector = getattr(session, "connector", None)
+  if connector is None:
+    return {}
+  return {
+    "max_connections": connector.limit,
+    "in_use": len(getattr(connector, "_acquired", ()))
+  }
@@ -5,22 +5,152 @@ from pathlib import Path
 env_path = Path(__file__).resolve().parent.parent / ".env"
 load_dotenv(dotenv_path=env_path)
 
+class Setting:
+  """
+  A setting computed on each access rather than at import, so a worker can boot
+  (and serve routes that don't need it) with some of the environment missing.
+  """
+  def __init__(self, read):
+    self.read = read
+
+  def __get__(self, instance, owner):
+    return self.read()
+
+class Required(Setting):
+  """An environment variable with no default; reading it while unset raises."""
+  def __init__(self, name: str):
+    self.name = name
+    super().__init__(self._read)
+
+  def _read(self) -> str:
+    value = os.environ.get(self.name)
+    if value is None:
+      raise RuntimeError(f"Missing required environment variable {self.name}")
+    return value
+
 class Config:
-  OPENAI_API_KEY = os.environ["OPENAI_API_KEY"]
-  REDDIT_CLIENT_ID = os.environ["REDDIT_CLIENT_ID"]
-  REDDIT_CLIENT_SECRET = os.environ["REDDIT_CLIENT_SECRET"]
-  REDDIT_USER_AGENT = os.environ["REDDIT_USER_AGENT"]
+  OPENAI_API_KEY = Required("OPENAI_API_KEY")
+  OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL") # point at a local mock server in tests
+  OPENAI_MAX_CONNECTIONS = int(os.environ.get("OPENAI_MAX_CONNECTIONS", "20"))
+  OPENAI_MAX_CONCURRENCY = int(os.environ.get("OPENAI_MAX_CONCURRENCY", "5"))
+  OPENAI_MAX_RETRIES = int(os.environ.get("OPENAI_MAX_RETRIES", "3"))
+  OPENAI_TIMEOUT = float(os.environ.get("OPENAI_TIMEOUT", "60"))
+  # prompt tokens of comment text per extraction batch
+  EXTRACTION_BATCH_TOKENS = int(os.environ.get("EXTRACTION_BATCH_TOKENS", "3000"))
+  EXTRACTION_BATCH_MAX_COMMENTS = int(os.environ.get("EXTRACTION_BATCH_MAX_COMMENTS", "50"))
+  # "openai", "local" (NER + gazetteer) or "hybrid" (local, low-confidence comments go to OpenAI)
+  EXTRACTION_BACKEND = os.environ.get("EXTRACTION_BACKEND", "openai")
+  # seconds between reloads of the learned brand gazetteer from Redis
+  GAZETTEER_REFRESH = float(os.environ.get("GAZETTEER_REFRESH", "300"))
+  # trigram similarity (0-1) at which an extracted product is treated as a variant of a catalogued one
+  CATALOGUE_MATCH_THRESHOLD = float(os.environ.get("CATALOGUE_MATCH_THRESHOLD", "0.7"))
+  CATALOGUE_REFRESH = float(os.environ.get("CATALOGUE_REFRESH", "300")) # seconds between reloads of the product catalogue
+  CATALOGUE_MAX_ENTRIES = int(os.environ.get("CATALOGUE_MAX_ENTRIES", "200000")) # per worker; least recently used entries are dropped past it
+  CATALOGUE_CHANGELOG_SIZE = int(os.environ.get("CATALOGUE_CHANGELOG_SIZE", "10000")) # saves kept for delta reloads; a worker further behind reloads everything
+  REDDIT_CLIENT_ID = Required("REDDIT_CLIENT_ID")
+  REDDIT_CLIENT_SECRET = Required("REDDIT_CLIENT_SECRET")
+  REDDIT_USER_AGENT = Required("REDDIT_USER_AGENT")
 
-  DB_USER = os.environ["PG_USER"]
-  DB_PASSWORD = os.environ["PG_PASSWORD"]
-  DB_HOST = os.environ["PG_HOST"]
-  DB_PORT = os.environ["PG_PORT"]
-  DB_NAME = os.environ["PG_DATABASE"]
+  DB_USER = Required("PG_USER")
+  DB_PASSWORD = Required("PG_PASSWORD")
+  DB_HOST = Required("PG_HOST")
+  DB_PORT = Required("PG_PORT")
+  DB_NAME = Required("PG_DATABASE")
 
-  DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+  DATABASE_URL = Setting(lambda: f"postgresql://{Config.DB_USER}:{Config.DB_PASSWORD}@{Config.DB_HOST}:{Config.DB_PORT}/{Config.DB_NAME}")
+  # async driver URL; set to e.g. "sqlite+aiosqlite:///./corpus.db" for a local stand-in (the PG_* variables aren't needed then)
+  ASYNC_DATABASE_URL = Setting(lambda: os.environ.get("ASYNC_DATABASE_URL") or f"postgresql+asyncpg://{Config.DB_USER}:{Config.DB_PASSWORD}@{Config.DB_HOST}:{Config.DB_PORT}/{Config.DB_NAME}")
+  DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "10"))
+  DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+  DB_UPSERT_BATCH_SIZE = int(os.environ.get("DB_UPSERT_BATCH_SIZE", "500"))
+  # serve searches from the local comment corpus, re-fetching only submissions with new comments
+  CORPUS_ENABLED = os.environ.get("CORPUS_ENABLED", "false").lower() == "true"
+  # seconds a subreddit search result is served from the corpus before Reddit is searched again
+  CORPUS_LISTING_TTL = float(os.environ.get("CORPUS_LISTING_TTL", "3600"))
 
   # Redis configuration
   REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379")
+  REDIS_MAX_CONNECTIONS = int(os.environ.get("REDIS_MAX_CONNECTIONS", "50"))
+  REDIS_HEALTH_CHECK_INTERVAL = int(os.environ.get("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+
+  # Search result cache (seconds fresh, then seconds served stale while refreshing)
+  SEARCH_CACHE_TTL = float(os.environ.get("SEARCH_CACHE_TTL", "3600"))
+  SEARCH_CACHE_STALE_TTL = float(os.environ.get("SEARCH_CACHE_STALE_TTL", "86400"))
+  SEARCH_CACHE_LRU_SIZE = int(os.environ.get("SEARCH_CACHE_LRU_SIZE", "256"))
+
+  # Subject phrase cache, keyed by normalized category
+  SUBJECT_PHRASES_TTL = float(os.environ.get("SUBJECT_PHRASES_TTL", str(7 * 24 * 3600)))
+  SUBJECT_PHRASES_CACHE_SIZE = int(os.environ.get("SUBJECT_PHRASES_CACHE_SIZE", "1024"))
+  SUBJECT_PHRASES_REFRESH = float(os.environ.get("SUBJECT_PHRASES_REFRESH", "300")) # seconds between reloads of known categories
+
+  # /chat/openai response cache, keyed by model, system prompt and message (0 turns it off)
+  CHAT_CACHE_TTL = float(os.environ.get("CHAT_CACHE_TTL", "86400"))
+  CHAT_CACHE_SIZE = int(os.environ.get("CHAT_CACHE_SIZE", "512"))
+
+  # Reddit fetching
+  SEARCH_SUBREDDITS = os.environ.get("SEARCH_SUBREDDITS", "buyitforlife").split(',')
+  REDDIT_MAX_CONNECTIONS = int(os.environ.get("REDDIT_MAX_CONNECTIONS", "20"))
+  REDDIT_MAX_CONCURRENCY = int(os.environ.get("REDDIT_MAX_CONCURRENCY", "8"))
+  REDDIT_RATELIMIT_MIN_REMAINING = float(os.environ.get("REDDIT_RATELIMIT_MIN_REMAINING", "5"))
+  SEARCH_FETCH_TIMEOUT = float(os.environ.get("SEARCH_FETCH_TIMEOUT", "20"))
+
+  BATCH_SEARCH_MAX_REQUESTS = int(os.environ.get("BATCH_SEARCH_MAX_REQUESTS", "500"))
+
+  # Background search jobs
+  JOB_RESULT_TTL = int(os.environ.get("JOB_RESULT_TTL", "3600"))
+  JOB_PROGRESS_LIMIT = int(os.environ.get("JOB_PROGRESS_LIMIT", "100"))
+  JOB_WORKER_PROCESSES = int(os.environ.get("JOB_WORKER_PROCESSES", "2"))
+  JOB_WORKER_CONCURRENCY = int(os.environ.get("JOB_WORKER_CONCURRENCY", "2")) # jobs per process
+  JOB_LEASE_TIMEOUT = int(os.environ.get("JOB_LEASE_TIMEOUT", "60")) # a running job without a heartbeat for this long is requeued
+  JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "3")) # runs before a job that keeps losing its worker is failed
+
+  # Transformer models
+  MODEL_DEVICE = int(os.environ.get("MODEL_DEVICE", "0"))
+  WARM_MODELS = os.environ.get("WARM_MODELS", "false").lower() == "true"
+  # "eager" (PyTorch fp32), "quantized" (int8 dynamic quantization) or "onnx" (ONNX Runtime, needs optimum)
+  MODEL_BACKEND = os.environ.get("MODEL_BACKEND", "eager")
+  # intra-op threads for inference; 0 keeps the library default
+  MODEL_THREADS = int(os.environ.get("MODEL_THREADS", "0"))
+  NER_BATCH_SIZE = int(os.environ.get("NER_BATCH_SIZE", "32"))
+  NER_EXECUTOR = os.environ.get("NER_EXECUTOR", "thread") # "thread" or "process"
+  NER_WORKERS = int(os.environ.get("NER_WORKERS", "2"))
+  NER_CACHE_SIZE = int(os.environ.get("NER_CACHE_SIZE", "50000"))
+  SENTIMENT_CACHE_SIZE = int(os.environ.get("SENTIMENT_CACHE_SIZE", "100000"))
+  SENTIMENT_CACHE_TTL = float(os.environ.get("SENTIMENT_CACHE_TTL", str(7 * 24 * 3600)))
+
+  # Shared inference sidecar (python -m backend.inference_server). When the socket is set, workers send
+  # NER and sentiment to it instead of loading their own models
+  INFERENCE_SOCKET = os.environ.get("INFERENCE_SOCKET")
+  INFERENCE_BATCH_WINDOW = float(os.environ.get("INFERENCE_BATCH_WINDOW", "0.01")) # seconds a request waits for others to batch with
+  INFERENCE_MAX_BATCH = int(os.environ.get("INFERENCE_MAX_BATCH", "64"))
+  INFERENCE_MAX_QUEUE = int(os.environ.get("INFERENCE_MAX_QUEUE", "2048")) # queued inputs per model before requests have to wait
+  INFERENCE_QUEUE_WAIT = float(os.environ.get("INFERENCE_QUEUE_WAIT", "5")) # seconds a request waits for room before it's turned away
+  INFERENCE_MAX_INFLIGHT = int(os.environ.get("INFERENCE_MAX_INFLIGHT", "16")) # requests per worker
+  INFERENCE_RETRIES = int(os.environ.get("INFERENCE_RETRIES", "5")) # when the sidecar is busy, unreachable or slow to answer
+  INFERENCE_TIMEOUT = float(os.environ.get("INFERENCE_TIMEOUT", "60"))
+
+  # Observability
+  METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+  EVENT_LOOP_LAG_INTERVAL = float(os.environ.get("EVENT_LOOP_LAG_INTERVAL", "0.5"))
+  # requests carrying this header get their stage breakdown back in a Server-Timing header
+  PROFILE_HEADER = os.environ.get("PROFILE_HEADER", "X-Profile")
+  LOG_PAYLOAD_CHARS = int(os.environ.get("LOG_PAYLOAD_CHARS", "300")) # longer payloads are truncated in logs
+  # log how long each import took at startup (slowest first)
+  STARTUP_REPORT = os.environ.get("STARTUP_REPORT", "false").lower() == "true"
+  STARTUP_REPORT_TOP = int(os.environ.get("STARTUP_REPORT_TOP", "15"))
+
+  # Record/replay of Reddit, OpenAI and Redis traffic ("record", "replay" or empty for off)
+  REPLAY_MODE = os.environ.get("REPLAY_MODE", "")
+  REPLAY_FIXTURE = os.environ.get("REPLAY_FIXTURE", "fixtures/replay.json")
+  REPLAY_LATENCY_SCALE = float(os.environ.get("REPLAY_LATENCY_SCALE", "1.0")) # multiplies recorded latencies
 
   # CORS origins
-  ALLOWED_ORIGINS = os.environ.get("ALLOWED_ORIGINS", "http://localhost:3000").split(',')
\ No newline at end of file
+  ALLOWED_ORIGINS = os.environ.get("ALLOWED_ORIGINS", "http://localhost:3000").split(',')
+
+  @classmethod
+  def missing(cls) -> list[str]:
+    """Required environment variables that aren't set."""
+    return [
+      setting.name for setting in vars(cls).values()
+      if isinstance(setting, Required) and setting.name not in os.environ
+    ]
\ No newline at end of file
@@ -1,16 +1,31 @@
 # backend/core/database.py
-import psycopg2
-from psycopg2.extras import RealDictCursor
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
 from backend.core.config import Config
 import logging
 
 logger = logging.getLogger(__name__)
 
-def get_db_connection():
+Base = declarative_base()
+
+def create_engine(url: str | None = None) -> AsyncEngine:
+  url = url or Config.ASYNC_DATABASE_URL
+  kwargs = {"pool_pre_ping": True}
+  if not url.startswith("sqlite"):
+    # sqlite (used as a local stand-in) has no real connection pool to size
+    kwargs.update(pool_size=Config.DB_POOL_SIZE, max_overflow=Config.DB_MAX_OVERFLOW)
+  return create_async_engine(url, **kwargs)
+
+def create_session_factory(engine: AsyncEngine) -> async_sessionmaker:
+  return async_sessionmaker(engine, expire_on_commit=False)
+
+async def create_tables(engine: AsyncEngine):
+  # import the models so they're registered on Base.metadata
+  from backend.models import comment_db, product_db, submission_db  # noqa: F401
   try:
-    conn = psycopg2.connect(Config.DATABASE_URL)
-    logger.info("Database connection successful")
-    return conn
+    async with engine.begin() as conn:
+      await conn.run_sync(Base.metadata.create_all)
+    logger.info("Database tables ready")
   except Exception as e:
     logger.error(f"Error connecting to the database: {e}")
     raise
\ No newline at end of file
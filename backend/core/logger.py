@@ -1,8 +1,16 @@
 import logging
 
+from backend.core.config import Config
+
 def setup_logging():
   logging.basicConfig(level=logging.INFO)
   logger = logging.getLogger("backend")
   return logger
 
+def truncate(value, limit: int | None = None) -> str:
+  """str(value), cut to LOG_PAYLOAD_CHARS so large payloads don't flood the logs."""
+  text = str(value)
+  limit = limit or Config.LOG_PAYLOAD_CHARS
+  return text if len(text) <= limit else f"{text[:limit]}... ({len(text)} chars)"
+
 logger = setup_logging()
\ No newline at end of file
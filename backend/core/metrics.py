@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+
+from prometheus_client import Counter, Histogram
+
+from backend.core.config import Config
+from backend.utils.timing import StageTimings, current_timings
+
+logger = logging.getLogger(__name__)
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+STAGE_SECONDS = Histogram(
+  "search_stage_seconds", "Time spent in each search pipeline stage", ["stage"], buckets=_LATENCY_BUCKETS
+)
+EXTERNAL_CALL_SECONDS = Histogram(
+  "external_call_seconds", "Latency of calls to Reddit, OpenAI and Redis", ["service", "operation", "outcome"],
+  buckets=_LATENCY_BUCKETS
+)
+CACHE_REQUESTS = Counter(
+  "cache_requests_total", "Cache lookups by cache and result (hit, miss or stale)", ["cache", "result"]
+)
+BATCH_SIZE = Histogram(
+  "batch_size", "Items per inference or extraction batch", ["stage"],
+  buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+)
+EVENT_LOOP_LAG = Histogram(
+  "event_loop_lag_seconds", "How late the event loop wakes a sleeping task",
+  buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+
+CHAT_TIME_TO_FIRST_TOKEN = Histogram(
+  "chat_time_to_first_token_seconds",
+  "Time until the first chunk of a chat completion (the whole completion when not streaming), by where it came from",
+  ["model", "mode", "source"], buckets=_LATENCY_BUCKETS
+)
+
+def observe_stage(stage: str, seconds: float):
+  STAGE_SECONDS.labels(stage).observe(seconds)
+
+def use_request_timings() -> StageTimings:
+  """
+  Timings of the current request (set up by ProfilingMiddleware when profiling
+  is requested), or a fresh instrumented set installed for the current task.
+  """
+  timings = current_timings.get()
+  if timings is None:
+    timings = StageTimings(observer=observe_stage)
+    current_timings.set(timings)
+  return timings
+
+def record_cache(cache: str, hits: int = 0, misses: int = 0, stale: int = 0):
+  for result, count in (("hit", hits), ("miss", misses), ("stale", stale)):
+    if count:
+      CACHE_REQUESTS.labels(cache, result).inc(count)
+
+def observe_time_to_first_token(model: str, mode: str, source: str, seconds: float):
+  CHAT_TIME_TO_FIRST_TOKEN.labels(model, mode, source).observe(seconds)
+
+def observe_batch(stage: str, size: int):
+  BATCH_SIZE.labels(stage).observe(size)
+
+@asynccontextmanager
+async def external_call(service: str, operation: str):
+  """
+  Time a call to an external service. Besides the histogram, the call shows up
+  in the current request's stage breakdown as "<service>.<operation>".
+  """
+  timings = current_timings.get()
+  started = time.perf_counter()
+  outcome = "ok"
+  try:
+    yield
+  except BaseException:
+    outcome = "error"
+    raise
+  finally:
+    ended = time.perf_counter()
+    EXTERNAL_CALL_SECONDS.labels(service, operation, outcome).observe(ended - started)
+    if timings is not None:
+      timings.record(f"{service}.{operation}", started, ended)
+
+async def monitor_event_loop_lag(interval: float | None = None):
+  """Runs until cancelled, sampling how far past its deadline each sleep wakes up."""
+  interval = interval or Config.EVENT_LOOP_LAG_INTERVAL
+  loop = asyncio.get_running_loop()
+  while True:
+    expected = loop.time() + interval
+    await asyncio.sleep(interval)
+    lag = max(loop.time() - expected, 0.0)
+    EVENT_LOOP_LAG.observe(lag)
+    if lag > 1:
+      logger.warning(f"Event loop lagged {lag:.2f}s")
+
+class ProfilingMiddleware:
+  """
+  Opt-in per-request profiling: requests that send PROFILE_HEADER get their stage
+  and external call breakdown back in a Server-Timing response header. Streamed
+  responses only include what finished before the first byte was sent.
+  """
+  def __init__(self, app, header: str | None = None):
+    self.app = app
+    self.header = (header or Config.PROFILE_HEADER).lower().encode()
+
+  async def __call__(self, scope, receive, send):
+    if scope["type"] != "http" or not any(
+      name == self.header and value.lower() not in (b"", b"0", b"false") for name, value in scope["headers"]
+    ):
+      await self.app(scope, receive, send)
+      return
+
+    timings = StageTimings(observer=observe_stage)
+    token = current_timings.set(timings)
+
+    async def send_with_timings(message):
+      if message["type"] == "http.response.start":
+        total_ms = round((time.perf_counter() - timings.started) * 1000, 1)
+        server_timing = ", ".join(filter(None, [f"total;dur={total_ms}", timings.server_timing()]))
+        message = {**message, "headers": [*message.get("headers", []), (b"server-timing", server_timing.encode())]}
+      await send(message)
+
+    try:
+      await self.app(scope, receive, send_with_timings)
+    finally:
+      current_timings.reset(token)
@@ -0,0 +1,421 @@
+"""
+Record/replay of the app's external interactions (Reddit through asyncpraw,
+OpenAI over HTTP, Redis commands) to a JSON fixture file, so searches can be
+rerun offline with realistic or injected latency.
+
+With REPLAY_MODE=record the real clients are wrapped and every interaction is
+written to REPLAY_FIXTURE on shutdown. With REPLAY_MODE=replay no network is
+touched: responses come from the fixture, each delayed by its recorded latency
+times REPLAY_LATENCY_SCALE (or a fixed per-service latency).
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import httpx
+import redis.asyncio as aioredis
+
+from backend.core.clients import InstrumentedRedis, LazyClient, create_redis_client, create_reddit_client
+from backend.core.config import Config
+from backend.core.metrics import external_call
+from backend.services.openai_service import create_openai_client
+
+logger = logging.getLogger(__name__)
+
+FIXTURE_VERSION = 1
+
+# the asyncpraw attributes RedditService reads
+SUBREDDIT_FIELDS = ["id", "display_name", "created_utc", "subscribers", "over18"]
+SUBMISSION_FIELDS = ["id", "title", "created_utc", "name", "score", "upvote_ratio", "over_18", "num_comments"]
+COMMENT_FIELDS = ["id", "body", "score", "parent_id", "created_utc"]
+
+class ReplayMiss(LookupError):
+  pass
+
+def _digest(value) -> str:
+  return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+class Cassette:
+  """
+  Recorded interactions. Each one is stored under a list of keys from most to
+  least specific; replay uses the most specific key that was recorded and
+  cycles through the responses recorded under it.
+  """
+  def __init__(self, path: str, latency_scale: float | None = None, latency: Optional[Dict[str, float]] = None):
+    self.path = path
+    self.latency_scale = Config.REPLAY_LATENCY_SCALE if latency_scale is None else latency_scale
+    # fixed seconds per service, overriding the recorded latency
+    self.latency = latency or {}
+    self.interactions: List[dict] = []
+    self._index: Dict[str, List[dict]] = defaultdict(list)
+    self._cursors: Dict[str, int] = defaultdict(int)
+    self.misses = 0
+
+  @classmethod
+  def load(cls, path: str, **kwargs) -> "Cassette":
+    cassette = cls(path, **kwargs)
+    with open(path) as f:
+      data = json.load(f)
+    if data.get("version") != FIXTURE_VERSION:
+      raise ValueError(f"Unsupported replay fixture version: {data.get('version')}")
+    for interaction in data["interactions"]:
+      cassette._add(interaction)
+    return cassette
+
+  def _add(self, interaction: dict):
+    self.interactions.append(interaction)
+    for key in interaction["keys"]:
+      self._index[f"{interaction['service']}|{key}"].append(interaction)
+
+  def record(self, service: str, keys: List[str], response: Any, elapsed: float):
+    self._add({"service": service, "keys": keys, "response": response, "elapsed": round(elapsed, 4)})
+
+  def save(self, path: str | None = None):
+    path = path or self.path
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+      json.dump({"version": FIXTURE_VERSION, "interactions": self.interactions}, f)
+    os.replace(tmp_path, path)
+    logger.info(f"Saved {len(self.interactions)} recorded interactions to {path}")
+
+  def delay(self, service: str, interaction: dict) -> float:
+    if service in self.latency:
+      return self.latency[service]
+    return interaction["elapsed"] * self.latency_scale
+
+  async def replay(self, service: str, keys: List[str]) -> Any:
+    for key in keys:
+      index_key = f"{service}|{key}"
+      recorded = self._index.get(index_key)
+      if recorded:
+        interaction = recorded[self._cursors[index_key] % len(recorded)]
+        self._cursors[index_key] += 1
+        delay = self.delay(service, interaction)
+        if delay > 0:
+          await asyncio.sleep(delay)
+        return interaction["response"]
+    self.misses += 1
+    raise ReplayMiss(f"No recorded {service} interaction for {keys[0]}")
+
+# Reddit
+
+def _fields(obj, fields: List[str]) -> dict:
+  return {field: getattr(obj, field, None) for field in fields}
+
+def _subreddit_keys(name: str) -> List[str]:
+  return [f"subreddit {name.lower()}"]
+
+def _search_keys(name: str, term: str, limit) -> List[str]:
+  return [f"search {name.lower()} {term.lower()} {limit}", f"search {name.lower()}"]
+
+def _comments_keys(submission_id: str) -> List[str]:
+  return [f"comments {submission_id}"]
+
+class _Proxy:
+  def __init__(self, wrapped):
+    self._wrapped = wrapped
+
+  def __getattr__(self, name):
+    return getattr(self._wrapped, name)
+
+class _RecordingSubreddit(_Proxy):
+  def __init__(self, wrapped, cassette: Cassette, name: str):
+    super().__init__(wrapped)
+    self._cassette = cassette
+    self._name = name
+
+  async def load(self):
+    started = time.perf_counter()
+    await self._wrapped.load()
+    self._cassette.record("reddit", _subreddit_keys(self._name), _fields(self._wrapped, SUBREDDIT_FIELDS), time.perf_counter() - started)
+
+  async def search(self, query: str, limit=None, **kwargs):
+    started = time.perf_counter()
+    submissions = []
+    async for submission in self._wrapped.search(query, limit=limit, **kwargs):
+      submissions.append(_fields(submission, SUBMISSION_FIELDS))
+      yield submission
+    self._cassette.record("reddit", _search_keys(self._name, query, limit), submissions, time.perf_counter() - started)
+
+class _RecordingComments(_Proxy):
+  def __init__(self, wrapped, submission: "_RecordingSubmission"):
+    super().__init__(wrapped)
+    self._submission = submission
+
+  async def replace_more(self, *args, **kwargs):
+    started = time.perf_counter()
+    result = await self._wrapped.replace_more(*args, **kwargs)
+    self._submission._elapsed += time.perf_counter() - started
+    return result
+
+  def list(self):
+    comments = self._wrapped.list()
+    self._submission._cassette.record(
+      "reddit", _comments_keys(self._submission._id),
+      [_fields(comment, COMMENT_FIELDS) for comment in comments if hasattr(comment, "body")],
+      self._submission._elapsed
+    )
+    return comments
+
+class _RecordingSubmission(_Proxy):
+  def __init__(self, wrapped, cassette: Cassette, submission_id: str):
+    super().__init__(wrapped)
+    self._cassette = cassette
+    self._id = submission_id
+    self._elapsed = 0.0
+
+  async def load(self):
+    started = time.perf_counter()
+    await self._wrapped.load()
+    self._elapsed += time.perf_counter() - started
+
+  @property
+  def comments(self):
+    return _RecordingComments(self._wrapped.comments, self)
+
+class RecordingReddit(_Proxy):
+  """Wraps an asyncpraw.Reddit, recording what RedditService reads from it."""
+  def __init__(self, wrapped, cassette: Cassette):
+    super().__init__(wrapped)
+    self._cassette = cassette
+
+  async def subreddit(self, display_name: str, **kwargs):
+    return _RecordingSubreddit(await self._wrapped.subreddit(display_name, **kwargs), self._cassette, display_name)
+
+  async def submission(self, id: str, **kwargs):
+    return _RecordingSubmission(await self._wrapped.submission(id=id, **kwargs), self._cassette, id)
+
+class _ReplaySubreddit:
+  def __init__(self, cassette: Cassette, name: str):
+    self._cassette = cassette
+    self.display_name = name
+
+  async def load(self):
+    self.__dict__.update(await self._cassette.replay("reddit", _subreddit_keys(self.display_name)))
+
+  async def search(self, query: str, limit=None, **kwargs):
+    for submission in await self._cassette.replay("reddit", _search_keys(self.display_name, query, limit)):
+      yield SimpleNamespace(**submission)
+
+class _ReplayComments:
+  def __init__(self):
+    self._comments = []
+
+  async def replace_more(self, *args, **kwargs):
+    return []
+
+  def list(self):
+    return self._comments
+
+class _ReplaySubmission:
+  def __init__(self, cassette: Cassette, submission_id: str):
+    self._cassette = cassette
+    self.id = submission_id
+    self.comments = _ReplayComments()
+
+  async def load(self):
+    comments = await self._cassette.replay("reddit", _comments_keys(self.id))
+    self.comments._comments = [SimpleNamespace(**comment) for comment in comments]
+
+class ReplayReddit:
+  """Stands in for asyncpraw.Reddit, serving subreddits, searches and comments from a cassette."""
+  def __init__(self, cassette: Cassette):
+    self._cassette = cassette
+
+  async def subreddit(self, display_name: str, **kwargs):
+    return _ReplaySubreddit(self._cassette, display_name)
+
+  async def submission(self, id: str, **kwargs):
+    return _ReplaySubmission(self._cassette, id)
+
+  async def close(self):
+    pass
+
+# OpenAI (at the HTTP layer, so the SDK still does its own parsing)
+
+def _openai_keys(request: httpx.Request) -> List[str]:
+  content = request.content
+  try:
+    model = json.loads(content).get("model")
+  except (ValueError, AttributeError):
+    model = None
+  # keyed without the API prefix, so fixtures work against any OPENAI_BASE_URL
+  path = request.url.path.removeprefix("/v1")
+  return [f"{request.method} {path} {hashlib.sha256(content).hexdigest()[:16]}", f"{request.method} {path} {model}", f"{request.method} {path}"]
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+  def __init__(self, cassette: Cassette, transport: httpx.AsyncBaseTransport | None = None):
+    self.cassette = cassette
+    self.transport = transport or httpx.AsyncHTTPTransport()
+
+  async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+    started = time.perf_counter()
+    response = await self.transport.handle_async_request(request)
+    body = await response.aread()
+    await response.aclose()
+    content_type = response.headers.get("content-type", "application/json")
+    self.cassette.record("openai", _openai_keys(request), {
+      "status": response.status_code,
+      "content_type": content_type,
+      "body": body.decode()
+    }, time.perf_counter() - started)
+    # the body is already decoded, so drop the encoding headers
+    return httpx.Response(response.status_code, headers={"content-type": content_type}, content=body, request=request)
+
+  async def aclose(self):
+    await self.transport.aclose()
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+  def __init__(self, cassette: Cassette):
+    self.cassette = cassette
+
+  async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+    try:
+      recorded = await self.cassette.replay("openai", _openai_keys(request))
+    except ReplayMiss as e:
+      return httpx.Response(404, json={"error": {"message": str(e)}}, request=request)
+    return httpx.Response(
+      recorded["status"], headers={"content-type": recorded["content_type"]},
+      content=recorded["body"].encode(), request=request
+    )
+
+# Redis
+
+def _encode(value):
+  if isinstance(value, bytes):
+    return {"b64": base64.b64encode(value).decode()}
+  if isinstance(value, (list, tuple)):
+    return [_encode(item) for item in value]
+  if isinstance(value, set):
+    return {"set": [_encode(item) for item in value]}
+  if isinstance(value, dict):
+    return {"dict": [[_encode(k), _encode(v)] for k, v in value.items()]}
+  return value
+
+def _decode(value):
+  if isinstance(value, list):
+    return [_decode(item) for item in value]
+  if isinstance(value, dict):
+    if "b64" in value:
+      return base64.b64decode(value["b64"])
+    if "set" in value:
+      return {_decode(item) for item in value["set"]}
+    if "dict" in value:
+      return {_decode(k): _decode(v) for k, v in value["dict"]}
+  return value
+
+def _redis_keys(args) -> List[str]:
+  # values written (e.g. with timestamps) differ between runs, so fall back to command + key
+  command = str(args[0]).upper()
+  keys = [f"{command} {_digest([str(arg) for arg in args[1:]])}"]
+  if len(args) > 1:
+    keys.append(f"{command} {args[1]}")
+  keys.append(command)
+  return keys
+
+def _pipeline_keys(command_stack) -> List[str]:
+  commands = [str(args[0]).upper() for args, _ in command_stack]
+  return [
+    f"PIPELINE {_digest([[str(arg) for arg in args] for args, _ in command_stack])}",
+    f"PIPELINE {_digest([[str(arg) for arg in args[:2]] for args, _ in command_stack])}",
+    f"PIPELINE {' '.join(commands)}"
+  ]
+
+class _RecordingPipeline(aioredis.client.Pipeline):
+  cassette: Cassette
+
+  async def execute(self, raise_on_error: bool = True):
+    command_stack = list(self.command_stack)
+    started = time.perf_counter()
+    async with external_call("redis", "pipeline"):
+      responses = await super().execute(raise_on_error)
+    self.cassette.record("redis", _pipeline_keys(command_stack), _encode(responses), time.perf_counter() - started)
+    return responses
+
+class RecordingRedis(InstrumentedRedis):
+  def __init__(self, cassette: Cassette, **kwargs):
+    super().__init__(**kwargs)
+    self.cassette = cassette
+
+  async def execute_command(self, *args, **options):
+    started = time.perf_counter()
+    response = await super().execute_command(*args, **options)
+    self.cassette.record("redis", _redis_keys(args), _encode(response), time.perf_counter() - started)
+    return response
+
+  def pipeline(self, transaction: bool = True, shard_hint=None):
+    pipeline = _RecordingPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+    pipeline.cassette = self.cassette
+    return pipeline
+
+class _ReplayPipeline(aioredis.client.Pipeline):
+  cassette: Cassette
+
+  async def execute(self, raise_on_error: bool = True):
+    command_stack = list(self.command_stack)
+    await self.reset()
+    if not command_stack:
+      return []
+    async with external_call("redis", "pipeline"):
+      try:
+        return _decode(await self.cassette.replay("redis", _pipeline_keys(command_stack)))
+      except ReplayMiss:
+        return [_redis_miss(args) for args, _ in command_stack]
+
+def _redis_miss(args):
+  # what Redis answers when nothing is stored
+  command = str(args[0]).upper()
+  if command == "MGET":
+    return [None] * (len(args) - 1)
+  if command in ("SMEMBERS", "HGETALL", "LRANGE"):
+    return {"SMEMBERS": set(), "HGETALL": {}, "LRANGE": []}[command]
+  return None
+
+class ReplayRedis(aioredis.Redis):
+  """
+  Never connects. Commands that were recorded return their recorded reply;
+  anything else behaves like an empty database.
+  """
+  def __init__(self, cassette: Cassette):
+    super().__init__()
+    self.cassette = cassette
+
+  async def execute_command(self, *args, **options):
+    async with external_call("redis", str(args[0]).lower()):
+      try:
+        return _decode(await self.cassette.replay("redis", _redis_keys(args)))
+      except ReplayMiss:
+        return _redis_miss(args)
+
+  def pipeline(self, transaction: bool = True, shard_hint=None):
+    pipeline = _ReplayPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+    pipeline.cassette = self.cassette
+    return pipeline
+
+def open_cassette(mode: str | None = None, path: str | None = None) -> Cassette:
+  mode = mode or Config.REPLAY_MODE
+  path = path or Config.REPLAY_FIXTURE
+  if mode == "replay":
+    return Cassette.load(path)
+  if mode == "record":
+    return Cassette(path)
+  raise ValueError(f"Unknown replay mode: {mode}")
+
+def create_replay_clients(cassette: Cassette, mode: str | None = None):
+  """(redis, reddit, openai) clients that record to, or replay from, `cassette`."""
+  mode = mode or Config.REPLAY_MODE
+  if mode == "record":
+    return (
+      RecordingRedis(cassette, connection_pool=create_redis_client().connection_pool),
+      RecordingReddit(LazyClient(create_reddit_client), cassette),
+      LazyClient(lambda: create_openai_client(transport=RecordingTransport(cassette)))
+    )
+  return ReplayRedis(cassette), ReplayReddit(cassette), LazyClient(lambda: create_openai_client(transport=ReplayTransport(cassette)))
@@ -0,0 +1,114 @@
+"""
+Import-time accounting for worker cold starts. ImportTimer sits at the front of
+sys.meta_path and times the execution of every module imported after it's
+installed, so the startup log can show which imports a worker paid for (and
+which heavy ones it managed to avoid).
+"""
+import importlib.abc
+import logging
+import sys
+import threading
+import time
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+class _TimedLoader(importlib.abc.Loader):
+  def __init__(self, timer: "ImportTimer", loader):
+    self.timer = timer
+    self.loader = loader
+
+  def create_module(self, spec):
+    return self.loader.create_module(spec)
+
+  def exec_module(self, module):
+    self.timer._enter()
+    started = time.perf_counter()
+    try:
+      self.loader.exec_module(module)
+    finally:
+      self.timer._exit(module.__name__, time.perf_counter() - started)
+
+  def __getattr__(self, name):
+    # get_resource_reader, is_package etc. come from the real loader
+    return getattr(self.loader, name)
+
+class ImportTimer(importlib.abc.MetaPathFinder):
+  """
+  Records cumulative (including nested imports) and self time per module. Only
+  modules executed after `install()` are seen; builtins and already imported
+  modules cost nothing and don't show up.
+  """
+  def __init__(self):
+    self.cumulative: Dict[str, float] = {}
+    self.self_time: Dict[str, float] = {}
+    # per thread, since models may be imported off the event loop while the app imports other things
+    self._local = threading.local()
+    self._top_level = 0.0
+
+  def install(self) -> "ImportTimer":
+    if self not in sys.meta_path:
+      sys.meta_path.insert(0, self)
+    return self
+
+  def uninstall(self):
+    if self in sys.meta_path:
+      sys.meta_path.remove(self)
+
+  @property
+  def _children(self) -> List[float]:
+    # import times of the modules being executed on this thread, innermost last
+    if not hasattr(self._local, "children"):
+      self._local.children = []
+    return self._local.children
+
+  def find_spec(self, fullname, path, target=None):
+    # ask the remaining finders, then wrap whatever loader they come back with
+    for finder in sys.meta_path:
+      if finder is self or not hasattr(finder, "find_spec"):
+        continue
+      spec = finder.find_spec(fullname, path, target)
+      if spec is not None:
+        break
+    else:
+      return None
+    if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+      spec.loader = _TimedLoader(self, spec.loader)
+    return spec
+
+  def _enter(self):
+    self._children.append(0.0)
+
+  def _exit(self, name: str, seconds: float):
+    nested = self._children.pop()
+    self.cumulative[name] = seconds
+    self.self_time[name] = seconds - nested
+    if self._children:
+      self._children[-1] += seconds
+    else:
+      self._top_level += seconds
+
+  def total(self) -> float:
+    """Wall time spent in imports since install()."""
+    return self._top_level
+
+  def slowest(self, top: int = 15) -> List[Tuple[str, float]]:
+    """Top-level packages by total import time, e.g. ("openai", 0.64)."""
+    packages: Dict[str, float] = {}
+    for name, seconds in self.self_time.items():
+      package = name.split(".")[0]
+      packages[package] = packages.get(package, 0.0) + seconds
+    return sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+
+  def report(self, top: int = 15) -> dict:
+    return {
+      "import_seconds": round(self.total(), 3),
+      "modules": len(self.cumulative),
+      "slowest": {package: round(seconds, 3) for package, seconds in self.slowest(top)}
+    }
+
+  def log_report(self, top: int = 15):
+    slowest = ", ".join(f"{package} {seconds:.2f}s" for package, seconds in self.slowest(top))
+    logger.info(f"Startup imports: {len(self.cumulative)} modules in {self.total():.2f}s; slowest: {slowest}")
+
+import_timer = ImportTimer()
@@ -1,11 +1,46 @@
-import redis.asyncio as aioreddis
-from backend.core.config import Config
+from fastapi import Request
+from typing import TYPE_CHECKING
 from backend.services.reddit_service import RedditService
 from backend.services.openai_service import OpenAIService
+from backend.services.model_registry import ModelRegistry
+from backend.services.search_cache import SearchResultCache
+from backend.services.job_queue import JobQueue
+from backend.services.sentiment_cache import SentimentCache
 
-async def get_reddit_service() -> RedditService:
-  redis_client = aioreddis.from_url(Config.REDIS_URL)
-  return RedditService(redis_client)
+if TYPE_CHECKING:
+  # SQLAlchemy is only imported when the corpus is enabled
+  from backend.services.corpus_service import CorpusService
 
-async def get_openai_service() -> OpenAIService:
-  return OpenAIService()
\ No newline at end of file
+async def get_redis(request: Request):
+  return request.app.state.redis
+
+async def get_reddit_service(request: Request) -> RedditService:
+  # every client here is app-scoped; the service itself is a cheap per-request wrapper
+  state = request.app.state
+  return RedditService(
+    state.redis,
+    client=state.reddit,
+    scheduler=state.reddit_scheduler,
+    openai_client=state.openai,
+    extractor=state.extractor,
+    catalogue=state.catalogue
+  )
+
+async def get_openai_service(request: Request) -> OpenAIService:
+  state = request.app.state
+  return OpenAIService(state.openai, state.subject_phrases, state.chat_cache)
+
+async def get_model_registry(request: Request) -> ModelRegistry:
+  return request.app.state.models
+
+async def get_search_cache(request: Request) -> SearchResultCache:
+  return request.app.state.search_cache
+
+async def get_corpus(request: Request) -> "CorpusService | None":
+  return request.app.state.corpus
+
+async def get_job_queue(request: Request) -> JobQueue:
+  return request.app.state.job_queue
+
+async def get_sentiment_cache(request: Request) -> SentimentCache:
+  return request.app.state.sentiment_cache
\ No newline at end of file
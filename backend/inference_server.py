@@ -0,0 +1,268 @@
+"""
+Inference sidecar: one copy of the NER and sentiment models per node, shared by
+every API and job worker over a Unix socket (set INFERENCE_SOCKET for both).
+Requests for a model that arrive within INFERENCE_BATCH_WINDOW of each other
+run as one batch, whichever worker sent them. Once INFERENCE_MAX_QUEUE inputs
+are waiting for a model, new requests wait for room, so workers slow down to
+the rate the models keep up with; a request still waiting after
+INFERENCE_QUEUE_WAIT seconds is turned away and the worker backs off.
+
+  INFERENCE_SOCKET=/tmp/smart-search-inference.sock python -m backend.inference_server
+"""
+import argparse
+import asyncio
+import os
+import resource
+import signal
+import time
+from collections import deque
+from dataclasses import asdict
+from typing import Any, Callable, Deque, Dict, List, Tuple
+
+from backend.core.config import Config
+from backend.core.logger import logger
+from backend.services.inference_client import read_message, write_message
+from backend.services.model_registry import ModelRegistry
+from backend.services.ner_filter import run_ner_batch
+
+class Overloaded(Exception):
+  pass
+
+def run_sentiment_batch(sentiment_pipeline, bodies: List[str]) -> List[dict]:
+  results = sentiment_pipeline(bodies, truncation=True, max_length=512)
+  return [{"label": result["label"], "score": float(result["score"])} for result in results]
+
+# how each model is run on a batch, and what the workers get back
+BATCH_RUNNERS: Dict[str, Callable[[Any, List[str]], List[Any]]] = {
+  "ner": run_ner_batch,
+  "sentiment": run_sentiment_batch,
+}
+
+class DynamicBatcher:
+  """
+  Queued requests for one model, run a batch at a time on a thread. A batch
+  starts once its oldest request has waited `window` seconds or `max_batch`
+  inputs are queued, and takes whole requests up to `max_batch` inputs. While
+  `max_queue` inputs are queued, new requests wait up to `max_wait` seconds for
+  room before they're turned away.
+  """
+  def __init__(self, name: str, run_batch: Callable[[List[str]], List[Any]], window: float, max_batch: int, max_queue: int,
+               max_wait: float):
+    self.name = name
+    self.run_batch = run_batch
+    self.window = window
+    self.max_batch = max_batch
+    self.max_queue = max_queue
+    self.max_wait = max_wait
+    self.queue: Deque[Tuple[List[str], asyncio.Future, float]] = deque()
+    self.queued = 0
+    self.waiting = 0
+    self._arrived = asyncio.Event()
+    self._room = asyncio.Condition()
+    self.batches = 0
+    self.items = 0
+    self.largest_batch = 0
+    self.rejected = 0
+    self.busy_seconds = 0.0
+
+  def _has_room(self, size: int) -> bool:
+    # a request bigger than the queue still goes through on its own
+    return not self.queue or self.queued + size <= self.max_queue
+
+  async def submit(self, inputs: List[str]) -> List[Any]:
+    if not self._has_room(len(inputs)):
+      self.waiting += 1
+      try:
+        async with self._room:
+          await asyncio.wait_for(self._room.wait_for(lambda: self._has_room(len(inputs))), self.max_wait)
+      except asyncio.TimeoutError:
+        self.rejected += 1
+        raise Overloaded(f"{self.name} queue full ({self.queued} inputs waiting)")
+      finally:
+        self.waiting -= 1
+    future = asyncio.get_running_loop().create_future()
+    self.queue.append((inputs, future, time.monotonic()))
+    self.queued += len(inputs)
+    self._arrived.set()
+    return await future
+
+  async def _wait_for_batch(self):
+    while not self.queue:
+      self._arrived.clear()
+      await self._arrived.wait()
+    deadline = self.queue[0][2] + self.window
+    while self.queued < self.max_batch and (remaining := deadline - time.monotonic()) > 0:
+      self._arrived.clear()
+      try:
+        await asyncio.wait_for(self._arrived.wait(), remaining)
+      except asyncio.TimeoutError:
+        break
+
+  def _take_batch(self) -> List[Tuple[List[str], asyncio.Future]]:
+    batch, size = [], 0
+    while self.queue and (not batch or size + len(self.queue[0][0]) <= self.max_batch):
+      inputs, future, _ = self.queue.popleft()
+      self.queued -= len(inputs)
+      # the worker gave up waiting (timeout or disconnect)
+      if future.done():
+        continue
+      batch.append((inputs, future))
+      size += len(inputs)
+    return batch
+
+  async def run(self):
+    while True:
+      await self._wait_for_batch()
+      batch = self._take_batch()
+      async with self._room:
+        self._room.notify_all()
+      if not batch:
+        continue
+      inputs = [text for request_inputs, _ in batch for text in request_inputs]
+      started = time.perf_counter()
+      try:
+        outputs = await asyncio.to_thread(self.run_batch, inputs)
+      except Exception as e:
+        logger.exception(f"Inference batch for {self.name} failed")
+        for _, future in batch:
+          if not future.done():
+            future.set_exception(e)
+        continue
+      finally:
+        self.busy_seconds += time.perf_counter() - started
+      self.batches += 1
+      self.items += len(inputs)
+      self.largest_batch = max(self.largest_batch, len(inputs))
+      position = 0
+      for request_inputs, future in batch:
+        if not future.done():
+          future.set_result(outputs[position:position + len(request_inputs)])
+        position += len(request_inputs)
+
+  def stats(self) -> dict:
+    return {
+      "batches": self.batches,
+      "items": self.items,
+      "mean_batch": self.items / self.batches if self.batches else 0.0,
+      "largest_batch": self.largest_batch,
+      "queued": self.queued,
+      "waiting": self.waiting,
+      "rejected": self.rejected,
+      "busy_seconds": self.busy_seconds
+    }
+
+class InferenceServer:
+  def __init__(self, models: ModelRegistry, path: str, window: float | None = None, max_batch: int | None = None,
+               max_queue: int | None = None, max_wait: float | None = None):
+    self.models = models
+    self.path = path
+    self.batchers = {
+      name: DynamicBatcher(
+        name,
+        lambda inputs, name=name, run=run: run(self.models.get(name), inputs),
+        Config.INFERENCE_BATCH_WINDOW if window is None else window,
+        max_batch or Config.INFERENCE_MAX_BATCH,
+        max_queue or Config.INFERENCE_MAX_QUEUE,
+        Config.INFERENCE_QUEUE_WAIT if max_wait is None else max_wait
+      )
+      for name, run in BATCH_RUNNERS.items()
+    }
+    self._server = None
+    self._tasks: List[asyncio.Task] = []
+    # open connections and their handlers
+    self._connections: Dict[asyncio.StreamWriter, asyncio.Task] = {}
+
+  async def start(self):
+    # a socket file left behind by a previous run would make bind fail
+    if os.path.exists(self.path):
+      os.unlink(self.path)
+    self._tasks = [asyncio.create_task(batcher.run()) for batcher in self.batchers.values()]
+    self._server = await asyncio.start_unix_server(self.handle, self.path)
+    logger.info(f"Inference sidecar listening on {self.path}")
+
+  async def close(self):
+    if self._server is not None:
+      self._server.close()
+    # handlers see the connection end and exit
+    for writer in list(self._connections):
+      writer.close()
+    await asyncio.gather(*self._connections.values(), return_exceptions=True)
+    for task in self._tasks:
+      task.cancel()
+    await asyncio.gather(*self._tasks, return_exceptions=True)
+    if os.path.exists(self.path):
+      os.unlink(self.path)
+
+  async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    self._connections[writer] = asyncio.current_task()
+    write_lock = asyncio.Lock()
+    requests = set()
+    try:
+      while True:
+        message = await read_message(reader)
+        # answered as they finish, so one worker's requests don't queue behind each other
+        task = asyncio.create_task(self.respond(message, writer, write_lock))
+        requests.add(task)
+        task.add_done_callback(requests.discard)
+    except (asyncio.IncompleteReadError, ConnectionError):
+      pass
+    finally:
+      self._connections.pop(writer, None)
+      for task in requests:
+        task.cancel()
+      writer.close()
+
+  async def respond(self, message: dict, writer: asyncio.StreamWriter, write_lock: asyncio.Lock):
+    response: Dict[str, Any] = {"id": message.get("id")}
+    try:
+      if message.get("op") == "stats":
+        response["stats"] = self.stats()
+      else:
+        batcher = self.batchers.get(message.get("model"))
+        if batcher is None:
+          raise ValueError(f"Unknown model: {message.get('model')}")
+        response["outputs"] = await batcher.submit(message["inputs"])
+    except Overloaded as e:
+      response.update(error=str(e), overloaded=True)
+    except Exception as e:
+      response["error"] = f"{e.__class__.__name__}: {e}"
+    async with write_lock:
+      try:
+        write_message(writer, response)
+        await writer.drain()
+      except ConnectionError:
+        pass
+
+  def stats(self) -> dict:
+    return {
+      "connections": len(self._connections),
+      # ru_maxrss is in kilobytes on Linux
+      "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+      "models": {name: asdict(stats) for name, stats in self.models.stats().items()},
+      "batchers": {name: batcher.stats() for name, batcher in self.batchers.items()}
+    }
+
+async def serve(models: ModelRegistry, path: str, warm: bool = True):
+  if warm:
+    # loading blocks, so keep it off the event loop
+    await asyncio.to_thread(models.warm, list(BATCH_RUNNERS))
+  server = InferenceServer(models, path)
+  await server.start()
+  stop = asyncio.Event()
+  loop = asyncio.get_running_loop()
+  for sig in (signal.SIGINT, signal.SIGTERM):
+    loop.add_signal_handler(sig, stop.set)
+  try:
+    await stop.wait()
+  finally:
+    logger.info(f"Inference sidecar stopping: {server.stats()['batchers']}")
+    await server.close()
+    models.close()
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--socket", default=Config.INFERENCE_SOCKET, help="defaults to INFERENCE_SOCKET")
+  args = parser.parse_args()
+  if not args.socket:
+    parser.error("set INFERENCE_SOCKET or pass --socket")
+  asyncio.run(serve(ModelRegistry(), args.socket))
@@ -1,34 +1,126 @@
+# timed first, so the startup report covers every import below
+from backend.core.config import Config
+from backend.core.startup import import_timer
+if Config.STARTUP_REPORT:
+  import_timer.install()
+
 # fastapi
+import asyncio
+import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-import redis.asyncio as aioredis
 
-from backend.core.config import Config
 from backend.core.logger import logger
+from backend.core.metrics import ProfilingMiddleware, monitor_event_loop_lag
+from backend.core.clients import LazyClient, create_redis_client, close_redis_client, create_reddit_client
+from backend.core.replay import create_replay_clients, open_cassette
+from backend.services.reddit_scheduler import RedditScheduler
+from backend.services.model_registry import create_model_registry
+from backend.services.ner_filter import shutdown_executor
+from backend.services.openai_service import create_openai_client
+from backend.services.search_cache import SearchResultCache
+from backend.services.job_queue import JobQueue
+from backend.services.sentiment_cache import SentimentCache
+from backend.services.subject_phrases import SubjectPhraseCache
+from backend.services.chat_cache import ChatResponseCache
+from backend.services.gazetteer import BrandGazetteer
+from backend.services.product_catalogue import ProductCatalogue
+from backend.services.extractors import create_extractor
 
 from backend.api.endpoints.reddit import router as reddit_router
 from backend.api.endpoints.chat import router as chat_router
 from backend.api.endpoints.search import router as search_router
+from backend.api.endpoints.health import router as health_router
+from backend.api.endpoints.jobs import router as jobs_router
+from backend.api.endpoints.metrics import router as metrics_router
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+  started = time.perf_counter()
+  missing = Config.missing()
+  if missing:
+    # settings are checked when first used, so routes that don't need these still work
+    logger.warning(f"Application startup: environment variables not set: {', '.join(missing)}")
+
+  app.state.replay = None
+  if Config.REPLAY_MODE:
+    # Reddit, OpenAI and Redis traffic is recorded to (or served from) a fixture file
+    app.state.replay = open_cassette()
+    app.state.redis, app.state.reddit, app.state.openai = create_replay_clients(app.state.replay)
+    logger.info(f"Application startup: {Config.REPLAY_MODE} mode using {Config.REPLAY_FIXTURE}")
+  else:
+    app.state.redis = create_redis_client()
+    # built (and their SDKs imported) on first use, shared by every request after that
+    app.state.reddit = LazyClient(create_reddit_client)
+    app.state.openai = LazyClient(create_openai_client)
+  logger.info("Application startup: Redis connection pool initialized.")
+  app.state.search_cache = SearchResultCache(app.state.redis)
+  app.state.job_queue = JobQueue(app.state.redis)
+  app.state.sentiment_cache = SentimentCache(app.state.redis)
+  app.state.subject_phrases = SubjectPhraseCache(app.state.redis)
+  app.state.chat_cache = ChatResponseCache(app.state.redis)
+
+  # shared so the concurrency bound applies across all requests on this worker
+  app.state.reddit_scheduler = RedditScheduler(app.state.reddit)
+
+  app.state.db_engine = None
+  app.state.corpus = None
+  if Config.CORPUS_ENABLED:
+    # SQLAlchemy is only imported when the corpus is used
+    from backend.core.database import create_engine, create_session_factory, create_tables
+    from backend.services.corpus_service import CorpusService
+
+    app.state.db_engine = create_engine()
+    await create_tables(app.state.db_engine)
+    app.state.corpus = CorpusService(create_session_factory(app.state.db_engine))
+    logger.info("Application startup: comment corpus enabled.")
 
-app = FastAPI(title="Smart-search")
+  # with INFERENCE_SOCKET set, the sidecar holds the models and this only talks to it
+  app.state.models = create_model_registry()
+  if Config.WARM_MODELS:
+    # loading blocks, so keep it off the event loop
+    await asyncio.to_thread(app.state.models.warm)
+    logger.info(f"Application startup: models warmed {app.state.models.stats()}")
+
+  # brands learned from past extractions feed the local/hybrid backends
+  app.state.gazetteer = BrandGazetteer(app.state.redis)
+  # canonical products and their variants, loaded on the first search
+  app.state.catalogue = ProductCatalogue(app.state.redis)
+  app.state.extractor = create_extractor(Config.EXTRACTION_BACKEND, app.state.openai, app.state.models, app.state.gazetteer)
+
+  lag_monitor = asyncio.create_task(monitor_event_loop_lag()) if Config.METRICS_ENABLED else None
+
+  if Config.STARTUP_REPORT:
+    import_timer.log_report(Config.STARTUP_REPORT_TOP)
+  logger.info(f"Application startup: ready in {time.perf_counter() - started:.2f}s")
+
+  yield
+
+  if lag_monitor is not None:
+    lag_monitor.cancel()
+  shutdown_executor()
+  app.state.models.close()
+  await app.state.openai.close()
+  await app.state.reddit.close()
+  if app.state.db_engine is not None:
+    await app.state.db_engine.dispose()
+  await close_redis_client(app.state.redis)
+  if Config.REPLAY_MODE == "record":
+    app.state.replay.save()
+  logger.info("Application shutdown: Redis, Reddit and OpenAI connections closed.")
+
+app = FastAPI(title="Smart-search", lifespan=lifespan)
 
 app.add_middleware(
   CORSMiddleware,
   allow_origins=Config.ALLOWED_ORIGINS,
   allow_credentials=True,
   allow_methods=["*"],
-  allow_headers=["*"]
+  allow_headers=["*"],
+  expose_headers=["Server-Timing"]
 )
-
-@app.on_event("startup")
-async def startup_event():
-  app.state.redis = aioredis.from_url(Config.REDIS_URL)
-  logger.info("Application startup: Redis connection initialized.")
-
-@app.on_event("shutdown")
-async def shutdown_even():
-  await app.state.redis.close()
-  logger.info("Application shutdown: Redis connection closed.")
+app.add_middleware(ProfilingMiddleware)
 
 @app.get("/")
 async def root():
@@ -36,4 +128,8 @@ async def root():
 
 app.include_router(reddit_router)
 app.include_router(chat_router)
-app.include_router(search_router)
\ No newline at end of file
+app.include_router(search_router)
+app.include_router(health_router)
+app.include_router(jobs_router)
+if Config.METRICS_ENABLED:
+  app.include_router(metrics_router)
\ No newline at end of file
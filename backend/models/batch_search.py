@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from backend.models.product import ProductList
+from backend.models.product_search_request import ProductSearchRequest
+
+class BatchSearchRequest(BaseModel):
+  requests: List[ProductSearchRequest]
+
+class BatchSearchItem(BaseModel):
+  product_category: str
+  result: Optional[ProductList] = None
+  error: Optional[str] = None
+
+class BatchSearchResponse(BaseModel):
+  results: List[BatchSearchItem]
\ No newline at end of file
@@ -4,4 +4,5 @@ class Comment(BaseModel):
   id: str
   body: str
   replies: list["Comment"] = []
-  score: int
\ No newline at end of file
+  score: int
+  created_utc: int = 0
\ No newline at end of file
@@ -1,12 +1,16 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
-from sqlalchemy.orm import relationship
-from backend.database import Base
+from sqlalchemy import BigInteger, Column, Integer, String, Text, ForeignKey
+from sqlalchemy.orm import backref, relationship
+from backend.core.database import Base
 
 class CommentDB(Base):
   __tablename__ = 'comments'
-  id = Column(Integer, primary_key=True, index=True)
-  body = Column(String)
-  replies = relationship("CommentDB", back_ref="parent", remote_side=[id])
+  id = Column(String, primary_key=True, index=True)
+  submission_id = Column(String, ForeignKey('submissions.id'), index=True, nullable=False)
+  parent_id = Column(String, ForeignKey('comments.id'), nullable=True)
+  body = Column(Text)
+  score = Column(Integer)
+  created_utc = Column(BigInteger, default=0)
+  replies = relationship("CommentDB", backref=backref("parent", remote_side=[id]))
 
   def __repr__(self):
     return f"<Comment(id={self.id}, body={self.body})>"
\ No newline at end of file
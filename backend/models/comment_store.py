@@ -0,0 +1,248 @@
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from pydantic import TypeAdapter
+from backend.models.comment import Comment
+
+_comment_list = TypeAdapter(List[Comment])
+
+class CommentRef:
+  """
+  Read-only handle on one row of a CommentStore. Has the fields the pipeline
+  reads from a Comment (id, body, score, created_utc) without copying them.
+  """
+  __slots__ = ("store", "row")
+
+  def __init__(self, store: "CommentStore", row: int):
+    self.store = store
+    self.row = row
+
+  @property
+  def id(self) -> str:
+    return self.store.ids[self.row]
+
+  @property
+  def body(self) -> str:
+    return self.store.bodies[self.row]
+
+  @property
+  def score(self) -> int:
+    return self.store.scores[self.row]
+
+  @property
+  def created_utc(self) -> int:
+    return self.store.created_utc[self.row]
+
+  def to_model(self) -> Comment:
+    return Comment(id=self.id, body=self.body, score=self.score, created_utc=self.created_utc)
+
+  def __repr__(self) -> str:
+    return f"CommentRef(id={self.id!r}, score={self.score})"
+
+class CommentView:
+  """
+  An ordered selection of rows of a CommentStore (a filter, a sort, a subtree).
+  Only the row numbers are held, so views never copy the columns. Indexing and
+  iteration yield CommentRefs.
+  """
+  def __init__(self, store: "CommentStore", rows: array):
+    self.store = store
+    self.rows = rows
+
+  def __len__(self) -> int:
+    return len(self.rows)
+
+  def __iter__(self) -> Iterator[CommentRef]:
+    store = self.store
+    return (CommentRef(store, row) for row in self.rows)
+
+  def __getitem__(self, index: Union[int, slice]) -> Union[CommentRef, "CommentView"]:
+    if isinstance(index, slice):
+      return CommentView(self.store, self.rows[index])
+    return CommentRef(self.store, self.rows[index])
+
+  def ids(self) -> List[str]:
+    ids = self.store.ids
+    return [ids[row] for row in self.rows]
+
+  def bodies(self) -> List[str]:
+    bodies = self.store.bodies
+    return [bodies[row] for row in self.rows]
+
+  def scores(self) -> List[int]:
+    scores = self.store.scores
+    return [scores[row] for row in self.rows]
+
+  def sorted_by_score(self) -> "CommentView":
+    scores = self.store.scores
+    return CommentView(self.store, array("q", sorted(self.rows, key=lambda row: scores[row], reverse=True)))
+
+  def tree(self) -> List[Comment]:
+    """Nested Comment objects for the rows in this view; rows whose parent isn't in the view become roots."""
+    return self.store._build_tree(self.rows)
+
+class CommentStore:
+  """
+  Columnar comment storage: ids, bodies, scores and parent links in parallel
+  arrays, one row per comment, each comment held exactly once. The pipeline
+  works on rows and views; nested pydantic Comments are only built by `tree()`
+  for API responses.
+  """
+  def __init__(self):
+    self.ids: List[str] = []
+    self.bodies: List[str] = []
+    self.scores = array("q")
+    self.created_utc = array("q")
+    # parent comment ids as given; a parent may arrive after its replies
+    self.parent_ids: List[Optional[str]] = []
+    self.index: Dict[str, int] = {}
+    self._parent_rows: Optional[array] = None
+    self._children: Optional[Tuple[array, array]] = None
+
+  def __len__(self) -> int:
+    return len(self.ids)
+
+  def __iter__(self) -> Iterator[str]:
+    return iter(self.ids)
+
+  def __contains__(self, comment_id: str) -> bool:
+    return comment_id in self.index
+
+  def append(self, comment_id: str, body: str, score: int, parent_id: Optional[str] = None, created_utc: int = 0) -> bool:
+    # returns False for comments we've already stored
+    if comment_id in self.index:
+      return False
+    self.index[comment_id] = len(self.ids)
+    self.ids.append(comment_id)
+    self.bodies.append(body)
+    self.scores.append(score)
+    self.created_utc.append(created_utc)
+    self.parent_ids.append(parent_id)
+    self._parent_rows = None
+    self._children = None
+    return True
+
+  def add(self, comment: Comment, parent_id: Optional[str] = None) -> bool:
+    return self.append(comment.id, comment.body, comment.score, parent_id, comment.created_utc)
+
+  def get(self, comment_id: str) -> CommentRef:
+    return CommentRef(self, self.index[comment_id])
+
+  def parent_id(self, comment_id: str) -> Optional[str]:
+    """The parent's id if the parent is stored here, otherwise None."""
+    parent_id = self.parent_ids[self.index[comment_id]]
+    return parent_id if parent_id in self.index else None
+
+  def view(self, rows: Optional[Iterable[int]] = None) -> CommentView:
+    return CommentView(self, array("q", range(len(self.ids)) if rows is None else rows))
+
+  def values(self) -> CommentView:
+    return self.view()
+
+  def parent_rows(self) -> array:
+    """Parent row of every row, -1 for roots (including replies to comments not stored here)."""
+    if self._parent_rows is None:
+      index = self.index
+      self._parent_rows = array("q", (index.get(parent_id, -1) if parent_id is not None else -1 for parent_id in self.parent_ids))
+    return self._parent_rows
+
+  def children(self) -> Tuple[array, array]:
+    """Child rows in CSR form: the children of row r are rows[offsets[r]:offsets[r + 1]], in insertion order."""
+    if self._children is None:
+      parent_rows = self.parent_rows()
+      offsets = array("q", [0] * (len(self.ids) + 1))
+      for parent in parent_rows:
+        if parent >= 0:
+          offsets[parent + 1] += 1
+      for row in range(len(self.ids)):
+        offsets[row + 1] += offsets[row]
+      fill = array("q", offsets[:-1])
+      rows = array("q", [0] * offsets[-1])
+      for row, parent in enumerate(parent_rows):
+        if parent >= 0:
+          rows[fill[parent]] = row
+          fill[parent] += 1
+      self._children = (offsets, rows)
+    return self._children
+
+  def roots(self) -> List[str]:
+    return [self.ids[row] for row, parent in enumerate(self.parent_rows()) if parent < 0]
+
+  def merge(self, other: "CommentStore"):
+    for row in range(len(other)):
+      self.append(other.ids[row], other.bodies[row], other.scores[row], other.parent_ids[row], other.created_utc[row])
+
+  def sorted_by_score(self) -> CommentView:
+    return self.view().sorted_by_score()
+
+  def prune(self, keep_ids: Iterable[str]) -> CommentView:
+    """A view of the kept comments and every ancestor needed to reach them, in insertion order."""
+    parent_rows = self.parent_rows()
+    keep = bytearray(len(self.ids))
+    for comment_id in keep_ids:
+      row = self.index.get(comment_id, -1)
+      while row >= 0 and not keep[row]:
+        keep[row] = 1
+        row = parent_rows[row]
+    return self.view(row for row in range(len(self.ids)) if keep[row])
+
+  def subtree(self, comment_id: str) -> CommentView:
+    """A view of a comment and all of its replies, parents before children."""
+    offsets, child_rows = self.children()
+    rows = array("q", [self.index[comment_id]])
+    for row in rows:
+      rows.extend(child_rows[offsets[row]:offsets[row + 1]])
+    return CommentView(self, rows)
+
+  def _build_tree(self, rows: Iterable[int]) -> List[Comment]:
+    selected = bytearray(len(self.ids))
+    for row in rows:
+      selected[row] = 1
+    parent_rows = self.parent_rows()
+    offsets, child_rows = self.children()
+    roots = [row for row in range(len(self.ids)) if selected[row] and (parent_rows[row] < 0 or not selected[parent_rows[row]])]
+    # breadth-first order puts every parent ahead of its children
+    order = list(roots)
+    for row in order:
+      order.extend(child for child in child_rows[offsets[row]:offsets[row + 1]] if selected[child])
+
+    built: Dict[int, dict] = {}
+    # walk backwards so replies are built before the comments that hold them
+    for row in reversed(order):
+      built[row] = {
+        "id": self.ids[row],
+        "body": self.bodies[row],
+        "score": self.scores[row],
+        "created_utc": self.created_utc[row],
+        "replies": [built[child] for child in child_rows[offsets[row]:offsets[row + 1]] if child in built]
+      }
+    # one validation pass over the nested dicts is far cheaper than building each model in Python
+    return _comment_list.validate_python([built[row] for row in roots])
+
+  def tree(self) -> List[Comment]:
+    """Build nested Comment objects (for API responses), one per stored comment."""
+    return self._build_tree(range(len(self.ids)))
+
+  @classmethod
+  def from_praw(cls, praw_comments) -> "CommentStore":
+    """
+    Single pass over an already flattened PRAW comment list (`comments.list()`).
+    Parent links come from `parent_id`, so replies are never walked recursively.
+    """
+    store = cls()
+    for praw_comment in praw_comments:
+      if praw_comment is None or not hasattr(praw_comment, "body"):
+        continue
+      parent_id = getattr(praw_comment, "parent_id", None)
+      # "t1_" parents are comments, "t3_" parents are the submission itself
+      if parent_id and parent_id.startswith("t1_"):
+        parent_id = parent_id[3:]
+      else:
+        parent_id = None
+      store.append(
+        praw_comment.id,
+        praw_comment.body,
+        praw_comment.score,
+        parent_id,
+        int(getattr(praw_comment, "created_utc", 0) or 0)
+      )
+    return store
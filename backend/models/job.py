@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+from typing import List, Literal, Optional
+from backend.models.product import ProductList
+
+class JobSubmitted(BaseModel):
+  job_id: str
+
+class JobStatus(BaseModel):
+  job_id: str
+  status: Literal["queued", "running", "completed", "failed"]
+  progress: List[str] = []
+  result: Optional[ProductList] = None
+  error: Optional[str] = None
\ No newline at end of file
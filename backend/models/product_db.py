@@ -0,0 +1,14 @@
+from sqlalchemy import BigInteger, Column, Integer, String, UniqueConstraint
+from backend.core.database import Base
+
+class ProductDB(Base):
+  __tablename__ = 'products'
+  __table_args__ = (UniqueConstraint('category', 'brand_name', 'product_name'),)
+  id = Column(Integer, primary_key=True, autoincrement=True)
+  category = Column(String, index=True)
+  brand_name = Column(String)
+  product_name = Column(String)
+  extracted_utc = Column(BigInteger)
+
+  def __repr__(self):
+    return f"<Product(brand_name={self.brand_name}, product_name={self.product_name})>"
\ No newline at end of file
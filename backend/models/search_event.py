@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+from typing import Literal, Optional
+from backend.models.product import ProductList
+
+class SearchEvent(BaseModel):
+  # "progress": a subreddit/submission was fetched or processed
+  # "ranking": provisional ranking from the comments scored so far
+  # "result": the final ranking; "error": the search failed
+  event: Literal["progress", "ranking", "result", "error"]
+  message: Optional[str] = None
+  data: Optional[ProductList] = None
\ No newline at end of file
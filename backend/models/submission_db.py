@@ -0,0 +1,32 @@
+from sqlalchemy import BigInteger, Boolean, Column, Float, Integer, String, ForeignKey
+from backend.core.database import Base
+
+class SubmissionDB(Base):
+  __tablename__ = 'submissions'
+  id = Column(String, primary_key=True, index=True)
+  title = Column(String)
+  created_utc = Column(BigInteger)
+  subreddit_name = Column(String, index=True)
+  score = Column(Integer)
+  upvote_ratio = Column(Float)
+  over_18 = Column(Boolean)
+  num_comments = Column(Integer)
+  # comment count and time of the last comment sync; the tree is re-fetched once the count grows
+  synced_num_comments = Column(Integer, default=0)
+  synced_utc = Column(BigInteger, default=0)
+
+  def __repr__(self):
+    return f"<Submission(id={self.id}, title={self.title})>"
+
+class SubmissionSearchDB(Base):
+  # which submissions a subreddit search returned for a search term
+  __tablename__ = 'submission_searches'
+  search_term = Column(String, primary_key=True)
+  subreddit_name = Column(String, primary_key=True)
+  submission_id = Column(String, ForeignKey('submissions.id'), primary_key=True)
+class SearchListingDB(Base):
+  # when a subreddit search was last run against Reddit; listings newer than CORPUS_LISTING_TTL are served from here
+  __tablename__ = 'search_listings'
+  search_term = Column(String, primary_key=True)
+  subreddit_name = Column(String, primary_key=True)
+  searched_utc = Column(BigInteger, default=0)
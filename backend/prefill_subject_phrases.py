@@ -0,0 +1,38 @@
+"""
+Warm the subject phrase cache for a catalogue of categories, so the first
+search for each of them doesn't wait on OpenAI. Categories come from files (one
+per line) and/or --category; near duplicates are only fetched once.
+
+  python -m backend.prefill_subject_phrases categories.txt --concurrency 4
+"""
+import argparse
+import asyncio
+
+from backend.core.clients import close_redis_client, create_redis_client
+from backend.core.logger import logger
+from backend.services.openai_service import OpenAIService, create_openai_client
+from backend.services.subject_phrases import SubjectPhraseCache
+
+async def prefill(categories, concurrency: int):
+  redis_client = create_redis_client()
+  openai_client = create_openai_client()
+  try:
+    cache = SubjectPhraseCache(redis_client)
+    counts = await cache.prefill(categories, OpenAIService(openai_client).fetch_subject_phrases, concurrency)
+    logger.info(f"Subject phrase prefill: {counts}, {len(cache.categories)} known categories")
+  finally:
+    await openai_client.close()
+    await close_redis_client(redis_client)
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser()
+  parser.add_argument("files", nargs="*", help="files with one category per line")
+  parser.add_argument("--category", action="append", default=[])
+  parser.add_argument("--concurrency", type=int, default=4)
+  args = parser.parse_args()
+
+  categories = list(args.category)
+  for path in args.files:
+    with open(path) as f:
+      categories.extend(line.strip() for line in f)
+  asyncio.run(prefill(categories, args.concurrency))
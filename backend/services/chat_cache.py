@@ -0,0 +1,169 @@
+import asyncio
+import hashlib
+import json
+import logging
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Tuple
+
+from backend.core.config import Config
+from backend.core.metrics import record_cache
+from backend.utils.cache import SingleFlight, TieredCache
+
+logger = logging.getLogger(__name__)
+
+def chat_key(model: str, system_prompt: str, user_message: str) -> str:
+  return hashlib.sha256(json.dumps([model, system_prompt, user_message]).encode()).hexdigest()
+
+class SharedStream:
+  """
+  A completion being streamed from upstream, readable by any number of clients.
+  Each reader gets every chunk from the start, then follows along as new ones
+  arrive.
+  """
+  def __init__(self):
+    self.chunks: List[str] = []
+    self.done = False
+    self.error: BaseException | None = None
+    self._updated = asyncio.Event()
+
+  def _notify(self):
+    updated, self._updated = self._updated, asyncio.Event()
+    updated.set()
+
+  def append(self, chunk: str):
+    self.chunks.append(chunk)
+    self._notify()
+
+  def finish(self, error: BaseException | None = None):
+    self.done = True
+    self.error = error
+    self._notify()
+
+  def text(self) -> str:
+    return "".join(self.chunks)
+
+  async def __aiter__(self) -> AsyncIterator[str]:
+    position = 0
+    while True:
+      while position < len(self.chunks):
+        yield self.chunks[position]
+        position += 1
+      if self.done:
+        if self.error is not None:
+          raise self.error
+        return
+      await self._updated.wait()
+
+class ChatResponseCache:
+  """
+  Completions of /chat/openai cached by model, system prompt and message, in an
+  in-process LRU in front of Redis. Concurrent identical prompts share one
+  upstream call: blocking requests through SingleFlight, streamed ones by
+  reading the same SharedStream (a blocking request also joins a stream that's
+  already running). The upstream call runs as its own task, so it finishes and
+  is cached even if the client that started it disconnects.
+  CHAT_CACHE_TTL=0 turns caching off but keeps the coalescing.
+  """
+  def __init__(self, redis_client, ttl: float | None = None, maxsize: int | None = None):
+    ttl = Config.CHAT_CACHE_TTL if ttl is None else ttl
+    self.enabled = ttl > 0
+    self.cache = TieredCache(
+      redis_client,
+      namespace="chat_response:v1",
+      maxsize=maxsize or Config.CHAT_CACHE_SIZE,
+      ttl=ttl
+    )
+    self._inflight = SingleFlight()
+    self._streams: Dict[str, SharedStream] = {}
+    self._tasks = set()
+    self.hits = 0
+    self.misses = 0
+    self.coalesced = 0
+    self.upstream_calls = 0
+
+  async def get(self, key: str) -> str | None:
+    if not self.enabled:
+      return None
+    entry = await self.cache.get(key)
+    if entry is None or not isinstance(entry[0], str):
+      self.misses += 1
+      record_cache("chat", misses=1)
+      return None
+    self.hits += 1
+    record_cache("chat", hits=1)
+    return entry[0]
+
+  async def set(self, key: str, text: str):
+    if self.enabled and text:
+      await self.cache.set(key, text)
+
+  async def get_or_fetch(self, key: str, fetch: Callable[[], Awaitable[str]]) -> Tuple[str, str]:
+    """The completion and where it came from: "cache", "coalesced" or "upstream"."""
+    cached = await self.get(key)
+    if cached is not None:
+      return cached, "cache"
+    stream = self._streams.get(key)
+    if stream is not None:
+      self.coalesced += 1
+      async for _ in stream:
+        pass
+      return stream.text(), "coalesced"
+    if key in self._inflight:
+      self.coalesced += 1
+      return await self._inflight.do(key, fetch), "coalesced"
+
+    async def fetch_and_store():
+      self.upstream_calls += 1
+      text = await fetch()
+      await self.set(key, text)
+      return text
+
+    return await self._inflight.do(key, fetch_and_store), "upstream"
+
+  async def _produce(self, key: str, stream: SharedStream, produce: Callable[[], AsyncIterator[str]]):
+    try:
+      async for chunk in produce():
+        if chunk:
+          stream.append(chunk)
+    except Exception as e:
+      stream.finish(e)
+    else:
+      stream.finish()
+      await self.set(key, stream.text())
+    finally:
+      self._streams.pop(key, None)
+
+  async def stream(self, key: str, produce: Callable[[], AsyncIterator[str]]) -> Tuple[AsyncIterator[str], str]:
+    """
+    Chunks of the completion and where they come from. A cached completion is
+    one chunk; otherwise the caller reads a running stream for this key or
+    starts one from `produce()`.
+    """
+    cached = await self.get(key)
+    if cached is not None:
+      return _single(cached), "cache"
+    stream = self._streams.get(key)
+    if stream is not None:
+      self.coalesced += 1
+      return aiter(stream), "coalesced"
+    stream = self._streams[key] = SharedStream()
+    self.upstream_calls += 1
+    task = asyncio.create_task(self._produce(key, stream, produce))
+    # keep a reference until it's done, nothing else awaits it
+    self._tasks.add(task)
+    task.add_done_callback(self._tasks.discard)
+    return aiter(stream), "upstream"
+
+  def stats(self) -> dict:
+    lookups = self.hits + self.misses
+    return {
+      "hits": self.hits,
+      "misses": self.misses,
+      "hit_rate": self.hits / lookups if lookups else 0.0,
+      "coalesced": self.coalesced,
+      "upstream_calls": self.upstream_calls,
+      "streaming": len(self._streams),
+      "local": self.cache.stats()
+    }
+
+async def _single(text: str) -> AsyncIterator[str]:
+  yield text
@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, Dict, Iterable, List, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from backend.core.config import Config
+from backend.models.comment_db import CommentDB
+from backend.models.comment_store import CommentStore
+from backend.models.product import Product
+from backend.models.product_db import ProductDB
+from backend.models.submission import SubmissionBase
+from backend.models.submission_db import SearchListingDB, SubmissionDB, SubmissionSearchDB
+from backend.utils.helpers import chunk_list
+
+logger = logging.getLogger(__name__)
+
+class CorpusService:
+  """
+  Local copy of subreddit searches, comment trees and extracted products.
+  A subreddit search is served from the database for CORPUS_LISTING_TTL seconds
+  after it last ran against Reddit. Comments are refreshed per submission:
+  Reddit only hands out a submission's comments as a whole tree, so once its
+  comment count has grown since the last sync the full tree is re-fetched and
+  upserted (existing rows get their new body and score). Submissions that
+  haven't grown are served from the database.
+  """
+  def __init__(self, session_factory: async_sessionmaker):
+    self.session_factory = session_factory
+
+  async def _upsert(self, session: AsyncSession, model, rows: List[dict], index_elements: List[str], update_columns: Iterable[str]):
+    if not rows:
+      return
+    insert = pg_insert if session.bind.dialect.name == "postgresql" else sqlite_insert
+    update_columns = list(update_columns)
+    for batch in chunk_list(rows, Config.DB_UPSERT_BATCH_SIZE):
+      statement = insert(model).values(batch)
+      if update_columns:
+        statement = statement.on_conflict_do_update(
+          index_elements=index_elements,
+          set_={column: statement.excluded[column] for column in update_columns}
+        )
+      else:
+        statement = statement.on_conflict_do_nothing(index_elements=index_elements)
+      await session.execute(statement)
+
+  @staticmethod
+  def _submission_row(submission: SubmissionBase, subreddit_name: str) -> dict:
+    return {**submission.model_dump(), "subreddit_name": subreddit_name}
+
+  async def cached_listing(self, subreddit_name: str, search_term: str) -> List[SubmissionBase] | None:
+    """The submissions a subreddit search returned, if it ran within CORPUS_LISTING_TTL."""
+    async with self.session_factory() as session:
+      searched_utc = await session.scalar(
+        select(SearchListingDB.searched_utc)
+        .where(SearchListingDB.search_term == search_term, SearchListingDB.subreddit_name == subreddit_name)
+      )
+      if searched_utc is None or searched_utc < time.time() - Config.CORPUS_LISTING_TTL:
+        return None
+      rows = await session.scalars(
+        select(SubmissionDB)
+        .join(SubmissionSearchDB, SubmissionSearchDB.submission_id == SubmissionDB.id)
+        .where(SubmissionSearchDB.search_term == search_term, SubmissionSearchDB.subreddit_name == subreddit_name)
+        .order_by(SubmissionDB.score.desc())
+      )
+      return [
+        SubmissionBase(**{field: getattr(row, field) for field in SubmissionBase.model_fields})
+        for row in rows
+      ]
+
+  async def save_listing(self, subreddit_name: str, search_term: str, submissions: List[SubmissionBase]):
+    """Record a live subreddit search: the submissions it found, its hits and when it ran, in one transaction."""
+    # one row per id, since a single upsert statement can't touch the same row twice
+    submissions = list({submission.id: submission for submission in submissions}.values())
+    async with self.session_factory() as session, session.begin():
+      await self._upsert(
+        session, SubmissionDB, [self._submission_row(submission, subreddit_name) for submission in submissions],
+        ["id"], ["title", "score", "upvote_ratio", "over_18", "num_comments"]
+      )
+      await self._upsert(session, SubmissionSearchDB, [
+        {"search_term": search_term, "subreddit_name": subreddit_name, "submission_id": submission.id}
+        for submission in submissions
+      ], ["search_term", "subreddit_name", "submission_id"], [])
+      await self._upsert(session, SearchListingDB, [
+        {"search_term": search_term, "subreddit_name": subreddit_name, "searched_utc": int(time.time())}
+      ], ["search_term", "subreddit_name"], ["searched_utc"])
+
+  async def list_submissions(self, reddit_service, subreddit_name: str, search_term: str) -> List[SubmissionBase]:
+    """Submissions for a subreddit search, from the corpus while the last live search is fresh."""
+    submissions = await self.cached_listing(subreddit_name, search_term)
+    if submissions is not None:
+      logger.info(f"Serving the r/{subreddit_name} listing for '{search_term}' from the corpus")
+      return submissions
+    # raises if the search fails, so callers can tell a failed listing from an empty one
+    submissions = await reddit_service.scheduler.run(reddit_service.search_submissions, subreddit_name, search_term)
+    # an empty listing isn't recorded as fresh, so the next search asks Reddit again
+    if submissions:
+      await self.save_listing(subreddit_name, search_term, submissions)
+    return submissions
+
+  async def stale_submissions(self, submissions: List[SubmissionBase]) -> Set[str]:
+    """Ids of the submissions with comments we haven't synced, checked with one query for all of them."""
+    if not submissions:
+      return set()
+    async with self.session_factory() as session:
+      rows = await session.execute(
+        select(SubmissionDB.id, SubmissionDB.synced_num_comments)
+        .where(SubmissionDB.id.in_([submission.id for submission in submissions]))
+      )
+      synced = dict(rows.all())
+    return {
+      submission.id for submission in submissions
+      if synced.get(submission.id) is None or submission.num_comments > synced[submission.id]
+    }
+
+  async def stored_comments(self, submission_ids: List[str]) -> Dict[str, CommentStore]:
+    """Each submission's comments from the corpus, loaded with one query."""
+    stores = {submission_id: CommentStore() for submission_id in submission_ids}
+    if not stores:
+      return stores
+    async with self.session_factory() as session:
+      rows = await session.execute(
+        select(CommentDB.submission_id, CommentDB.id, CommentDB.parent_id, CommentDB.body, CommentDB.score, CommentDB.created_utc)
+        .where(CommentDB.submission_id.in_(submission_ids))
+        .order_by(CommentDB.created_utc)
+      )
+      for submission_id, comment_id, parent_id, body, score, created_utc in rows:
+        stores[submission_id].append(comment_id, body, score, parent_id, created_utc)
+    return stores
+
+  async def save_comments(self, subreddit_name: str, synced: List[Tuple[SubmissionBase, CommentStore]]):
+    """Upsert freshly fetched comment trees and mark their submissions synced, in one transaction."""
+    if not synced:
+      return
+    now = int(time.time())
+    submission_rows = [
+      {**self._submission_row(submission, subreddit_name), "synced_num_comments": submission.num_comments, "synced_utc": now}
+      for submission, _ in synced
+    ]
+    # parents first, so the self-referencing foreign key is satisfied within each batch
+    comment_rows = sorted((
+      {
+        "id": comments.ids[row],
+        "submission_id": submission.id,
+        "parent_id": comments.parent_id(comments.ids[row]),
+        "body": comments.bodies[row],
+        "score": comments.scores[row],
+        "created_utc": comments.created_utc[row]
+      }
+      for submission, comments in synced for row in range(len(comments))
+    ), key=lambda row: row["created_utc"])
+    async with self.session_factory() as session, session.begin():
+      await self._upsert(
+        session, SubmissionDB, submission_rows, ["id"],
+        ["title", "score", "upvote_ratio", "over_18", "num_comments", "synced_num_comments", "synced_utc"]
+      )
+      await self._upsert(session, CommentDB, comment_rows, ["id"], ["body", "score"])
+
+  async def sync_submissions(self, reddit_service, subreddit_name: str,
+                             submissions: List[SubmissionBase]) -> AsyncIterator[Tuple[SubmissionBase, CommentStore]]:
+    """
+    Yield each submission with its comments: stored trees first, then the ones
+    with new comments as they come in from Reddit (fetched concurrently through
+    the scheduler). Refreshed trees are written back in one transaction once
+    every fetch is done; if iteration stops early they're fetched again next time.
+    """
+    stale = await self.stale_submissions(submissions)
+    stored = await self.stored_comments([submission.id for submission in submissions if submission.id not in stale])
+    logger.info(f"Serving {len(stored)} submissions from the corpus, fetching {len(stale)} with new comments")
+    for submission in submissions:
+      if submission.id in stored:
+        yield submission, stored.pop(submission.id)
+
+    async def fetch(submission: SubmissionBase) -> Tuple[SubmissionBase, CommentStore]:
+      return submission, await reddit_service.scheduler.run(reddit_service.submission_comments, submission.id)
+
+    fetches = [asyncio.create_task(fetch(submission)) for submission in submissions if submission.id in stale]
+    try:
+      synced = []
+      for fetched in asyncio.as_completed(fetches):
+        submission, comments = await fetched
+        # an empty result for a submission with comments means the fetch failed; don't mark it synced
+        if len(comments) or not submission.num_comments:
+          synced.append((submission, comments))
+        yield submission, comments
+      await self.save_comments(subreddit_name, synced)
+    finally:
+      for task in fetches:
+        task.cancel()
+
+  async def save_products(self, category: str, products: List[Product]):
+    # one row per key, since a single upsert statement can't touch the same row twice
+    rows = list({
+      (product.brand_name, product.product_name): {
+        "category": category.lower(),
+        "brand_name": product.brand_name,
+        "product_name": product.product_name,
+        "extracted_utc": int(time.time())
+      }
+      for product in products
+    }.values())
+    async with self.session_factory() as session, session.begin():
+      await self._upsert(session, ProductDB, rows, ["category", "brand_name", "product_name"], ["extracted_utc"])
+
@@ -0,0 +1,175 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, List, Tuple
+
+from backend.core.config import Config
+from backend.core.metrics import external_call, observe_batch
+from backend.models.comment import Comment
+from backend.models.product import Product, ProductList
+from backend.services.gazetteer import BrandGazetteer
+from backend.services.model_registry import ModelRegistry
+from backend.services.ner_filter import extract_entities, ner_pipeline_for
+from backend.services.product_matcher import tokenize
+from backend.utils.helpers import chunk_by_token_budget
+from backend.utils.retry import retry_with_jitter
+
+if TYPE_CHECKING:
+  from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+class ProductExtractor(ABC):
+  """Finds brand/product mentions in comments. Results may contain duplicates."""
+  name: str
+
+  @abstractmethod
+  async def extract(self, comments: List[Comment]) -> List[Product]:
+    ...
+
+class OpenAIExtractor(ProductExtractor):
+  """
+  Sends comments to gpt-4o-mini in token-budgeted batches, at most
+  OPENAI_MAX_CONCURRENCY at a time. Results are fed to the gazetteer if one is set.
+  """
+  name = "openai"
+
+  def __init__(self, openai_client: "AsyncOpenAI", gazetteer: BrandGazetteer | None = None):
+    self.openai_client = openai_client
+    self.gazetteer = gazetteer
+    self._semaphore = asyncio.Semaphore(Config.OPENAI_MAX_CONCURRENCY)
+
+  async def extract(self, comments: List[Comment]) -> List[Product]:
+    # batches are sized by prompt tokens rather than a fixed comment count
+    batches = [
+      [comments[i] for i in indices]
+      for indices in chunk_by_token_budget(
+        [comment.body for comment in comments],
+        Config.EXTRACTION_BATCH_TOKENS,
+        Config.EXTRACTION_BATCH_MAX_COMMENTS
+      )
+    ]
+
+    async def bounded_call(batch):
+      async with self._semaphore:
+        return await self.batch_openai_call(batch)
+
+    all_products = []
+    for products_list_batch in await asyncio.gather(*[bounded_call(batch) for batch in batches]):
+      all_products.extend(product_with_score.product for product_with_score in products_list_batch)
+    if self.gazetteer is not None:
+      await self.gazetteer.learn(all_products)
+    return all_products
+
+  async def batch_openai_call(self, comments_chunk: list[Comment]) -> list:
+    # Convert Comment objects to their body texts
+    comments_string = "\n".join([comment.body for comment in comments_chunk])
+
+    observe_batch("extraction", len(comments_chunk))
+    try:
+      async with external_call("openai", "extract"):
+        completion = await retry_with_jitter(
+          self.openai_client.beta.chat.completions.parse,
+          retries=Config.OPENAI_MAX_RETRIES,
+          model="gpt-4o-mini-2024-07-18",
+          messages=[
+            {"role": "system", "content": "You are a brand and product finding assistant. You will be given a list of comments and should return unique brand/product combinations as a valid JSON object."},
+            {"role": "user", "content": f"""
+      Instructions:
+      - Extract the brand and product name from the comments. Do NOT allow for generic product names like "toaster". If there is no clear product name do not include the product.
+      - Return *only* the extracted brand and product combinations in a valid JSON object in the following format:
+        {{
+          "products": [
+          {{
+            "brand_name": "Brand Name",
+            "product_name": "Product Name"
+          }},
+          {{
+            "brand_name": "Another brand",
+            "product_name": "Another product"
+          }}
+          ]
+        }}
+      - Ensure the output contains *only* valid JSON and nothing else. The brand_name and product_name must be strings.
+
+      Comments: 
+      {comments_string}
+      """}],
+        response_format=ProductList
+        )
+
+      return completion.choices[0].message.parsed.products
+    except Exception as e:
+      logger.error(f"Error processing comments with OpenAI: {e}")
+      return []
+
+def _clean_entity_word(word: str) -> str:
+  # grouped NER output can still carry word-piece markers
+  return word.replace(" ##", "").replace("##", "").strip()
+
+class LocalExtractor(ProductExtractor):
+  """
+  Extracts products without any network calls, from the NER entities that
+  filter_comments already computed (served from the NER cache) plus the brand
+  gazetteer. A comment is handled confidently when it names a known
+  (brand, product) pair, or pairs a known brand (ORG) with a product (MISC).
+  """
+  name = "local"
+
+  def __init__(self, model_registry: ModelRegistry, gazetteer: BrandGazetteer):
+    self.model_registry = model_registry
+    self.gazetteer = gazetteer
+
+  async def extract(self, comments: List[Comment]) -> List[Product]:
+    products, _ = await self.extract_with_confidence(comments)
+    return products
+
+  async def extract_with_confidence(self, comments: List[Comment]) -> Tuple[List[Product], List[Comment]]:
+    """Products found locally, and the comments that couldn't be handled confidently."""
+    await self.gazetteer.refresh()
+    all_entities = await extract_entities([comment.body for comment in comments], ner_pipeline_for(self.model_registry))
+
+    products: List[Product] = []
+    uncertain: List[Comment] = []
+    for comment, entities in zip(comments, all_entities):
+      padded_body = f" {' '.join(tokenize(comment.body))} "
+      # known products count only when their brand is mentioned too ("dutch oven" alone is ambiguous)
+      known = [
+        product for product in self.gazetteer.matcher.match_products(comment.body)
+        if f" {' '.join(tokenize(product.brand_name))} " in padded_body
+      ]
+      brands = [_clean_entity_word(e["word"]) for e in entities if e["entity_group"] == "ORG"]
+      names = [_clean_entity_word(e["word"]) for e in entities if e["entity_group"] == "MISC"]
+      paired = [Product(brand_name=brand, product_name=name) for brand, name in zip(brands, names) if brand and name]
+
+      products.extend(known)
+      confident_pairs = [product for product in paired if self.gazetteer.is_brand(product.brand_name)]
+      products.extend(confident_pairs)
+      if not known and not confident_pairs:
+        uncertain.append(comment)
+    return products, uncertain
+
+class HybridExtractor(ProductExtractor):
+  """Local extraction first; only comments it isn't confident about go to the LLM."""
+  name = "hybrid"
+
+  def __init__(self, local: LocalExtractor, llm: OpenAIExtractor):
+    self.local = local
+    self.llm = llm
+
+  async def extract(self, comments: List[Comment]) -> List[Product]:
+    products, uncertain = await self.local.extract_with_confidence(comments)
+    logger.info(f"Local extraction handled {len(comments) - len(uncertain)}/{len(comments)} comments, sending the rest to OpenAI")
+    if uncertain:
+      products.extend(await self.llm.extract(uncertain))
+    return products
+
+def create_extractor(backend: str, openai_client: "AsyncOpenAI", model_registry: ModelRegistry,
+                     gazetteer: BrandGazetteer) -> ProductExtractor:
+  if backend == "local":
+    return LocalExtractor(model_registry, gazetteer)
+  if backend == "hybrid":
+    return HybridExtractor(LocalExtractor(model_registry, gazetteer), OpenAIExtractor(openai_client, gazetteer))
+  if backend != "openai":
+    raise ValueError(f"Unknown extraction backend: {backend}")
+  return OpenAIExtractor(openai_client, gazetteer)
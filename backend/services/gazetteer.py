@@ -0,0 +1,74 @@
+import logging
+import time
+from typing import Dict, List, Set
+
+from backend.core.config import Config
+from backend.models.product import Product
+from backend.services.product_matcher import ProductMatcher, tokenize
+
+logger = logging.getLogger(__name__)
+
+SEPARATOR = "\x1f"
+
+def _decode(value) -> str:
+  return value.decode() if isinstance(value, bytes) else value
+
+class BrandGazetteer:
+  """
+  Known brands and (brand, product) pairs, learned from past extraction results
+  and kept in Redis so every worker shares them. An in-memory snapshot (and a
+  ProductMatcher over it) is reloaded at most every GAZETTEER_REFRESH seconds.
+  """
+  def __init__(self, redis_client, namespace: str = "gazetteer"):
+    self.redis = redis_client
+    self.brands_key = f"{namespace}:brands"
+    self.products_key = f"{namespace}:products"
+    self.brands: Set[str] = set()
+    self.products: List[Product] = []
+    self.matcher = ProductMatcher([], match_brands=False)
+    self._loaded_at = 0.0
+
+  async def refresh(self, force: bool = False):
+    if not force and time.monotonic() - self._loaded_at < Config.GAZETTEER_REFRESH:
+      return
+    try:
+      brands = await self.redis.smembers(self.brands_key)
+      pairs = await self.redis.smembers(self.products_key)
+    except Exception as e:
+      logger.warning(f"Could not load gazetteer from Redis: {e}")
+      return
+    self.brands = {_decode(brand) for brand in brands}
+    self.products = []
+    for pair in pairs:
+      brand_name, _, product_name = _decode(pair).partition(SEPARATOR)
+      self.products.append(Product(brand_name=brand_name, product_name=product_name))
+    self.matcher = ProductMatcher(self.products, match_brands=False)
+    self._loaded_at = time.monotonic()
+
+  def is_brand(self, text: str) -> bool:
+    return " ".join(tokenize(text)) in self.brands
+
+  async def learn(self, products: List[Product]):
+    """Add newly extracted products; the in-memory snapshot picks them up immediately."""
+    new_products = [p for p in products if p.brand_name.strip() and p.product_name.strip()]
+    if not new_products:
+      return
+    brands = {" ".join(tokenize(p.brand_name)) for p in new_products} - {""}
+    pairs = {f"{p.brand_name}{SEPARATOR}{p.product_name}" for p in new_products}
+    try:
+      async with self.redis.pipeline(transaction=False) as pipe:
+        pipe.sadd(self.brands_key, *brands)
+        pipe.sadd(self.products_key, *pairs)
+        await pipe.execute()
+    except Exception as e:
+      logger.warning(f"Could not update gazetteer in Redis: {e}")
+
+    known = {(p.brand_name, p.product_name) for p in self.products}
+    added = [p for p in new_products if (p.brand_name, p.product_name) not in known]
+    self.brands |= brands
+    if added:
+      self.products = self.products + added
+      self.matcher = ProductMatcher(self.products, match_brands=False)
+
+  def stats(self) -> Dict[str, int]:
+    return {"brands": len(self.brands), "products": len(self.products)}
@@ -0,0 +1,171 @@
+import asyncio
+import itertools
+import json
+import logging
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.core.config import Config
+from backend.utils.helpers import chunk_list
+from backend.utils.retry import retry_with_jitter
+
+logger = logging.getLogger(__name__)
+
+# every message is a 4-byte big-endian length followed by that many bytes of JSON
+_HEADER = struct.Struct(">I")
+
+async def read_message(reader: asyncio.StreamReader) -> dict:
+  (length,) = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+  return json.loads(await reader.readexactly(length))
+
+def write_message(writer: asyncio.StreamWriter, message: dict):
+  payload = json.dumps(message).encode()
+  writer.write(_HEADER.pack(len(payload)) + payload)
+
+class InferenceError(Exception):
+  pass
+
+class InferenceOverloaded(InferenceError):
+  """The sidecar's queue for a model is full; worth retrying after a pause."""
+  retryable = True
+
+class InferenceUnavailable(InferenceError):
+  """The connection to the sidecar dropped or a request timed out; safe to resend when the request has no side effects."""
+  retryable = True
+
+class InferenceClient:
+  """
+  A worker's connection to the inference sidecar. One Unix socket connection
+  is shared by every request on the worker and responses are matched up by id,
+  so concurrent searches don't wait on each other. At most
+  INFERENCE_MAX_INFLIGHT requests are outstanding. Inference is idempotent, so
+  requests the sidecar turns away because it's busy, loses on a dropped
+  connection (e.g. while it restarts) or doesn't answer in time are retried with
+  backoff on a fresh connection.
+  """
+  def __init__(self, path: str, max_inflight: int | None = None, timeout: float | None = None):
+    self.path = path
+    self.timeout = Config.INFERENCE_TIMEOUT if timeout is None else timeout
+    self._inflight = asyncio.Semaphore(max_inflight or Config.INFERENCE_MAX_INFLIGHT)
+    self._ids = itertools.count()
+    # requests waiting on the current connection
+    self._pending: Dict[int, asyncio.Future] = {}
+    self._connect_lock = asyncio.Lock()
+    self._write_lock = asyncio.Lock()
+    self._writer: Optional[asyncio.StreamWriter] = None
+    self._read_task: Optional[asyncio.Task] = None
+    self.requests = 0
+
+  async def _connect(self) -> Tuple[asyncio.StreamWriter, Dict[int, asyncio.Future]]:
+    async with self._connect_lock:
+      if self._writer is None or self._writer.is_closing():
+        reader, writer = await asyncio.open_unix_connection(self.path)
+        self._writer, self._pending = writer, {}
+        self._read_task = asyncio.create_task(self._read_responses(reader, writer, self._pending))
+        logger.info(f"Connected to inference sidecar at {self.path}")
+      return self._writer, self._pending
+
+  async def _read_responses(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, pending: Dict[int, asyncio.Future]):
+    try:
+      while True:
+        message = await read_message(reader)
+        future = pending.pop(message.get("id"), None)
+        if future is not None and not future.done():
+          future.set_result(message)
+    except (asyncio.IncompleteReadError, ConnectionError) as e:
+      logger.warning(f"Inference sidecar connection closed: {e}")
+    finally:
+      # the next request reconnects; the ones waiting on this connection won't get an answer.
+      # A newer connection may already have replaced it, so only its own requests are failed.
+      self._disconnect(writer)
+      for future in pending.values():
+        if not future.done():
+          future.set_exception(ConnectionError("Inference sidecar connection closed"))
+      pending.clear()
+
+  def _disconnect(self, writer: asyncio.StreamWriter):
+    writer.close()
+    if self._writer is writer:
+      self._writer = None
+
+  async def call(self, op: str, **payload) -> dict:
+    writer, pending = await self._connect()
+    request_id = next(self._ids)
+    future = asyncio.get_running_loop().create_future()
+    pending[request_id] = future
+    try:
+      async with self._write_lock:
+        write_message(writer, {"id": request_id, "op": op, **payload})
+        await writer.drain()
+      message = await asyncio.wait_for(future, self.timeout)
+    except (ConnectionError, asyncio.TimeoutError):
+      # a broken pipe can show up here before the reader notices, and a sidecar that
+      # stops answering may have a half-open connection; either way start a fresh one
+      self._disconnect(writer)
+      raise
+    finally:
+      pending.pop(request_id, None)
+    if "error" in message:
+      raise (InferenceOverloaded if message.get("overloaded") else InferenceError)(message["error"])
+    return message
+
+  async def _infer_once(self, model: str, inputs: List[str]) -> dict:
+    try:
+      return await self.call("infer", model=model, inputs=inputs)
+    except (ConnectionError, FileNotFoundError, asyncio.TimeoutError) as e:
+      # FileNotFoundError: the socket is gone while the sidecar restarts
+      raise InferenceUnavailable(f"Inference sidecar unavailable: {e!r}") from e
+
+  async def infer(self, model: str, inputs: List[str]) -> List[Any]:
+    async with self._inflight:
+      self.requests += 1
+      message = await retry_with_jitter(
+        self._infer_once, model, inputs, retries=Config.INFERENCE_RETRIES, base_delay=0.05, max_delay=1.0
+      )
+    return message["outputs"]
+
+  async def stats(self) -> dict:
+    return (await self.call("stats"))["stats"]
+
+  def close(self):
+    if self._read_task is not None:
+      self._read_task.cancel()
+    if self._writer is not None:
+      self._writer.close()
+      self._writer = None
+
+class RemotePipeline:
+  """
+  Stands in for a local pipeline of the sidecar's model. Inputs are sent in
+  chunks of at most INFERENCE_MAX_BATCH, so the sidecar can mix them with other
+  workers' requests.
+  """
+  def __init__(self, client: InferenceClient, name: str):
+    self.client = client
+    self.name = name
+
+  async def infer(self, inputs: List[str]) -> List[Any]:
+    chunks = list(chunk_list(inputs, Config.INFERENCE_MAX_BATCH))
+    results = await asyncio.gather(*[self.client.infer(self.name, chunk) for chunk in chunks])
+    return [output for outputs in results for output in outputs]
+
+class RemoteModelRegistry:
+  """ModelRegistry for workers that share the sidecar's models instead of loading their own."""
+  def __init__(self, client: InferenceClient):
+    self.client = client
+    self._pipelines: Dict[str, RemotePipeline] = {}
+
+  def get(self, name: str) -> RemotePipeline:
+    if name not in self._pipelines:
+      self._pipelines[name] = RemotePipeline(self.client, name)
+    return self._pipelines[name]
+
+  def warm(self, names: Optional[list[str]] = None):
+    # the sidecar loads (and warms) the models
+    pass
+
+  def stats(self) -> dict:
+    return {}
+
+  def close(self):
+    self.client.close()
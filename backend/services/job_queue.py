@@ -0,0 +1,181 @@
+import logging
+import time
+import uuid
+from typing import Optional, Tuple
+
+from redis.exceptions import WatchError
+
+from backend.core.config import Config
+from backend.models.job import JobStatus
+from backend.models.product import ProductList
+from backend.models.product_search_request import ProductSearchRequest
+from backend.services.search_cache import search_request_key
+
+logger = logging.getLogger(__name__)
+
+QUEUE_KEY = "search_job:queue"
+# jobs a worker has taken off the queue and not finished yet
+PROCESSING_KEY = "search_job:processing"
+
+def _job_key(job_id: str) -> str:
+  return f"search_job:{job_id}"
+
+def _progress_key(job_id: str) -> str:
+  return f"search_job:{job_id}:progress"
+
+def _pending_key(request_key: str) -> str:
+  return f"search_job:pending:{request_key}"
+
+class JobQueue:
+  """
+  Redis-backed queue of search jobs. Job state lives in a hash per job and
+  expires JOB_RESULT_TTL seconds after the last update. Submitting a request
+  identical to one that is still queued or running returns the existing job id.
+  Workers move jobs they take into a processing list and keep a lease on them
+  while they run, so a job whose worker died is put back on the queue by
+  `requeue_stale` (and failed after JOB_MAX_ATTEMPTS runs).
+  """
+  def __init__(self, redis_client, result_ttl: Optional[int] = None, lease_timeout: Optional[int] = None,
+               max_attempts: Optional[int] = None):
+    self.redis = redis_client
+    self.result_ttl = result_ttl or Config.JOB_RESULT_TTL
+    self.lease_timeout = lease_timeout or Config.JOB_LEASE_TIMEOUT
+    self.max_attempts = max_attempts or Config.JOB_MAX_ATTEMPTS
+
+  async def submit(self, search_request: ProductSearchRequest) -> str:
+    request_key = search_request_key(search_request)
+    job_id = uuid.uuid4().hex
+    # claim the request atomically; a concurrent identical submit gets the existing job instead
+    claimed = await self.redis.set(_pending_key(request_key), job_id, nx=True, ex=self.result_ttl)
+    if not claimed:
+      existing = await self.redis.get(_pending_key(request_key))
+      if existing:
+        existing = existing.decode() if isinstance(existing, bytes) else existing
+        logger.info(f"Search request already pending as job {existing}")
+        return existing
+      await self.redis.set(_pending_key(request_key), job_id, ex=self.result_ttl)
+
+    async with self.redis.pipeline(transaction=True) as pipe:
+      pipe.hset(_job_key(job_id), mapping={
+        "status": "queued",
+        "request": search_request.model_dump_json(),
+        "request_key": request_key,
+        "created": time.time()
+      })
+      pipe.expire(_job_key(job_id), self.result_ttl)
+      pipe.lpush(QUEUE_KEY, job_id)
+      await pipe.execute()
+    logger.info(f"Queued search job {job_id}")
+    return job_id
+
+  async def get(self, job_id: str) -> Optional[JobStatus]:
+    job = await self.redis.hgetall(_job_key(job_id))
+    if not job:
+      return None
+    job = {(k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v) for k, v in job.items()}
+    progress = await self.redis.lrange(_progress_key(job_id), 0, -1)
+    return JobStatus(
+      job_id=job_id,
+      status=job["status"],
+      progress=[p.decode() if isinstance(p, bytes) else p for p in progress],
+      result=ProductList.model_validate_json(job["result"]) if job.get("result") else None,
+      error=job.get("error")
+    )
+
+  async def next_job(self, timeout: int = 5) -> Optional[Tuple[str, ProductSearchRequest]]:
+    """Block up to `timeout` seconds for the next job and mark it running."""
+    job_id = await self.redis.blmove(QUEUE_KEY, PROCESSING_KEY, timeout, "RIGHT", "LEFT")
+    if job_id is None:
+      return None
+    job_id = job_id.decode() if isinstance(job_id, bytes) else job_id
+    raw_request = await self.redis.hget(_job_key(job_id), "request")
+    if raw_request is None:
+      logger.warning(f"Search job {job_id} expired before it was picked up")
+      await self.redis.lrem(PROCESSING_KEY, 0, job_id)
+      return None
+    async with self.redis.pipeline(transaction=True) as pipe:
+      pipe.hset(_job_key(job_id), mapping={"status": "running", "lease_until": time.time() + self.lease_timeout})
+      pipe.hdel(_job_key(job_id), "unleased_since")
+      pipe.hincrby(_job_key(job_id), "attempts", 1)
+      await pipe.execute()
+    return job_id, ProductSearchRequest.model_validate_json(raw_request)
+
+  async def heartbeat(self, job_id: str):
+    """Extend the lease on a running job; call it well within JOB_LEASE_TIMEOUT."""
+    await self.redis.hset(_job_key(job_id), "lease_until", time.time() + self.lease_timeout)
+
+  async def requeue_stale(self) -> int:
+    """Put jobs whose worker stopped renewing the lease back on the queue; returns how many."""
+    requeued = 0
+    for job_id in await self.redis.lrange(PROCESSING_KEY, 0, -1):
+      job_id = job_id.decode() if isinstance(job_id, bytes) else job_id
+      try:
+        requeued += await self._requeue_if_stale(job_id)
+      except WatchError:
+        # its worker wrote or renewed the lease while we looked, so it isn't stale
+        continue
+    return requeued
+
+  async def _requeue_if_stale(self, job_id: str) -> int:
+    async with self.redis.pipeline(transaction=True) as pipe:
+      # the lease check and the requeue are one transaction: a lease written in between aborts it
+      await pipe.watch(_job_key(job_id))
+      lease_until, unleased_since, created, attempts = await pipe.hmget(
+        _job_key(job_id), ["lease_until", "unleased_since", "created", "attempts"]
+      )
+      if created is None:
+        # expired along with its result
+        await self.redis.lrem(PROCESSING_KEY, 0, job_id)
+        return 0
+      if lease_until is None:
+        # Moved off the queue but not leased yet. The worker writes the lease right after the move,
+        # so this is either that moment or a worker that died in between: the lease runs from when
+        # we first saw it (not from when it was queued, which may be long ago).
+        if unleased_since is None:
+          await self.redis.hsetnx(_job_key(job_id), "unleased_since", time.time())
+          return 0
+        lease_until = float(unleased_since) + self.lease_timeout
+      if float(lease_until) > time.time():
+        return 0
+      give_up = int(attempts or 0) >= self.max_attempts
+      pipe.multi()
+      # whoever removes it from the processing list owns the recovery
+      pipe.lrem(PROCESSING_KEY, 1, job_id)
+      if not give_up:
+        pipe.hset(_job_key(job_id), "status", "queued")
+        pipe.hdel(_job_key(job_id), "lease_until", "unleased_since")
+        # next in line, it has waited long enough
+        pipe.rpush(QUEUE_KEY, job_id)
+      removed, *_ = await pipe.execute()
+    if not removed:
+      return 0
+    if give_up:
+      logger.error(f"Search job {job_id} lost its worker {attempts} times, giving up")
+      await self.fail(job_id, "Internal Server Error: the search worker stopped while running this job")
+      return 0
+    logger.warning(f"Search job {job_id} lost its worker, requeueing")
+    return 1
+
+  async def add_progress(self, job_id: str, message: str):
+    async with self.redis.pipeline(transaction=False) as pipe:
+      pipe.rpush(_progress_key(job_id), message)
+      pipe.ltrim(_progress_key(job_id), -Config.JOB_PROGRESS_LIMIT, -1)
+      pipe.expire(_progress_key(job_id), self.result_ttl)
+      await pipe.execute()
+
+  async def _finish(self, job_id: str, fields: dict):
+    request_key = await self.redis.hget(_job_key(job_id), "request_key")
+    async with self.redis.pipeline(transaction=True) as pipe:
+      pipe.hset(_job_key(job_id), mapping=fields)
+      pipe.expire(_job_key(job_id), self.result_ttl)
+      pipe.lrem(PROCESSING_KEY, 0, job_id)
+      if request_key:
+        request_key = request_key.decode() if isinstance(request_key, bytes) else request_key
+        pipe.delete(_pending_key(request_key))
+      await pipe.execute()
+
+  async def complete(self, job_id: str, result: ProductList):
+    await self._finish(job_id, {"status": "completed", "result": result.model_dump_json()})
+
+  async def fail(self, job_id: str, error: str):
+    await self._finish(job_id, {"status": "failed", "error": error})
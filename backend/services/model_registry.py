@@ -0,0 +1,186 @@
+import logging
+import resource
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+from backend.core.config import Config
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class ModelSpec:
+  task: str
+  model: Optional[str] = None
+  kwargs: Dict[str, Any] = field(default_factory=dict)
+
+@dataclass
+class ModelStats:
+  name: str
+  device: int
+  backend: str
+  load_seconds: float
+  rss_delta_mb: float
+
+# Models used by the search pipeline, keyed by registry name.
+DEFAULT_MODEL_SPECS: Dict[str, ModelSpec] = {
+  # pinned to the pipeline("ner") default so the ONNX export knows what to load
+  "ner": ModelSpec(
+    task="ner",
+    model="dbmdz/bert-large-cased-finetuned-conll03-english",
+    kwargs={"grouped_entities": True}
+  ),
+  "sentiment": ModelSpec(
+    task="sentiment-analysis",
+    model="distilbert-base-uncased-finetuned-sst-2-english"
+  ),
+}
+
+def _max_rss_mb() -> float:
+  # ru_maxrss is reported in kilobytes on Linux
+  return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def resolve_device(requested: int) -> int:
+  """Return the requested CUDA device if it exists, otherwise -1 (CPU)."""
+  if requested < 0:
+    return -1
+  try:
+    import torch
+    if torch.cuda.is_available() and requested < torch.cuda.device_count():
+      return requested
+  except ImportError:
+    pass
+  logger.warning(f"CUDA device {requested} not available, falling back to CPU")
+  return -1
+
+MODEL_BACKENDS = ("eager", "quantized", "onnx")
+
+# weight precision each backend runs at; scores from different precisions aren't interchangeable
+BACKEND_PRECISION = {"eager": "fp32", "quantized": "int8", "onnx": "fp32"}
+
+# ONNX Runtime model classes by pipeline task
+_ORT_MODEL_CLASSES = {
+  "ner": "ORTModelForTokenClassification",
+  "sentiment-analysis": "ORTModelForSequenceClassification",
+}
+
+def set_inference_threads(threads: int):
+  if threads <= 0:
+    return
+  try:
+    import torch
+    torch.set_num_threads(threads)
+  except ImportError:
+    pass
+
+def _load_eager(spec: ModelSpec, device: int, threads: int):
+  from transformers import pipeline
+  kwargs = dict(spec.kwargs)
+  if spec.model:
+    kwargs["model"] = spec.model
+  return pipeline(spec.task, device=device, **kwargs)
+
+def _load_quantized(spec: ModelSpec, device: int, threads: int):
+  # dynamic quantization only targets the CPU kernels
+  import torch
+  model = _load_eager(spec, -1, threads)
+  model.model = torch.quantization.quantize_dynamic(model.model, {torch.nn.Linear}, dtype=torch.qint8)
+  return model
+
+def _load_onnx(spec: ModelSpec, device: int, threads: int):
+  import onnxruntime
+  import optimum.onnxruntime
+  from transformers import AutoTokenizer, pipeline
+  session_options = onnxruntime.SessionOptions()
+  if threads > 0:
+    session_options.intra_op_num_threads = threads
+  model_class = getattr(optimum.onnxruntime, _ORT_MODEL_CLASSES[spec.task])
+  model = model_class.from_pretrained(spec.model, export=True, session_options=session_options)
+  return pipeline(spec.task, model=model, tokenizer=AutoTokenizer.from_pretrained(spec.model), **spec.kwargs)
+
+_BACKEND_LOADERS = {
+  "eager": _load_eager,
+  "quantized": _load_quantized,
+  "onnx": _load_onnx,
+}
+
+class ModelRegistry:
+  """
+  Process-wide store of transformer pipelines. Each model is loaded at most once
+  per worker and shared by every request. `backend` picks how models run
+  (MODEL_BACKEND); quantized and ONNX models always run on the CPU.
+  """
+  def __init__(self, specs: Optional[Dict[str, ModelSpec]] = None, device: Optional[int] = None,
+               loader: Optional[Callable[..., Any]] = None, backend: Optional[str] = None,
+               threads: Optional[int] = None):
+    self.specs = specs if specs is not None else DEFAULT_MODEL_SPECS
+    self.backend = backend or Config.MODEL_BACKEND
+    if self.backend not in MODEL_BACKENDS:
+      raise ValueError(f"Unknown model backend: {self.backend}")
+    self.threads = Config.MODEL_THREADS if threads is None else threads
+    requested_device = Config.MODEL_DEVICE if device is None else device
+    self._requested_device = requested_device if self.backend == "eager" else -1
+    self._device: Optional[int] = None
+    self._loader = loader
+    self._models: Dict[str, Any] = {}
+    self._stats: Dict[str, ModelStats] = {}
+    self._lock = threading.Lock()
+
+  @property
+  def device(self) -> int:
+    # checking for CUDA imports torch, so it waits until the first model is loaded
+    if self._device is None:
+      self._device = resolve_device(self._requested_device)
+    return self._device
+
+  def _load(self, name: str):
+    spec = self.specs[name]
+    rss_before = _max_rss_mb()
+    started = time.perf_counter()
+    set_inference_threads(self.threads)
+    if self._loader is not None:
+      kwargs = dict(spec.kwargs)
+      if spec.model:
+        kwargs["model"] = spec.model
+      model = self._loader(spec.task, device=self.device, **kwargs)
+    else:
+      model = _BACKEND_LOADERS[self.backend](spec, self.device, self.threads)
+    stats = ModelStats(
+      name=name,
+      device=self.device,
+      backend=self.backend,
+      load_seconds=time.perf_counter() - started,
+      rss_delta_mb=_max_rss_mb() - rss_before
+    )
+    self._stats[name] = stats
+    logger.info(f"Loaded model '{name}' ({stats.backend}) on device {stats.device} in {stats.load_seconds:.2f}s (+{stats.rss_delta_mb:.1f} MB RSS)")
+    return model
+
+  def get(self, name: str):
+    model = self._models.get(name)
+    if model is not None:
+      return model
+    with self._lock:
+      # another thread may have finished loading while we waited
+      if name not in self._models:
+        self._models[name] = self._load(name)
+      return self._models[name]
+
+  def warm(self, names: Optional[list[str]] = None):
+    for name in names or list(self.specs):
+      self.get(name)
+
+  def stats(self) -> Dict[str, ModelStats]:
+    return dict(self._stats)
+
+  def close(self):
+    with self._lock:
+      self._models.clear()
+
+def create_model_registry():
+  """Models loaded in this process, or the inference sidecar's when INFERENCE_SOCKET is set."""
+  if Config.INFERENCE_SOCKET:
+    from backend.services.inference_client import InferenceClient, RemoteModelRegistry
+    return RemoteModelRegistry(InferenceClient(Config.INFERENCE_SOCKET))
+  return ModelRegistry()
@@ -0,0 +1,110 @@
+import asyncio
+import hashlib
+import logging
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional
+
+from backend.core.config import Config
+from backend.core.metrics import observe_batch, record_cache
+from backend.services.inference_client import RemoteModelRegistry, RemotePipeline
+from backend.utils.cache import LRUCache
+from backend.utils.helpers import chunk_list
+
+logger = logging.getLogger(__name__)
+
+# NER output keyed by comment-body hash, shared by every search on this worker
+ner_cache = LRUCache(maxsize=Config.NER_CACHE_SIZE)
+
+_executor: Optional[Executor] = None
+_worker_pipeline = None
+
+def body_key(body: str) -> str:
+  return hashlib.sha256(body.encode()).hexdigest()
+
+def _plain_entities(entities) -> List[dict]:
+  # keep only what callers use, as plain python types (numpy scores don't cache or pickle well)
+  return [
+    {"entity_group": e["entity_group"], "word": e["word"], "score": float(e["score"])}
+    for e in entities
+  ]
+
+def run_ner_batch(ner_pipeline, bodies: List[str]) -> List[List[dict]]:
+  results = ner_pipeline(bodies, batch_size=len(bodies))
+  return [_plain_entities(entities) for entities in results]
+
+def _init_process_worker():
+  # pipelines can't be pickled, so each pool process loads its own copy once
+  global _worker_pipeline
+  from backend.services.model_registry import ModelRegistry
+  _worker_pipeline = ModelRegistry().get("ner")
+
+def _run_batch_in_process(bodies: List[str]) -> List[List[dict]]:
+  return run_ner_batch(_worker_pipeline, bodies)
+
+def ner_pipeline_for(model_registry):
+  """
+  What extract_entities should be given: the registry's NER pipeline, or None
+  with the process executor, whose pool processes load their own copy (loading
+  it here too would keep an extra one in this process).
+  """
+  if Config.NER_EXECUTOR == "process" and not isinstance(model_registry, RemoteModelRegistry):
+    return None
+  return model_registry.get("ner")
+
+def get_executor() -> Executor:
+  global _executor
+  if _executor is None:
+    if Config.NER_EXECUTOR == "process":
+      _executor = ProcessPoolExecutor(max_workers=Config.NER_WORKERS, initializer=_init_process_worker)
+    else:
+      _executor = ThreadPoolExecutor(max_workers=Config.NER_WORKERS, thread_name_prefix="ner")
+  return _executor
+
+def shutdown_executor():
+  global _executor
+  if _executor is not None:
+    _executor.shutdown(wait=False, cancel_futures=True)
+    _executor = None
+
+async def extract_entities(bodies: List[str], ner_pipeline, batch_size: Optional[int] = None) -> List[List[dict]]:
+  """
+  Run NER over `bodies` off the event loop, in batches, skipping bodies whose
+  entities are already cached. Results line up with `bodies`. `ner_pipeline`
+  comes from ner_pipeline_for, and is unused with the process executor.
+  """
+  batch_size = batch_size or Config.NER_BATCH_SIZE
+  keys = [body_key(body) for body in bodies]
+
+  found = {}
+  missing = {}
+  for key, body in zip(keys, bodies):
+    if key in found or key in missing:
+      continue
+    cached = ner_cache.get(key)
+    if cached is None:
+      missing[key] = body
+    else:
+      found[key] = cached
+  logger.info(f"NER cache: {len(bodies) - len(missing)} hits, {len(missing)} misses")
+  record_cache("ner", hits=len(bodies) - len(missing), misses=len(missing))
+
+  if missing:
+    loop = asyncio.get_running_loop()
+    batches = list(chunk_list(list(missing.items()), batch_size))
+    for batch in batches:
+      observe_batch("ner", len(batch))
+    if isinstance(ner_pipeline, RemotePipeline):
+      # the sidecar batches these with other workers' requests
+      futures = [ner_pipeline.infer([body for _, body in batch]) for batch in batches]
+    else:
+      executor = get_executor()
+      if isinstance(executor, ProcessPoolExecutor):
+        futures = [loop.run_in_executor(executor, _run_batch_in_process, [body for _, body in batch]) for batch in batches]
+      else:
+        futures = [loop.run_in_executor(executor, run_ner_batch, ner_pipeline, [body for _, body in batch]) for batch in batches]
+    for batch, results in zip(batches, await asyncio.gather(*futures)):
+      for (key, _), entities in zip(batch, results):
+        ner_cache.set(key, entities)
+        found[key] = entities
+
+  return [found[key] for key in keys]
@@ -1,41 +1,142 @@
 import logging
+import time
+import httpx
 from backend.core.config import Config
-from openai import OpenAI
+from backend.core.metrics import external_call, observe_time_to_first_token
+from backend.services.chat_cache import chat_key
+from backend.utils.retry import retry_with_jitter
 from pydantic import BaseModel
+from typing import TYPE_CHECKING, AsyncIterator
+
+if TYPE_CHECKING:
+  from openai import AsyncOpenAI
+  from backend.services.chat_cache import ChatResponseCache
+  from backend.services.subject_phrases import SubjectPhraseCache
 
 logger = logging.getLogger(__name__)
-# Configure openai api key
-openai = OpenAI(api_key=Config.OPENAI_API_KEY)
+
+def create_openai_client(transport: httpx.AsyncBaseTransport | None = None) -> "AsyncOpenAI":
+  """
+  Build the app-scoped async client. Retries are handled by retry_with_jitter,
+  so the SDK's own retries are disabled. `transport` swaps out the HTTP layer
+  (e.g. for record/replay).
+  """
+  # the SDK takes over half a second to import, so wait until a client is needed
+  from openai import AsyncOpenAI
+
+  return AsyncOpenAI(
+    api_key=Config.OPENAI_API_KEY,
+    base_url=Config.OPENAI_BASE_URL,
+    max_retries=0,
+    timeout=Config.OPENAI_TIMEOUT,
+    http_client=httpx.AsyncClient(
+      limits=httpx.Limits(
+        max_connections=Config.OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=Config.OPENAI_MAX_CONNECTIONS
+      ),
+      transport=transport
+    )
+  )
 
 class SubjectPhrasesRequest(BaseModel):
   included_words: list[str]
   excluded_words: list[str]
 
 class OpenAIService:
-  def __init__(self):
-    self.client = OpenAI()
+  def __init__(self, client: "AsyncOpenAI", subject_cache: "SubjectPhraseCache | None" = None,
+               chat_cache: "ChatResponseCache | None" = None):
+    self.client = client
+    # when set, subject phrases are only requested for categories not seen before
+    self.subject_cache = subject_cache
+    # when set, identical chat prompts are answered once
+    self.chat_cache = chat_cache
 
   async def chat(self, user_message: str, model: str, system_prompt: str = "You are a helpful assistant") -> str:
+    started = time.perf_counter()
     try:
-      response = self.client.chat.completions.create(
+      if self.chat_cache is None:
+        text, source = await self.fetch_chat(user_message, model, system_prompt), "upstream"
+      else:
+        text, source = await self.chat_cache.get_or_fetch(
+          chat_key(model, system_prompt, user_message),
+          lambda: self.fetch_chat(user_message, model, system_prompt)
+        )
+      observe_time_to_first_token(model, "blocking", source, time.perf_counter() - started)
+      return text
+    except Exception as e:
+      logger.error(f"Error fetching response: {e}")
+      return "Sorry, I'm having trouble understanding you right now."
+
+  async def chat_stream(self, user_message: str, model: str,
+                        system_prompt: str = "You are a helpful assistant") -> AsyncIterator[str]:
+    """Chunks of the completion as they arrive."""
+    started = time.perf_counter()
+    if self.chat_cache is None:
+      chunks, source = self.fetch_chat_stream(user_message, model, system_prompt), "upstream"
+    else:
+      chunks, source = await self.chat_cache.stream(
+        chat_key(model, system_prompt, user_message),
+        lambda: self.fetch_chat_stream(user_message, model, system_prompt)
+      )
+    first = True
+    try:
+      async for chunk in chunks:
+        if first:
+          observe_time_to_first_token(model, "stream", source, time.perf_counter() - started)
+          first = False
+        yield chunk
+    except Exception as e:
+      logger.error(f"Error streaming response: {e}")
+      # once text has gone out there's no way to signal the error in a plain text body
+      if first:
+        yield "Sorry, I'm having trouble understanding you right now."
+
+  async def fetch_chat(self, user_message: str, model: str, system_prompt: str) -> str:
+    async with external_call("openai", "chat"):
+      response = await retry_with_jitter(
+        self.client.chat.completions.create,
+        retries=Config.OPENAI_MAX_RETRIES,
         model=model,
         messages=[
           {"role": "system", "content": system_prompt},
           {"role": "user", "content": user_message}
         ]
       )
-      return response.choices[0].message.content
-    except Exception as e:
-      logger.error(f"Error fetching response: {e}")
-      return "Sorry, I'm having trouble understanding you right now."
+    return response.choices[0].message.content
+
+  async def fetch_chat_stream(self, user_message: str, model: str, system_prompt: str) -> AsyncIterator[str]:
+    async with external_call("openai", "chat_stream"):
+      # only opening the stream is retried, a stream that breaks halfway fails
+      stream = await retry_with_jitter(
+        self.client.chat.completions.create,
+        retries=Config.OPENAI_MAX_RETRIES,
+        model=model,
+        messages=[
+          {"role": "system", "content": system_prompt},
+          {"role": "user", "content": user_message}
+        ],
+        stream=True
+      )
+      async with stream:
+        async for chunk in stream:
+          if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
     
-  async def find_subject_phrases(self, query: str) -> dict:
-    completion = self.client.beta.chat.completions.parse(
-      model="gpt-4o-2024-08-06",
-      messages=[
-          {"role": "system", "content": "Given a search query provide a comprehensive list of phrases that should be included (because they are relevant to the query) and excluded (because they are not related at all). Please respond in the provided format"},
-          {"role": "user", "content": f"{query}"},
-      ],
-      response_format=SubjectPhrasesRequest,
-    )
+  async def find_subject_phrases(self, query: str) -> SubjectPhrasesRequest:
+    if self.subject_cache is None:
+      return await self.fetch_subject_phrases(query)
+    return await self.subject_cache.get_or_fetch(query, self.fetch_subject_phrases)
+
+  async def fetch_subject_phrases(self, query: str) -> SubjectPhrasesRequest:
+    async with external_call("openai", "subject_phrases"):
+      completion = await retry_with_jitter(
+        self.client.beta.chat.completions.parse,
+        retries=Config.OPENAI_MAX_RETRIES,
+        model="gpt-4o-2024-08-06",
+        messages=[
+            {"role": "system", "content": "Given a search query provide a comprehensive list of phrases that should be included (because they are relevant to the query) and excluded (because they are not related at all). Please respond in the provided format"},
+            {"role": "user", "content": f"{query}"},
+        ],
+        response_format=SubjectPhrasesRequest,
+      )
     return completion.choices[0].message.parsed
\ No newline at end of file
@@ -0,0 +1,344 @@
+import json
+import logging
+import math
+import re
+import time
+from array import array
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from backend.core.config import Config
+from backend.models.product import Product
+from backend.services.product_matcher import normalize_phrase
+
+logger = logging.getLogger(__name__)
+
+# sizes and quantities ("5.5qt", "12 inch", '10"') say which variant, not which product
+_MEASURE_RE = re.compile(
+  r"\b\d+(?:\.\d+)?\s*-?\s*(?:qt|quarts?|oz|ounces?|in|inch|inches|cm|mm|l|liters?|litres?|ml|lbs?|pounds?|"
+  r"gal|gallons?|pcs?|pieces?|cups?|pack)\b|\b\d+(?:\.\d+)?\s*\"",
+  re.IGNORECASE
+)
+_NUMBER_RE = re.compile(r"\d+")
+
+def _decode(value) -> str:
+  return value.decode() if isinstance(value, bytes) else value
+
+def brand_key(brand_name: str) -> str:
+  # spacing inside brands varies ("Le Creuset", "LeCreuset"), so it's dropped
+  return normalize_phrase(brand_name).replace(" ", "")
+
+def product_key(product: Product) -> str:
+  """Normalized identity of a product: "lecreuset|dutch oven" for "LeCreuset 5.5qt Dutch Ovens"."""
+  brand = brand_key(product.brand_name)
+  brand_tokens = normalize_phrase(product.brand_name).split()
+  tokens = normalize_phrase(_MEASURE_RE.sub(" ", product.product_name)).split()
+  # product names often repeat the brand
+  if brand_tokens and tokens[:len(brand_tokens)] == brand_tokens:
+    tokens = tokens[len(brand_tokens):]
+  elif tokens and tokens[0] == brand:
+    tokens = tokens[1:]
+  return f"{brand}|{' '.join(tokens) or normalize_phrase(product.product_name)}"
+
+def compact_key(key: str) -> str:
+  # "good grip" and "goodgrip" are the same product
+  return key.replace(" ", "")
+
+def trigrams(key: str) -> Set[str]:
+  padded = f"  {key.replace('|', ' ')} "
+  return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def similarity(a: Set[str], b: Set[str]) -> float:
+  return len(a & b) / len(a | b) if a or b else 0.0
+
+def _numbers(key: str) -> Set[str]:
+  return set(_NUMBER_RE.findall(key))
+
+class ProductCatalogue:
+  """
+  Every product extraction has produced, resolved to one canonical entry per
+  real product. Lookups try the normalized key, then the alias table, then a
+  fuzzy match: a trigram index over brands finds the brands the query could be
+  (only brands sharing one of its rarest trigrams are scored), and only those
+  brands' products are compared. A lookup touches a few brands' worth of
+  entries however big the catalogue gets. Variants that resolve to an entry
+  become its aliases, so the next lookup is exact and comment matching also
+  finds them.
+
+  Entries and aliases live in Redis hashes shared by every worker. Every save
+  also bumps a revision counter and appends what it wrote to a changelog
+  stream, so a worker whose revision is behind only reads the saves it missed
+  (at most every CATALOGUE_REFRESH seconds); the full hashes are read on the
+  first load, or when the changelog was trimmed past the worker's position.
+  Each worker keeps at most `max_entries` entries: past that, the least
+  recently used are dropped from the local index (they stay in Redis, and a
+  reload only adds entries while there's room).
+  """
+  def __init__(self, redis_client, namespace: str = "catalogue", threshold: float | None = None,
+               max_entries: int | None = None):
+    self.redis = redis_client
+    self.products_key = f"{namespace}:products"
+    self.aliases_key = f"{namespace}:aliases"
+    self.revision_key = f"{namespace}:revision"
+    # one entry per save, holding the products and aliases it wrote
+    self.changes_key = f"{namespace}:changes"
+    self.threshold = Config.CATALOGUE_MATCH_THRESHOLD if threshold is None else threshold
+    self.max_entries = max_entries or Config.CATALOGUE_MAX_ENTRIES
+    self.products: List[Product] = []
+    self.keys: List[str] = []
+    self.ids: Dict[str, int] = {}
+    self.compact_ids: Dict[str, int] = {}
+    # alias key -> entry id, and the alias names comment matching should also look for
+    self.alias_ids: Dict[str, int] = {}
+    self.alias_names: Dict[int, Set[str]] = {}
+    # brand key -> its entry ids, and trigram -> brand keys containing it
+    self.brand_ids: Dict[str, array] = {}
+    self._brand_grams: Dict[str, Set[str]] = {}
+    self._pending_products: Dict[str, Product] = {}
+    self._pending_aliases: Dict[str, Tuple[str, str]] = {}
+    # when each entry was last looked up, for eviction
+    self._last_used = array("q")
+    self._clock = 0
+    self._revision: Optional[int] = None
+    # id of the last changelog entry applied
+    self._change_id = "0-0"
+    self._loaded_at = 0.0
+    self.exact_hits = 0
+    self.fuzzy_hits = 0
+    self.inserts = 0
+    self.evictions = 0
+
+  def __len__(self) -> int:
+    return len(self.products)
+
+  def _touch(self, entry_id: int):
+    self._clock += 1
+    self._last_used[entry_id] = self._clock
+
+  def _insert(self, key: str, product: Product) -> int:
+    entry_id = len(self.products)
+    self.products.append(product)
+    self.keys.append(key)
+    self._clock += 1
+    self._last_used.append(self._clock)
+    self.ids[key] = entry_id
+    self.compact_ids.setdefault(compact_key(key), entry_id)
+    brand = key.partition("|")[0]
+    if brand not in self.brand_ids:
+      self.brand_ids[brand] = array("q")
+      for gram in trigrams(brand):
+        self._brand_grams.setdefault(gram, set()).add(brand)
+    self.brand_ids[brand].append(entry_id)
+    return entry_id
+
+  def _evict(self):
+    """Rebuild the index from the most recently used entries, leaving room for a tenth more."""
+    by_use = sorted(range(len(self.products)), key=self._last_used.__getitem__)
+    keep = sorted(by_use[len(by_use) - max(self.max_entries * 9 // 10, 1):])
+    new_ids = {old_id: new_id for new_id, old_id in enumerate(keep)}
+    products, keys, last_used = self.products, self.keys, self._last_used
+    aliases = [(key, entry_id) for key, entry_id in self.alias_ids.items() if entry_id in new_ids]
+    alias_names = self.alias_names
+    self.evictions += len(products) - len(keep)
+
+    self.products, self.keys, self.ids, self.compact_ids = [], [], {}, {}
+    self.alias_ids, self.alias_names, self.brand_ids, self._brand_grams = {}, {}, {}, {}
+    self._last_used = array("q")
+    for old_id in keep:
+      self._insert(keys[old_id], products[old_id])
+    self._last_used = array("q", (last_used[old_id] for old_id in keep))
+    for key, old_id in aliases:
+      self.alias_ids[key] = new_ids[old_id]
+    for old_id, names in alias_names.items():
+      if old_id in new_ids:
+        self.alias_names[new_ids[old_id]] = names
+    logger.info(f"Product catalogue dropped {len(products) - len(keep)} least recently used entries")
+
+  def _add_alias(self, key: str, entry_id: int, name: str):
+    self.alias_ids[key] = entry_id
+    canonical = self.products[entry_id]
+    if normalize_phrase(name) != normalize_phrase(canonical.product_name):
+      self.alias_names.setdefault(entry_id, set()).add(name)
+
+  def find(self, product: Product) -> Optional[int]:
+    """Entry id for `product` (or a variant of it), None if it isn't catalogued."""
+    return self._find_key(product_key(product))
+
+  def _find_key(self, key: str) -> Optional[int]:
+    entry_id = self.ids.get(key)
+    if entry_id is None:
+      entry_id = self.alias_ids.get(key)
+    if entry_id is None:
+      entry_id = self.compact_ids.get(compact_key(key))
+    if entry_id is not None:
+      self.exact_hits += 1
+      self._touch(entry_id)
+      return entry_id
+    entry_id = self._fuzzy_find(key)
+    if entry_id is not None:
+      self.fuzzy_hits += 1
+      self._touch(entry_id)
+    return entry_id
+
+  def _similar_brands(self, brand: str) -> List[str]:
+    grams = trigrams(brand)
+    # a match needs ceil(threshold * |grams|) shared trigrams, so it must share one of the rarest |grams| - that + 1
+    ordered = sorted(grams, key=lambda gram: len(self._brand_grams.get(gram, ())))
+    candidates = set()
+    for gram in ordered[:len(grams) - math.ceil(self.threshold * len(grams)) + 1]:
+      candidates |= self._brand_grams.get(gram, set())
+    return [candidate for candidate in candidates if similarity(grams, trigrams(candidate)) >= self.threshold]
+
+  def _fuzzy_find(self, key: str) -> Optional[int]:
+    grams = trigrams(key)
+    numbers = _numbers(key)
+    words = key.count(" ")
+    best_id, best_score = None, self.threshold
+    for brand in self._similar_brands(key.partition("|")[0]):
+      for candidate in self.brand_ids[brand]:
+        candidate_key = self.keys[candidate]
+        # different model numbers are different products however similar the rest is, and an extra
+        # word usually means a more specific product ("dutch oven lid"), so only spelling variants match
+        if candidate_key.count(" ") != words or _numbers(candidate_key) != numbers:
+          continue
+        score = similarity(grams, trigrams(candidate_key))
+        if score >= best_score:
+          best_id, best_score = candidate, score
+    return best_id
+
+  def add(self, product: Product) -> int:
+    """Entry id for `product`, adding it (or recording it as an alias of a close match) as needed."""
+    key = product_key(product)
+    entry_id = self._find_key(key)
+    if entry_id is None:
+      if len(self.products) >= self.max_entries:
+        self._evict()
+      entry_id = self._insert(key, product)
+      self.inserts += 1
+      self._pending_products[key] = product
+    elif key != self.keys[entry_id] and key not in self.alias_ids:
+      self._add_alias(key, entry_id, product.product_name)
+      self._pending_aliases[key] = (self.keys[entry_id], product.product_name)
+    return entry_id
+
+  def canonicalize(self, products: Iterable[Product]) -> List[Product]:
+    """One canonical Product per distinct real product, in first-seen order."""
+    seen = set()
+    unique = []
+    for product in products:
+      if not product.brand_name.strip() and not product.product_name.strip():
+        continue
+      entry_id = self.add(product)
+      # by key, since an eviction renumbers the entries
+      if self.keys[entry_id] not in seen:
+        seen.add(self.keys[entry_id])
+        unique.append(self.products[entry_id])
+    return unique
+
+  def aliases_for(self, products: Iterable[Product]) -> Dict[Tuple[str, str], List[str]]:
+    """Alias names per (brand, product), in the shape ProductMatcher takes."""
+    aliases = {}
+    for product in products:
+      entry_id = self.ids.get(product_key(product))
+      if entry_id is not None and entry_id in self.alias_names:
+        aliases[(product.brand_name, product.product_name)] = sorted(self.alias_names[entry_id])
+    return aliases
+
+  async def refresh(self, force: bool = False):
+    """Pick up entries other workers added."""
+    if not force and time.monotonic() - self._loaded_at < Config.CATALOGUE_REFRESH:
+      return
+    self._loaded_at = time.monotonic()
+    try:
+      # read before the entries, so a save racing with this load is picked up next time
+      revision = int(await self.redis.get(self.revision_key) or 0)
+      # nothing saved since the last load
+      if revision == self._revision:
+        return
+      if self._revision is not None and await self._load_changes(revision - self._revision):
+        return
+      await self._load_all()
+    except Exception as e:
+      logger.warning(f"Could not load product catalogue from Redis: {e}")
+      return
+    logger.info(f"Product catalogue loaded: {self.stats()}")
+
+  async def _load_changes(self, missed: int) -> bool:
+    """Apply the saves since the last load; False if the changelog no longer has all of them."""
+    changes = await self.redis.xrange(self.changes_key, min=f"({self._change_id}")
+    # every save adds one entry with its revision bump, so fewer entries means some were trimmed
+    if len(changes) < missed:
+      logger.info(f"Product catalogue is {missed} saves behind, past the changelog; reloading it all")
+      return False
+    for change_id, fields in changes:
+      fields = {_decode(field): value for field, value in fields.items()}
+      self._apply(json.loads(fields["products"]), json.loads(fields["aliases"]))
+    if changes:
+      self._change_id = _decode(changes[-1][0])
+    self._revision += len(changes)
+    logger.info(f"Product catalogue applied {len(changes)} saves")
+    return True
+
+  async def _load_all(self):
+    # the revision and changelog position of the snapshot; saves made while it loads are applied again later, which is harmless
+    async with self.redis.pipeline(transaction=True) as pipe:
+      pipe.get(self.revision_key)
+      pipe.xrevrange(self.changes_key, count=1)
+      revision, last_change = await pipe.execute()
+    products = await self.redis.hgetall(self.products_key)
+    aliases = await self.redis.hgetall(self.aliases_key)
+    self._apply(
+      {_decode(key): json.loads(value) for key, value in products.items()},
+      {_decode(key): json.loads(value) for key, value in aliases.items()}
+    )
+    self._revision = int(revision or 0)
+    self._change_id = _decode(last_change[0][0]) if last_change else "0-0"
+
+  def _apply(self, products: Dict[str, list], aliases: Dict[str, list]):
+    for key, (brand_name, product_name) in products.items():
+      if len(self.products) >= self.max_entries:
+        break
+      if key not in self.ids:
+        self._insert(key, Product(brand_name=brand_name, product_name=product_name))
+    for key, (canonical_key, name) in aliases.items():
+      if key not in self.alias_ids and canonical_key in self.ids:
+        self._add_alias(key, self.ids[canonical_key], name)
+
+  async def save(self):
+    """Write entries and aliases added since the last save to Redis."""
+    if not self._pending_products and not self._pending_aliases:
+      return
+    # taken before the first await, so a concurrent save doesn't write them again
+    products, aliases = self._pending_products, self._pending_aliases
+    self._pending_products, self._pending_aliases = {}, {}
+    product_values = {key: [product.brand_name, product.product_name] for key, product in products.items()}
+    alias_values = {key: list(value) for key, value in aliases.items()}
+    try:
+      async with self.redis.pipeline(transaction=True) as pipe:
+        if products:
+          pipe.hset(self.products_key, mapping={key: json.dumps(value) for key, value in product_values.items()})
+        if aliases:
+          pipe.hset(self.aliases_key, mapping={key: json.dumps(value) for key, value in alias_values.items()})
+        pipe.xadd(self.changes_key, {"products": json.dumps(product_values), "aliases": json.dumps(alias_values)},
+                  maxlen=Config.CATALOGUE_CHANGELOG_SIZE, approximate=True)
+        pipe.incr(self.revision_key)
+        *_, change_id, revision = await pipe.execute()
+    except Exception as e:
+      logger.warning(f"Could not save product catalogue to Redis: {e}")
+      # kept for the next save; anything added since takes precedence
+      self._pending_products = {**products, **self._pending_products}
+      self._pending_aliases = {**aliases, **self._pending_aliases}
+      return
+    # only our own save since the last load, so there's nothing to reload
+    if self._revision is not None and revision == self._revision + 1:
+      self._revision = revision
+      self._change_id = _decode(change_id)
+
+  def stats(self) -> dict:
+    return {
+      "products": len(self.products),
+      "aliases": len(self.alias_ids),
+      "exact_hits": self.exact_hits,
+      "fuzzy_hits": self.fuzzy_hits,
+      "inserts": self.inserts,
+      "evictions": self.evictions
+    }
@@ -0,0 +1,83 @@
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from backend.models.product import Product
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_POSSESSIVE_RE = re.compile(r"['’]s\b", re.IGNORECASE)
+
+def tokenize(text: str) -> List[str]:
+  return _TOKEN_RE.findall(text.lower())
+
+# "-ies" words that aren't "-y" plurals: the same in both numbers, or plurals of "-ie" nouns
+_IES_EXCEPTIONS = {"series", "species"}
+_IE_PLURALS = {"movies", "cookies", "hoodies", "beanies", "smoothies", "brownies", "calories", "selfies"}
+
+def singularize(token: str) -> str:
+  """
+  Crude English plural stripping, enough for "cookers", "boxes" and "batteries"
+  to meet their singular. Endings that are as often singular as plural ("lens",
+  "news", "series", "glass", "cactus") are left alone.
+  """
+  if len(token) <= 3 or token in _IES_EXCEPTIONS or token.endswith(("ss", "us", "is", "ns", "ws")):
+    return token
+  if token.endswith("ies") and len(token) > 4 and token not in _IE_PLURALS:
+    return token[:-3] + "y"
+  if token.endswith(("ches", "shes", "sses", "xes", "zes")):
+    return token[:-2]
+  if token.endswith("s"):
+    return token[:-1]
+  return token
+
+def normalize_phrase(text: str) -> str:
+  """Lowercased, punctuation-free, singular form of a phrase, for set lookups ("Rice-Cookers" -> "rice cooker")."""
+  return " ".join(singularize(token) for token in tokenize(_POSSESSIVE_RE.sub("", text)))
+
+class ProductMatcher:
+  """
+  Token index over normalized brand names, product names and aliases, built once
+  per search. `match` finds every product mentioned in a text in a single pass
+  over its tokens, and only matches whole words ("oxo" won't match "boxOXOne").
+  With `match_brands=False` a bare brand mention doesn't count as a match.
+  """
+  def __init__(self, products: List[Product], aliases: Optional[Dict[Tuple[str, str], Iterable[str]]] = None,
+               match_brands: bool = True):
+    self.products = products
+    # first token -> phrase length -> phrase tokens -> product indices
+    self._index: Dict[str, Dict[int, Dict[Tuple[str, ...], Set[int]]]] = {}
+    aliases = aliases or {}
+    for i, product in enumerate(products):
+      phrases = [product.product_name, *aliases.get((product.brand_name, product.product_name), [])]
+      if match_brands:
+        phrases.append(product.brand_name)
+      for phrase in phrases:
+        self._add_phrase(phrase, i)
+
+  def _add_phrase(self, phrase: str, product_index: int):
+    tokens = tuple(tokenize(phrase))
+    if not tokens:
+      return
+    variants = {tokens}
+    if len(tokens) > 1:
+      # "Le Creuset" should also match "LeCreuset"
+      variants.add(("".join(tokens),))
+    for variant in variants:
+      by_length = self._index.setdefault(variant[0], {})
+      by_length.setdefault(len(variant), {}).setdefault(variant, set()).add(product_index)
+
+  def match(self, text: str) -> Set[int]:
+    """Indices (into `products`) of every product mentioned in `text`."""
+    tokens = tokenize(text)
+    found: Set[int] = set()
+    for i, token in enumerate(tokens):
+      by_length = self._index.get(token)
+      if not by_length:
+        continue
+      for length, phrases in by_length.items():
+        product_indices = phrases.get(tuple(tokens[i:i + length]))
+        if product_indices:
+          found.update(product_indices)
+    return found
+
+  def match_products(self, text: str) -> List[Product]:
+    return [self.products[i] for i in sorted(self.match(text))]
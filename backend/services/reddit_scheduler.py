@@ -0,0 +1,52 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from backend.core.config import Config
+from backend.core.metrics import external_call
+
+logger = logging.getLogger(__name__)
+
+class RedditScheduler:
+  """
+  Bounded-concurrency runner for Reddit API calls. At most `max_concurrency`
+  calls are in flight at once, and new calls wait for the rate-limit window to
+  reset when Reddit reports that few requests remain.
+  """
+  def __init__(self, client, max_concurrency: Optional[int] = None, min_remaining: Optional[float] = None,
+               max_wait: float = 60.0):
+    self.client = client
+    self.max_concurrency = max_concurrency or Config.REDDIT_MAX_CONCURRENCY
+    self.min_remaining = Config.REDDIT_RATELIMIT_MIN_REMAINING if min_remaining is None else min_remaining
+    self.max_wait = max_wait
+    self._semaphore = asyncio.Semaphore(self.max_concurrency)
+    self._warned = False
+
+  def _rate_limit_delay(self) -> float:
+    # asyncprawcore's RateLimiter, updated from the X-Ratelimit headers of every response. It's private API,
+    # so if it stops looking the way we expect we just don't throttle (asyncprawcore still does per request)
+    limiter = getattr(getattr(self.client, "_core", None), "_rate_limiter", None)
+    if limiter is None:
+      return 0.0
+    if not hasattr(limiter, "remaining") or not hasattr(limiter, "next_request_timestamp_ns"):
+      if not self._warned:
+        logger.warning("Reddit rate limiter has no remaining/next_request_timestamp_ns, scheduling without it")
+        self._warned = True
+      return 0.0
+    remaining = limiter.remaining
+    next_request_ns = limiter.next_request_timestamp_ns
+    # both are None until the first response
+    if remaining is None or next_request_ns is None or remaining > self.min_remaining:
+      return 0.0
+    # on the monotonic clock; once the window is used up it's when the window resets
+    return min(max((next_request_ns - time.monotonic_ns()) / 1e9, 0.0), self.max_wait)
+
+  async def run(self, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+    async with self._semaphore:
+      delay = self._rate_limit_delay()
+      if delay:
+        logger.warning(f"Reddit rate limit nearly exhausted, waiting {delay:.1f}s")
+        await asyncio.sleep(delay)
+      async with external_call("reddit", func.__name__):
+        return await func(*args, **kwargs)
@@ -1,60 +1,73 @@
 import logging
-import asyncpraw
 import asyncio
 import hashlib
 import json
-import re
-import redis.asyncio as aioredis
-from backend.models.comment import Comment
+from contextlib import aclosing
+from backend.models.comment_store import CommentRef, CommentStore, CommentView
 from backend.core.config import Config
+from backend.core.metrics import record_cache
 from backend.models.subreddit import Subreddit
 from backend.models.submission import SubmissionBase
 from backend.models.product_search_request import ProductSearchRequest
-from backend.models.product import Product, ProductList
+from backend.models.product import Product
+from backend.services.reddit_scheduler import RedditScheduler
+from backend.services.ner_filter import extract_entities
 from pydantic import ValidationError
 from fastapi import HTTPException
-from openai import OpenAI
-from transformers import pipeline
-from typing import List, Dict
+from typing import TYPE_CHECKING, AsyncIterator, Awaitable, Callable, Tuple
+from backend.services.openai_service import create_openai_client
+from backend.services.extractors import OpenAIExtractor, ProductExtractor
+from backend.services.product_catalogue import ProductCatalogue
+from backend.services.product_matcher import ProductMatcher
+
+if TYPE_CHECKING:
+  from openai import AsyncOpenAI
 
 logger = logging.getLogger(__name__)
-openai = OpenAI(api_key=Config.OPENAI_API_KEY)
+
+SubmissionLister = Callable[[str, str], Awaitable[list[SubmissionBase]]]
+CommentsLoader = Callable[[str, list[SubmissionBase]], AsyncIterator[Tuple[SubmissionBase, CommentStore]]]
 
 class RedditService:
-  def __init__(self, redis_client):
+  def __init__(self, redis_client, client=None, scheduler: RedditScheduler | None = None,
+               openai_client: "AsyncOpenAI | None" = None, extractor: ProductExtractor | None = None,
+               catalogue: ProductCatalogue | None = None):
     # initialize redis
     self.redis = redis_client
-
-    self.client = asyncpraw.Reddit(
+    self.openai_client = openai_client or create_openai_client()
+
+    # the reddit client can be swapped out (e.g. for a fake in tests)
+    self.client = client or self._default_reddit_client()
+    self.scheduler = scheduler or RedditScheduler(self.client)
+    # OpenAI unless a local/hybrid backend is passed in
+    self.extractor = extractor or OpenAIExtractor(self.openai_client)
+    # when set, product variants are resolved to one catalogue entry instead of exact-match deduped
+    self.catalogue = catalogue
+
+  @staticmethod
+  def _default_reddit_client():
+    # only imported when no shared client is passed in (the app and worker always pass one)
+    import asyncpraw
+
+    return asyncpraw.Reddit(
       client_id=Config.REDDIT_CLIENT_ID,
       client_secret=Config.REDDIT_CLIENT_SECRET,
       user_agent=Config.REDDIT_USER_AGENT
       )
      
-  async def filter_comments(self, comments: List[Comment], ner_pipeline) -> List[Comment]:
+  async def filter_comments(self, comments: CommentStore, ner_pipeline) -> CommentView:
     """
     Filters comments based on NER, preserving nested structure.
+    Each stored comment is checked once; ancestors of kept comments are retained.
+    All bodies are sent through the pipeline in batches off the event loop.
+    The result is a view over `comments`, so nothing is copied.
     """
-    filtered_comments = []
-    for comment in comments:
-      # send comment body to pipeline
-      entities = ner_pipeline(comment.body)
-      keep_comment = any(e["entity_group"] in ["ORG", "MISC"] for e in entities)
-
-      filtered_replies = []
-      # Check for 'replies' and dictionary type.  RECURSIVE CALL WITH self.
-      if comment.replies:
-        filtered_replies = await self.filter_comments(comment.replies, ner_pipeline)
-
-      # Keep comment if it passes the filter OR has filtered replies
-      if keep_comment or filtered_replies:
-        if filtered_replies:
-            comment.replies = filtered_replies
-        else:
-            comment.replies = [] # Remove 'replies' if it's empty
-        filtered_comments.append(comment)
-
-    return filtered_comments
+    all_entities = await extract_entities(comments.bodies, ner_pipeline)
+    keep_ids = [
+      comment_id for comment_id, entities in zip(comments.ids, all_entities)
+      if any(e["entity_group"] in ["ORG", "MISC"] for e in entities)
+    ]
+    return comments.prune(keep_ids)
     
   async def subreddit_info(self, subreddit_name: str) -> Subreddit:
     try:
@@ -74,151 +87,168 @@ class RedditService:
       raise HTTPException(status_code=404, detail="Subreddit not found") from e
   
   async def fetch_subreddit_submissions(self, subreddit_name: str, search_term: str, limit=10) -> list[SubmissionBase]:
-    submissions = []
     try:
-      logger.info(f"Searching for term '{search_term}' in subreddit '{subreddit_name}' with limit {limit}")
-      subreddit = await self.client.subreddit(subreddit_name)
-      async for praw_submission in subreddit.search(search_term, limit=limit):
-        submission = SubmissionBase(
-          id=praw_submission.id,
-          title=praw_submission.title,
-          created_utc=praw_submission.created_utc,
-          subreddit_name=praw_submission.name,
-          score=praw_submission.score,
-          upvote_ratio=praw_submission.upvote_ratio,
-          over_18=praw_submission.over_18,
-          num_comments=praw_submission.num_comments
-        ) 
-        submissions.append(submission)
-      logger.info(f"Found {len(submissions)} submissions")
+      return await self.search_submissions(subreddit_name, search_term, limit=limit)
     except Exception as e:
       logger.error(f"Error fetching submissions: {e}")
+      return []
+
+  async def search_submissions(self, subreddit_name: str, search_term: str, limit=10) -> list[SubmissionBase]:
+    """Like fetch_subreddit_submissions, but a failed search raises instead of looking like an empty one."""
+    submissions = []
+    logger.info(f"Searching for term '{search_term}' in subreddit '{subreddit_name}' with limit {limit}")
+    subreddit = await self.client.subreddit(subreddit_name)
+    async for praw_submission in subreddit.search(search_term, limit=limit):
+      submission = SubmissionBase(
+        id=praw_submission.id,
+        title=praw_submission.title,
+        created_utc=praw_submission.created_utc,
+        subreddit_name=praw_submission.name,
+        score=praw_submission.score,
+        upvote_ratio=praw_submission.upvote_ratio,
+        over_18=praw_submission.over_18,
+        num_comments=praw_submission.num_comments
+      ) 
+      submissions.append(submission)
+    logger.info(f"Found {len(submissions)} submissions")
     return submissions
   
-  async def serialize_comment(self, praw_comment) -> Comment:
-    # recursive function to serialize a PRAW comment
-    replies = []
-    if hasattr(praw_comment, "replies") and praw_comment.replies:
-       # Use asyncio.gather to run serializations concurrently.
-          replies = await asyncio.gather(*[
-              self.serialize_comment(reply) for reply in praw_comment.replies if reply is not None
-          ])
-    return Comment(
-      id=praw_comment.id,
-      body=praw_comment.body,
-      score=praw_comment.score,
-      replies=replies
-    )
-  
-  async def submission_comments(self, submission_id: str) -> list[Comment]:
-    comments_list = []
+  async def submission_comments(self, submission_id: str) -> CommentStore:
+    comments = CommentStore()
     try:
       praw_submission = await self.client.submission(id=submission_id)
       await praw_submission.load()
       await praw_submission.comments.replace_more(limit=0)
 
-      for praw_comment in praw_submission.comments.list():
-        comment = await self.serialize_comment(praw_comment)
-        comments_list.append(comment)
+      # list() is already flattened, so build the store in a single pass over it
+      comments = CommentStore.from_praw(praw_submission.comments.list())
     except Exception as e:
       logger.error(f"Error fetching comments: {e}")
-    return comments_list
+    return comments
   
-  async def fetch_top_submission_comments(self, search_request: ProductSearchRequest) -> list[Comment]:
-    subreddits = ["buyitforlife"]
-    all_comments = []
-
-    # Iterate through provided subreddits to grab top n submissions, iterate through each and add to all_comments
-    for subreddit in subreddits:
-      info = await self.subreddit_info(subreddit) # returns a subreddit object
-      logger.info(f"Fetched info for {info.display_name}")
-
-      submissions = await self.fetch_subreddit_submissions(subreddit, search_request.product_category) # returns a list of submission objects (10 in dev)
+  async def iter_submission_comments(self, search_request: ProductSearchRequest, timeout: float | None = None,
+                                     list_submissions: SubmissionLister | None = None,
+                                     load_comments: CommentsLoader | None = None,
+                                     on_progress: Callable[[str], None] | None = None) -> AsyncIterator[CommentStore]:
+    """
+    Yield one CommentStore per submission as soon as it has been fetched.
+    Subreddits and submissions are fetched concurrently through the scheduler; if
+    `timeout` seconds pass first, outstanding fetches are cancelled and iteration
+    simply ends, leaving the caller with partial results.
+    `list_submissions(subreddit, search_term)` and `load_comments(subreddit,
+    submissions)` replace the live listing and comment fetches, e.g. to serve
+    them from the local corpus. `on_progress` receives a short message as each
+    subreddit's submissions are listed.
+    """
+    timeout = Config.SEARCH_FETCH_TIMEOUT if timeout is None else timeout
+    search_term = search_request.product_category
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def fetch_submission(submission: SubmissionBase):
+      await queue.put(await self.scheduler.run(self.submission_comments, submission.id))
+
+    async def fetch_subreddit(subreddit: str):
+      if list_submissions is not None:
+        display_name = subreddit
+        try:
+          submissions = await list_submissions(subreddit, search_term)
+        except Exception as e:
+          logger.error(f"Error fetching submissions: {e}")
+          submissions = []
+      else:
+        info, submissions = await asyncio.gather(
+          self.scheduler.run(self.subreddit_info, subreddit),
+          self.scheduler.run(self.fetch_subreddit_submissions, subreddit, search_term)
+        )
+        display_name = info.display_name
+        logger.info(f"Fetched info for {display_name}")
       logger.info(f"Fetched {len(submissions)} submissions from {subreddit}")
+      if on_progress is not None:
+        on_progress(f"Fetched {len(submissions)} submissions from r/{display_name}")
+      if load_comments is not None:
+        # closed explicitly, so a cancelled search also cancels the loader's fetches
+        async with aclosing(load_comments(subreddit, submissions)) as loaded:
+          async for _, comments in loaded:
+            await queue.put(comments)
+      else:
+        await asyncio.gather(*[fetch_submission(submission) for submission in submissions])
+
+    async def fetch_all():
+      try:
+        await asyncio.gather(*[fetch_subreddit(subreddit) for subreddit in Config.SEARCH_SUBREDDITS])
+      finally:
+        await queue.put(None)
 
-      # iterate through submissions to build comment trees
-      for submission in submissions:
-        comments = await self.submission_comments(submission.id)
-        all_comments.extend(comments)
-    
-    # sort comments by score from high to low
-    sorted_comments = sorted(all_comments, key=lambda c: getattr(c, "score", 0), reverse=True)
-    return sorted_comments
-
-  async def find_products_from_comments(self, comments: list[Comment], query: str) -> list[Product]:
-    #caching
-    cache_key = f"search:{hashlib.sha256(query.encode()).hexdigest()}"
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    producer = asyncio.create_task(fetch_all())
+    try:
+      while True:
+        try:
+          comments = await asyncio.wait_for(queue.get(), max(deadline - loop.time(), 0))
+        except asyncio.TimeoutError:
+          logger.warning(f"Fetch deadline of {timeout}s expired, returning partial results")
+          break
+        if comments is None:
+          break
+        yield comments
+      if producer.done():
+        producer.result()
+    finally:
+      # also reached when the caller cancels us, so nothing keeps running in the background
+      producer.cancel()
+      await asyncio.gather(producer, return_exceptions=True)
+
+  async def refresh_catalogue(self):
+    if self.catalogue is not None:
+      await self.catalogue.refresh()
+
+  def _products_cache_key(self, query: str) -> str:
+    return f"search:{hashlib.sha256(query.encode()).hexdigest()}"
+
+  async def cached_products(self, query: str) -> list[Product] | None:
+    cache_key = self._products_cache_key(query)
     cached_result_raw = await self.redis.get(cache_key)
     if cached_result_raw:
       try:
         cached_result = json.loads(cached_result_raw)
         logger.info(f"Cache hit for query: {query}")
         # Validate cached data
-        return [Product(**product) for product in cached_result]
+        products = [Product(**product) for product in cached_result]
+        record_cache("products", hits=1)
+        return products
       except (json.JSONDecodeError, ValidationError):
         logger.warning(f"Cache data invalid for key: {cache_key}, reprocessing.")
 
-    logger.info(f"Cache miss for query: {query}. Processing via OpenAI.")   
-
-    # setup for batching
-    batch_size = 10
-    all_products = [] # list of (evenutally) ProductWithScore objects
-    for i in range(0, len(comments), batch_size):
-      batch = comments[i:i + batch_size]
-      products_list_batch = await self.batch_openai_call(batch) # a list of ProductWithScore objects
-      all_products.extend(products_list_batch)
-
-    # remove duplicates
+    logger.info(f"Cache miss for query: {query}. Extracting with the {self.extractor.name} extractor.")
+    record_cache("products", misses=1)
+    return None
+
+  async def cache_products(self, query: str, products: list[Product]):
+    if self.catalogue is not None:
+      # persist the entries and aliases this search added
+      await self.catalogue.save()
+    if products:
+      serialized_products = json.dumps([p.model_dump() for p in products])
+      await self.redis.set(self._products_cache_key(query), serialized_products, ex=3600)
+
+  async def extract_products(self, comments: CommentView | list[CommentRef]) -> list[Product]:
+    """Run comments through the configured extraction backend; the result may contain duplicates."""
+    return await self.extractor.extract(comments)
+
+  def product_matcher(self, products: list[Product]) -> ProductMatcher:
+    """Matcher over `products` that also finds their catalogued aliases in comment text."""
+    aliases = self.catalogue.aliases_for(products) if self.catalogue is not None else None
+    return ProductMatcher(products, aliases=aliases)
+
+  def dedupe_products(self, products: list[Product]) -> list[Product]:
+    if self.catalogue is not None:
+      return self.catalogue.canonicalize(products)
     unique_products = []
     seen_products = set()
-    for product_with_score in all_products:
-      product = product_with_score.product
+    for product in products:
       product_tuple = (product.brand_name.lower(), product.product_name.lower())
       if product_tuple not in seen_products:
         seen_products.add(product_tuple)
-        unique_products.append(product) 
-
-    # Cache and return
-    if unique_products:
-      serialized_products = json.dumps([p.model_dump() for p in unique_products])
-      await self.redis.set(cache_key, serialized_products, ex=3600)
-    
-    return unique_products
-
-  async def batch_openai_call(self, comments_chunk: list[str]) -> list:
-    # Convert Comment objects to their body texts
-    comments_string = "\n".join([comment.body for comment in comments_chunk])
-
-    try:
-      completion = openai.beta.chat.completions.parse(
-        model="gpt-4o-mini-2024-07-18",
-        messages=[
-          {"role": "system", "content": "You are a brand and product finding assistant. You will be given a list of comments and should return unique brand/product combinations as a valid JSON object."},
-          {"role": "user", "content": f"""
-      Instructions:
-      - Extract the brand and product name from the comments. Do NOT allow for generic product names like "toaster". If there is no clear product name do not include the product.
-      - Return *only* the extracted brand and product combinations in a valid JSON object in the following format:
-        {{
-          "products": [
-          {{
-            "brand_name": "Brand Name",
-            "product_name": "Product Name"
-          }},
-          {{
-            "brand_name": "Another brand",
-            "product_name": "Another product"
-          }}
-          ]
-        }}
-      - Ensure the output contains *only* valid JSON and nothing else. The brand_name and product_name must be strings.
-
-      Comments: 
-      {comments_string}
-      """}],
-      response_format=ProductList
-      )
-
-      return completion.choices[0].message.parsed.products
-    except Exception as e:
-      logger.error(f"Error processing comments with OpenAI: {e}")
-      return []
\ No newline at end of file
+        unique_products.append(product)
+    return unique_products
\ No newline at end of file
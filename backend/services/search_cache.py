@@ -0,0 +1,162 @@
+import asyncio
+import hashlib
+import json
+import logging
+import re
+from contextlib import contextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, Set
+
+from pydantic import ValidationError
+
+from backend.core.config import Config
+from backend.core.metrics import record_cache
+from backend.models.product import ProductList
+from backend.models.product_search_request import ProductSearchRequest
+from backend.models.search_event import SearchEvent
+from backend.services.chat_cache import SharedStream
+from backend.utils.cache import SingleFlight, TieredCache
+
+logger = logging.getLogger(__name__)
+
+# runs a search, handing each progress event to the callback
+StreamedSearch = Callable[[Callable[[SearchEvent], None]], Awaitable[ProductList]]
+
+def normalize_search_request(search_request: ProductSearchRequest) -> dict:
+  """Canonical form of a request, so equivalent searches share one cache entry."""
+  return {
+    "product_category": re.sub(r"\s+", " ", search_request.product_category).strip().lower(),
+    "min_price": round(search_request.min_price, 2),
+    "max_price": round(search_request.max_price, 2),
+    "sites": sorted({site.strip().lower() for site in search_request.sites}),
+    "retailers": sorted({retailer.strip().lower() for retailer in search_request.retailers})
+  }
+
+def _log_refresh_failure(task: asyncio.Task):
+  if not task.cancelled() and task.exception() is not None:
+    logger.error(f"Background search refresh failed: {task.exception()}")
+
+def search_request_key(search_request: ProductSearchRequest) -> str:
+  normalized = json.dumps(normalize_search_request(search_request), sort_keys=True)
+  return hashlib.sha256(normalized.encode()).hexdigest()
+
+class SearchResultCache:
+  """
+  Caches complete ProductList results of POST /search and /search/stream.
+  Concurrent identical searches run the pipeline once, and it's cancelled once
+  every client waiting on it has gone; stale entries are served immediately
+  while a single background refresh recomputes them.
+  """
+  def __init__(self, redis_client, ttl: float | None = None, stale_ttl: float | None = None, maxsize: int | None = None):
+    self.cache = TieredCache(
+      redis_client,
+      namespace="search_result:v1",
+      maxsize=maxsize or Config.SEARCH_CACHE_LRU_SIZE,
+      ttl=Config.SEARCH_CACHE_TTL if ttl is None else ttl,
+      stale_ttl=Config.SEARCH_CACHE_STALE_TTL if stale_ttl is None else stale_ttl
+    )
+    self.inflight = SingleFlight()
+    # events of running streamed searches, clients waiting on each search, and refreshes nobody waits on
+    self._streams: Dict[str, SharedStream] = {}
+    self._waiters: Dict[str, int] = {}
+    self._background: Set[asyncio.Task] = set()
+    self.refreshes = 0
+
+  async def get(self, search_request: ProductSearchRequest) -> ProductList | None:
+    """Cached result (fresh or stale) without triggering any computation."""
+    cached = await self.cache.get(search_request_key(search_request))
+    if cached is None:
+      return None
+    try:
+      return ProductList.model_validate(cached[0])
+    except ValidationError:
+      return None
+
+  async def set(self, search_request: ProductSearchRequest, result: ProductList):
+    await self.cache.set(search_request_key(search_request), result.model_dump())
+
+  async def _compute_and_store(self, key: str, compute: Callable[[], Awaitable[ProductList]]) -> ProductList:
+    result = await compute()
+    await self.cache.set(key, result.model_dump())
+    return result
+
+  async def _compute_streamed(self, key: str, stream: SharedStream, compute: StreamedSearch) -> ProductList:
+    try:
+      result = await self._compute_and_store(key, lambda: compute(stream.append))
+    except BaseException as e:
+      stream.finish(e)
+      raise
+    finally:
+      self._streams.pop(key, None)
+    stream.finish()
+    return result
+
+  async def _cached(self, key: str, refresh: Callable[[], Awaitable[ProductList]]) -> ProductList | None:
+    """A cached result, fresh or stale; a stale one starts a single background refresh."""
+    cached = await self.cache.get(key)
+    if cached is None:
+      record_cache("search", misses=1)
+      return None
+    value, is_stale = cached
+    try:
+      result = ProductList.model_validate(value)
+    except ValidationError:
+      logger.warning(f"Cached search result invalid for key: {key}, recomputing.")
+      record_cache("search", misses=1)
+      return None
+    record_cache("search", stale=int(is_stale), hits=int(not is_stale))
+    if is_stale and key not in self.inflight:
+      logger.info(f"Serving stale search result for {key}, refreshing in background")
+      self.refreshes += 1
+      task = self.inflight.start(key, refresh)
+      self._background.add(task)
+      task.add_done_callback(self._background.discard)
+      task.add_done_callback(_log_refresh_failure)
+    return result
+
+  @contextmanager
+  def _waiting(self, key: str, task: asyncio.Task):
+    # the last client to give up on a search cancels it, unless it's a background refresh
+    self._waiters[key] = self._waiters.get(key, 0) + 1
+    try:
+      yield
+    finally:
+      self._waiters[key] -= 1
+      if not self._waiters[key]:
+        del self._waiters[key]
+        if not task.done() and task not in self._background:
+          logger.info(f"No clients left for search {key}, cancelling it")
+          task.cancel()
+
+  async def get_or_compute(self, search_request: ProductSearchRequest, compute: Callable[[], Awaitable[ProductList]]) -> ProductList:
+    key = search_request_key(search_request)
+    result = await self._cached(key, lambda: self._compute_and_store(key, compute))
+    if result is not None:
+      return result
+    task = self.inflight.start(key, lambda: self._compute_and_store(key, compute))
+    with self._waiting(key, task):
+      return await asyncio.shield(task)
+
+  async def stream(self, search_request: ProductSearchRequest, compute: StreamedSearch) -> AsyncIterator[SearchEvent]:
+    """
+    Events of a search, ending with a "result" event. `compute(on_event)` runs
+    the search; like get_or_compute, a cached result is answered right away and
+    concurrent identical searches (streamed or not) share one run. A stream that
+    joins a running streamed search replays its events from the start.
+    """
+    key = search_request_key(search_request)
+    result = await self._cached(key, lambda: self._compute_and_store(key, lambda: compute(lambda event: None)))
+    if result is None:
+      # a search started by get_or_compute has no events to replay, only its result
+      stream = self._streams.get(key)
+      if key not in self.inflight:
+        stream = self._streams[key] = SharedStream()
+      task = self.inflight.start(key, lambda: self._compute_streamed(key, stream, compute))
+      with self._waiting(key, task):
+        if stream is not None:
+          async for event in stream:
+            yield event
+        result = await asyncio.shield(task)
+    yield SearchEvent(event="result", data=result)
+
+  def stats(self) -> dict:
+    return {**self.cache.stats(), "refreshes": self.refreshes}
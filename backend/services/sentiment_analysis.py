@@ -1,11 +1,15 @@
 import json
 import re
-from transformers import pipeline
 from backend.models.product import Product
+from backend.services.model_registry import ModelRegistry
 
 class SentimentAnalysis:
-  def __init__(self):
-    self.sentiment_pipeline = pipeline("sentiment-analysis")
+  def __init__(self, model_registry: ModelRegistry):
+    self.model_registry = model_registry
+
+  @property
+  def sentiment_pipeline(self):
+    return self.model_registry.get("sentiment")
 
   def extract_product_names(self, products_list: list[Product]):
     products = []
@@ -0,0 +1,73 @@
+import hashlib
+import logging
+import re
+from typing import Awaitable, Callable, List
+
+from backend.core.config import Config
+from backend.core.metrics import record_cache
+from backend.services.model_registry import BACKEND_PRECISION, DEFAULT_MODEL_SPECS
+from backend.utils.cache import TieredCache
+
+logger = logging.getLogger(__name__)
+
+def normalize_body(body: str) -> str:
+  return re.sub(r"\s+", " ", body).strip()
+
+class SentimentCache:
+  """
+  Content-addressed cache of signed sentiment scores, keyed by model name,
+  backend and precision (MODEL_BACKEND) and a hash of the normalized comment
+  body. The in-process LRU evicts least recently used scores past
+  SENTIMENT_CACHE_SIZE; Redis entries expire after SENTIMENT_CACHE_TTL.
+  """
+  def __init__(self, redis_client, model_name: str | None = None, backend: str | None = None):
+    self.model_name = model_name or DEFAULT_MODEL_SPECS["sentiment"].model
+    self.backend = backend or Config.MODEL_BACKEND
+    # e.g. "distilbert-...:quantized-int8", so switching backends doesn't serve the other one's scores
+    self.model_variant = f"{self.model_name}:{self.backend}-{BACKEND_PRECISION[self.backend]}"
+    self.cache = TieredCache(
+      redis_client,
+      namespace="sentiment:v1",
+      maxsize=Config.SENTIMENT_CACHE_SIZE,
+      ttl=Config.SENTIMENT_CACHE_TTL
+    )
+    self.hits = 0
+    self.misses = 0
+    self.inferences = 0
+
+  def key(self, body: str) -> str:
+    return f"{self.model_variant}:{hashlib.sha256(normalize_body(body).encode()).hexdigest()}"
+
+  async def score(self, bodies: List[str], infer: Callable[[List[str]], Awaitable[List[float]]]) -> List[float]:
+    """
+    Signed scores for `bodies`. Only cache misses are passed to `infer`, in a
+    single batch with duplicates removed.
+    """
+    keys = [self.key(body) for body in bodies]
+    scores = await self.cache.get_many(keys)
+
+    missing = {}
+    for key, body in zip(keys, bodies):
+      if key not in scores:
+        missing.setdefault(key, body)
+    self.hits += len(bodies) - sum(1 for key in keys if key in missing)
+    self.misses += len(missing)
+
+    if missing:
+      self.inferences += 1
+      inferred = dict(zip(missing, await infer(list(missing.values()))))
+      await self.cache.set_many(inferred)
+      scores.update(inferred)
+    logger.info(f"Sentiment cache: {len(bodies) - len(missing)} hits, {len(missing)} misses")
+    record_cache("sentiment", hits=len(bodies) - len(missing), misses=len(missing))
+    return [scores[key] for key in keys]
+
+  def stats(self) -> dict:
+    lookups = self.hits + self.misses
+    return {
+      "hits": self.hits,
+      "misses": self.misses,
+      "hit_rate": self.hits / lookups if lookups else 0.0,
+      "inference_batches": self.inferences,
+      "local": self.cache.stats()
+    }
@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, FrozenSet, Iterable, Set, Tuple
+
+from backend.core.config import Config
+from backend.core.metrics import record_cache
+from backend.services.openai_service import SubjectPhrasesRequest
+from backend.services.product_matcher import normalize_phrase
+from backend.utils.cache import SingleFlight, TieredCache
+
+logger = logging.getLogger(__name__)
+
+# leading words that don't change what a category is ("best rice cookers" ~ "rice cooker"); "top" isn't one
+# of them, it's part of too many names ("top load washer")
+LEADING_FILLERS = {"best", "good"}
+
+def normalize_category(category: str) -> str:
+  tokens = normalize_phrase(category).split()
+  while len(tokens) > 1 and tokens[0] in LEADING_FILLERS:
+    tokens = tokens[1:]
+  return " ".join(tokens)
+
+def _decode(value) -> str:
+  return value.decode() if isinstance(value, bytes) else value
+
+class SubjectPhraseCache:
+  """
+  Subject phrases cached per normalized category, in an in-process LRU in front
+  of Redis, so near duplicates ("rice cookers", "Rice Cooker",
+  "best rice cooker") share one entry. A category that isn't known yet also
+  shares the entry of a known one with exactly the same words in another order
+  ("cooker rice"); categories that differ by a word never do. Known categories
+  live in a Redis set, reloaded at most every SUBJECT_PHRASES_REFRESH seconds.
+  """
+  def __init__(self, redis_client, namespace: str = "subject_phrases:v3"):
+    self.redis = redis_client
+    self.cache = TieredCache(
+      redis_client,
+      namespace=namespace,
+      maxsize=Config.SUBJECT_PHRASES_CACHE_SIZE,
+      ttl=Config.SUBJECT_PHRASES_TTL
+    )
+    self.categories_key = f"{namespace}:categories"
+    self.categories: Set[str] = set()
+    # word set -> the known category with those words
+    self._by_tokens: Dict[FrozenSet[str], str] = {}
+    self._loaded_at = 0.0
+    self._inflight = SingleFlight()
+    self.hits = 0
+    self.near_hits = 0
+    self.misses = 0
+
+  async def refresh(self, force: bool = False):
+    if not force and time.monotonic() - self._loaded_at < Config.SUBJECT_PHRASES_REFRESH:
+      return
+    try:
+      categories = await self.redis.smembers(self.categories_key)
+    except Exception as e:
+      logger.warning(f"Could not load subject phrase categories from Redis: {e}")
+      return
+    for category in categories:
+      self._add_category(_decode(category))
+    self._loaded_at = time.monotonic()
+
+  def _add_category(self, key: str):
+    if key in self.categories:
+      return
+    self.categories.add(key)
+    self._by_tokens.setdefault(frozenset(key.split()), key)
+
+  def resolve(self, category: str) -> Tuple[str, bool]:
+    """The cache key for `category` and whether it came from a near-duplicate match."""
+    key = normalize_category(category)
+    if key in self.categories:
+      return key, False
+    match = self._by_tokens.get(frozenset(key.split()))
+    if match is not None:
+      return match, True
+    return key, False
+
+  async def get(self, category: str) -> SubjectPhrasesRequest | None:
+    await self.refresh()
+    key, near = self.resolve(category)
+    entry = await self.cache.get(key)
+    if entry is None:
+      self.misses += 1
+      record_cache("subject_phrases", misses=1)
+      return None
+    self.hits += 1
+    self.near_hits += near
+    record_cache("subject_phrases", hits=1)
+    if near:
+      logger.info(f"Subject phrases for '{category}' served from near-duplicate category '{key}'")
+    return SubjectPhrasesRequest.model_validate(entry[0])
+
+  async def set(self, category: str, phrases: SubjectPhrasesRequest):
+    key, _ = self.resolve(category)
+    await self.cache.set(key, phrases.model_dump())
+    if key not in self.categories:
+      self._add_category(key)
+      try:
+        await self.redis.sadd(self.categories_key, key)
+      except Exception as e:
+        logger.warning(f"Could not record subject phrase category in Redis: {e}")
+
+  async def get_or_fetch(self, category: str,
+                         fetch: Callable[[str], Awaitable[SubjectPhrasesRequest]]) -> SubjectPhrasesRequest:
+    """Cached phrases for `category`, otherwise `fetch(category)`; concurrent misses for one key share a fetch."""
+    phrases = await self.get(category)
+    if phrases is not None:
+      return phrases
+
+    async def fetch_and_store():
+      phrases = await fetch(category)
+      await self.set(category, phrases)
+      return phrases
+
+    key, _ = self.resolve(category)
+    return await self._inflight.do(key, fetch_and_store)
+
+  async def prefill(self, categories: Iterable[str], fetch: Callable[[str], Awaitable[SubjectPhrasesRequest]],
+                    concurrency: int = 4) -> Dict[str, int]:
+    """Fetch phrases for every category that isn't cached yet (near duplicates count as cached)."""
+    semaphore = asyncio.Semaphore(concurrency)
+    counts = {"cached": 0, "fetched": 0, "failed": 0}
+
+    async def fill(category: str):
+      async with semaphore:
+        if await self.cache.get(self.resolve(category)[0]) is not None:
+          counts["cached"] += 1
+          return
+        try:
+          await self.set(category, await fetch(category))
+          counts["fetched"] += 1
+        except Exception as e:
+          logger.warning(f"Could not prefill subject phrases for '{category}': {e}")
+          counts["failed"] += 1
+
+    await self.refresh(force=True)
+    # categories that normalize to the same key are fetched once
+    unique = {}
+    for category in categories:
+      if category.strip():
+        unique.setdefault(normalize_category(category), category.strip())
+    await asyncio.gather(*[fill(category) for category in unique.values()])
+    return counts
+
+  def stats(self) -> dict:
+    lookups = self.hits + self.misses
+    return {
+      "hits": self.hits,
+      "near_hits": self.near_hits,
+      "misses": self.misses,
+      "hit_rate": self.hits / lookups if lookups else 0.0,
+      "categories": len(self.categories),
+      "local": self.cache.stats()
+    }
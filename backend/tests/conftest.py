@@ -0,0 +1,280 @@
+import asyncio
+import json
+import os
+from collections import Counter
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+
+import fakeredis.aioredis
+import httpx
+import pytest
+from fastapi import FastAPI
+
+# required settings are only read when used, but some code paths read them at construction
+for name in ("OPENAI_API_KEY", "REDDIT_CLIENT_ID", "REDDIT_CLIENT_SECRET", "REDDIT_USER_AGENT"):
+  os.environ.setdefault(name, "test")
+
+from backend.api.endpoints.search import SearchController, router as search_router
+from backend.core.config import Config
+from backend.dependencies import (
+  get_corpus, get_model_registry, get_openai_service, get_reddit_service, get_search_cache, get_sentiment_cache
+)
+from backend.models.product import Product, ProductList
+from backend.models.product_search_request import ProductSearchRequest
+from backend.services.model_registry import ModelRegistry
+from backend.services.ner_filter import ner_cache
+from backend.services.openai_service import OpenAIService, SubjectPhrasesRequest
+from backend.services.reddit_service import RedditService
+from backend.services.search_cache import SearchResultCache
+from backend.services.sentiment_cache import SentimentCache
+
+@pytest.fixture
+def anyio_backend():
+  return "asyncio"
+
+@pytest.fixture(autouse=True)
+def clear_ner_cache():
+  # the NER cache is module-level, so counts in one test would depend on the ones before it
+  ner_cache.clear()
+  yield
+  ner_cache.clear()
+
+@pytest.fixture
+def redis():
+  return fakeredis.aioredis.FakeRedis()
+
+def make_search(category: str = "cast iron pan", **kwargs) -> ProductSearchRequest:
+  fields = {"product_category": category, "min_price": 0, "max_price": 100, "sites": [], "retailers": [], **kwargs}
+  return ProductSearchRequest(**fields)
+
+@pytest.fixture
+def search():
+  return make_search
+
+class FakeSubreddit:
+  def __init__(self, reddit: "FakeReddit", name: str):
+    self.reddit = reddit
+    self.id = name
+    self.display_name = name
+    self.created_utc = 1
+    self.subscribers = 1
+    self.over18 = False
+
+  async def load(self):
+    pass
+
+  async def search(self, term: str, limit=None):
+    self.reddit.searches.append((self.display_name, term))
+    if (self.display_name, term) in self.reddit.failing:
+      raise RuntimeError(f"r/{self.display_name} is down")
+    for submission_id in self.reddit.listing(self.display_name, term):
+      await asyncio.sleep(0)
+      yield SimpleNamespace(
+        id=submission_id, title="t", created_utc=1, name="n", score=1, upvote_ratio=1.0, over_18=False,
+        num_comments=self.reddit.num_comments.get(submission_id, 2)
+      )
+
+class FakeSubmission:
+  def __init__(self, submission_id: str):
+    self.id = submission_id
+    self.comments = SimpleNamespace(replace_more=self.replace_more, list=lambda: [
+      SimpleNamespace(id=f"{submission_id}a", body=f"My Lodge skillet from {submission_id} is great", score=3, parent_id=f"t3_{submission_id}"),
+      SimpleNamespace(id=f"{submission_id}b", body="agreed", score=1, parent_id=f"t1_{submission_id}a")
+    ])
+
+  async def load(self):
+    pass
+
+  async def replace_more(self, limit):
+    pass
+
+class FakeReddit:
+  """
+  Stands in for asyncpraw.Reddit in the search pipeline. `listings` maps a
+  search term to the submission ids it finds (p0-p2 for any term when unset);
+  searches for the (subreddit, term) pairs in `failing` raise. Listings report
+  the comment counts in `num_comments` (2 by default). Every search and comment
+  load is counted.
+  """
+  def __init__(self, listings: Optional[Dict[str, List[str]]] = None, failing=()):
+    self.listings = listings
+    self.failing = set(failing)
+    self.num_comments: Dict[str, int] = {}
+    self.searches = []
+    self.submission_loads = Counter()
+
+  def listing(self, subreddit: str, term: str) -> List[str]:
+    if self.listings is None:
+      return ["p0", "p1", "p2"]
+    return self.listings.get(term, [])
+
+  async def subreddit(self, display_name: str, **kwargs):
+    return FakeSubreddit(self, display_name)
+
+  async def submission(self, id: str, **kwargs):
+    self.submission_loads[id] += 1
+    return FakeSubmission(id)
+
+class GatedReddit(FakeReddit):
+  """Comments of `gated` only load once `gate` is set."""
+  def __init__(self, gated: str, **kwargs):
+    super().__init__(**kwargs)
+    self.gated = gated
+    self.gate = asyncio.Event()
+
+  async def submission(self, id: str, **kwargs):
+    if id == self.gated:
+      await self.gate.wait()
+    return await super().submission(id, **kwargs)
+
+@pytest.fixture
+def reddit():
+  return FakeReddit()
+
+class FakeParse:
+  """
+  `client.beta.chat.completions.parse`: every extraction finds a Lodge Skillet,
+  subject phrases include the query. Queries containing one of `failing` raise.
+  """
+  def __init__(self, failing=()):
+    self.failing = set(failing)
+    self.calls = Counter()
+
+  async def __call__(self, model, messages, response_format, **kwargs):
+    if response_format is ProductList:
+      self.calls["extract"] += 1
+      parsed = SimpleNamespace(products=[SimpleNamespace(product=Product(brand_name="Lodge", product_name="Skillet"), score=1)])
+    else:
+      query = messages[-1]["content"]
+      self.calls["subject_phrases"] += 1
+      if any(failing in query for failing in self.failing):
+        raise RuntimeError(f"no subject phrases for {query}")
+      parsed = SubjectPhrasesRequest(included_words=[query], excluded_words=[])
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(parsed=parsed))])
+
+@pytest.fixture
+def fake_parse():
+  return FakeParse()
+
+@pytest.fixture
+def openai_client(fake_parse):
+  return SimpleNamespace(beta=SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(parse=fake_parse))))
+
+class FakeOpenAI:
+  """
+  POST /chat/completions through an httpx transport: a JSON completion, or
+  server-sent events one token per `token_delay` when `stream` is set. The
+  first requests are answered with the status codes in `failures`; `content`
+  builds the completion text from the request body.
+  """
+  def __init__(self, tokens: int = 10, token_delay: float = 0.01, failures=(),
+               content: Optional[Callable[[dict], str]] = None):
+    self.tokens = tokens
+    self.token_delay = token_delay
+    self.failures = list(failures)
+    self.content = content
+    self.requests = 0
+    self.active = 0
+    self.peak = 0
+
+  def completion_tokens(self, message: str) -> list:
+    return [f"{message}-{i} " for i in range(self.tokens)]
+
+  async def events(self, body: dict):
+    for i, token in enumerate(self.completion_tokens(body["messages"][-1]["content"])):
+      if i:
+        await asyncio.sleep(self.token_delay)
+      event = {
+        "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": 0, "model": body["model"],
+        "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]
+      }
+      yield b"data: " + json.dumps(event).encode() + b"\n\n"
+    yield b"data: [DONE]\n\n"
+
+  async def handle(self, request: httpx.Request) -> httpx.Response:
+    self.requests += 1
+    if self.failures:
+      status = self.failures.pop(0)
+      return httpx.Response(status, headers={"retry-after-ms": "1"}, json={"error": {"message": f"status {status}", "type": "fake"}})
+    body = json.loads(request.content)
+    if body.get("stream"):
+      return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=self.events(body))
+    self.active += 1
+    self.peak = max(self.peak, self.active)
+    try:
+      await asyncio.sleep(self.token_delay * self.tokens)
+    finally:
+      self.active -= 1
+    content = self.content(body) if self.content else "".join(self.completion_tokens(body["messages"][-1]["content"]))
+    return httpx.Response(200, json={
+      "id": "chatcmpl-fake", "object": "chat.completion", "created": 0, "model": body["model"],
+      "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}]
+    })
+
+class FakeModels:
+  """
+  Loader for ModelRegistry: NER tags "Lodge" as an ORG and "Dutch Oven" as
+  MISC, and every comment is positive. Counts loads per task and bodies per model.
+  """
+  def __init__(self):
+    self.loads = []
+    self.calls = Counter()
+
+  def __call__(self, task: str, **kwargs):
+    self.loads.append(task)
+    return self.ner if task == "ner" else self.sentiment
+
+  def ner(self, bodies, **kwargs):
+    self.calls["ner"] += len(bodies)
+    return [
+      [{"entity_group": group, "word": word, "score": 0.9} for group, word in [("ORG", "Lodge"), ("MISC", "Dutch Oven")] if word in body]
+      for body in bodies
+    ]
+
+  def sentiment(self, bodies, **kwargs):
+    self.calls["sentiment"] += len(bodies)
+    return [{"label": "POSITIVE", "score": 0.9} for _ in bodies]
+
+@pytest.fixture
+def fake_models():
+  return FakeModels()
+
+@pytest.fixture
+def model_registry(fake_models):
+  return ModelRegistry(device=-1, loader=fake_models)
+
+@pytest.fixture
+def controller(monkeypatch, redis, reddit, openai_client, model_registry):
+  """SearchController over the fakes, with NER run on threads in this process."""
+  monkeypatch.setattr(Config, "NER_EXECUTOR", "thread")
+  return SearchController(
+    RedditService(redis, client=reddit, openai_client=openai_client),
+    OpenAIService(openai_client),
+    model_registry,
+    sentiment_cache=SentimentCache(redis)
+  )
+
+@pytest.fixture
+def search_cache(redis):
+  return SearchResultCache(redis, ttl=60)
+
+def provide(value):
+  # no parameters, or FastAPI would read them as query parameters
+  return lambda: value
+
+@pytest.fixture
+def search_app(controller, search_cache):
+  """The /search routes, served by `controller`'s services."""
+  app = FastAPI()
+  app.include_router(search_router)
+  provided = {
+    get_reddit_service: controller.reddit_service,
+    get_openai_service: controller.openai_service,
+    get_model_registry: controller.model_registry,
+    get_search_cache: search_cache,
+    get_corpus: controller.corpus,
+    get_sentiment_cache: controller.sentiment_cache
+  }
+  for dependency, value in provided.items():
+    app.dependency_overrides[dependency] = provide(value)
+  return app
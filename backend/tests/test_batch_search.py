@@ -0,0 +1,52 @@
+import httpx
+import pytest
+
+from backend.core.config import Config
+from backend.tests.conftest import FakeParse, FakeReddit
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture(autouse=True)
+def subreddits(monkeypatch):
+  monkeypatch.setattr(Config, "SEARCH_SUBREDDITS", ["buyitforlife", "cooking"])
+
+@pytest.fixture
+def reddit():
+  return FakeReddit(
+    listings={"cast iron pan": ["p0", "p1", "s0"], "dutch oven": ["p1", "s0", "d0"], "wok": ["w0"], "skillet": ["s0"]},
+    # one of the two dutch oven searches fails, and both wok searches do
+    failing=[("cooking", "dutch oven"), ("buyitforlife", "wok"), ("cooking", "wok")]
+  )
+
+@pytest.fixture
+def fake_parse():
+  return FakeParse(failing=["skillet"])
+
+async def batch(app, requests) -> list:
+  async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+    response = await client.post("/search/batch", json={"requests": [request.model_dump() for request in requests]})
+    assert response.status_code == 200
+    return response.json()["results"]
+
+async def test_shared_submissions_are_fetched_once(search_app, reddit, search):
+  results = await batch(search_app, [search("cast iron pan"), search("dutch oven")])
+  assert [result["error"] for result in results] == [None, None]
+  assert reddit.submission_loads == {"p0": 1, "p1": 1, "s0": 1, "d0": 1}
+  assert all(result["result"]["products"] for result in results)
+
+async def test_a_failing_category_doesnt_fail_the_others(search_app, reddit, search):
+  results = await batch(search_app, [search("cast iron pan"), search("wok"), search("skillet"), search("dutch oven")])
+  cast_iron, wok, skillet, dutch_oven = results
+  assert cast_iron["result"]["products"] and cast_iron["error"] is None
+  # every listing failed
+  assert wok["result"] is None and "r/buyitforlife" in wok["error"] and "r/cooking" in wok["error"]
+  assert skillet["result"] is None and "subject phrases" in skillet["error"]
+  # only r/cooking failed, so r/buyitforlife's submissions still count
+  assert dutch_oven["result"]["products"] and dutch_oven["error"] is None
+
+async def test_equivalent_requests_share_an_item(search_app, reddit, search):
+  results = await batch(search_app, [search("cast iron pan"), search(" Cast  Iron Pan "), search("cast iron pan", max_price=50)])
+  assert results[0] == results[1]
+  assert results[0]["result"] == results[2]["result"]
+  # all three are one category, searched once per subreddit
+  assert sorted(reddit.searches) == [("buyitforlife", "cast iron pan"), ("cooking", "cast iron pan")]
@@ -0,0 +1,66 @@
+import asyncio
+
+import httpx
+import pytest
+
+from backend.services.chat_cache import ChatResponseCache, SharedStream
+from backend.services.openai_service import OpenAIService, create_openai_client
+from backend.tests.conftest import FakeOpenAI
+
+pytestmark = pytest.mark.anyio
+
+MODEL = "gpt-fake"
+
+def service(fake: FakeOpenAI, ttl: float = 3600) -> OpenAIService:
+  client = create_openai_client(transport=httpx.MockTransport(fake.handle))
+  return OpenAIService(client, chat_cache=ChatResponseCache(None, ttl=ttl))
+
+async def collect(chunks) -> list:
+  return [chunk async for chunk in chunks]
+
+async def test_concurrent_identical_prompts_make_one_call():
+  fake = FakeOpenAI()
+  openai = service(fake)
+  texts = await asyncio.gather(*[openai.chat("pan", MODEL) for _ in range(10)])
+  assert fake.requests == 1
+  assert set(texts) == {"".join(fake.completion_tokens("pan"))}
+  assert openai.chat_cache.coalesced == 9
+
+  # cached from now on
+  assert await openai.chat("pan", MODEL) == texts[0]
+  assert fake.requests == 1
+
+async def test_streamed_prompt_fans_out_to_every_subscriber():
+  fake = FakeOpenAI()
+  openai = service(fake, ttl=0)
+  expected = fake.completion_tokens("skillet")
+
+  first = asyncio.create_task(collect(openai.chat_stream("skillet", MODEL)))
+  # the rest join halfway through and still get the stream from the start
+  await asyncio.sleep(fake.token_delay * fake.tokens / 2)
+  late = [asyncio.create_task(collect(openai.chat_stream("skillet", MODEL))) for _ in range(5)]
+  # a blocking request for the same prompt reads the running stream too
+  blocking = await openai.chat("skillet", MODEL)
+
+  streams = await asyncio.gather(first, *late)
+  assert fake.requests == 1
+  assert all(chunks == expected for chunks in streams)
+  assert blocking == "".join(expected)
+  assert openai.chat_cache.upstream_calls == 1
+  assert openai.chat_cache.coalesced == 6
+
+async def test_completed_stream_is_cached_as_one_chunk():
+  fake = FakeOpenAI()
+  openai = service(fake)
+  streamed = await collect(openai.chat_stream("lodge", MODEL))
+  assert await collect(openai.chat_stream("lodge", MODEL)) == ["".join(streamed)]
+  assert fake.requests == 1
+
+async def test_stream_error_reaches_every_reader():
+  stream = SharedStream()
+  readers = [asyncio.create_task(collect(stream)) for _ in range(3)]
+  stream.append("partial ")
+  await asyncio.sleep(0)
+  stream.finish(RuntimeError("upstream closed"))
+  outcomes = await asyncio.gather(*readers, return_exceptions=True)
+  assert all(isinstance(outcome, RuntimeError) for outcome in outcomes)
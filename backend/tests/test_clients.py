@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+
+import pytest
+
+from backend.core.clients import (
+  LazyClient, close_redis_client, create_reddit_client, create_redis_client, reddit_pool_stats, redis_pool_stats
+)
+from backend.core.config import Config
+from backend.dependencies import get_reddit_service
+
+pytestmark = pytest.mark.anyio
+
+class Closable:
+  def __init__(self):
+    self.closed = False
+
+  async def close(self):
+    self.closed = True
+
+async def test_lazy_client_is_built_once_on_first_use():
+  built = []
+
+  def factory():
+    built.append(Closable())
+    return built[-1]
+
+  client = LazyClient(factory)
+  await client.close()
+  assert built == [] and not client.built
+
+  # attribute access builds the client, once
+  assert client.closed is False
+  assert client.get() is built[0]
+  assert len(built) == 1
+  await client.close()
+  assert built[0].closed
+
+async def test_redis_pool_is_bounded_and_health_checked(monkeypatch):
+  monkeypatch.setattr(Config, "REDIS_MAX_CONNECTIONS", 7)
+  monkeypatch.setattr(Config, "REDIS_HEALTH_CHECK_INTERVAL", 5)
+  redis_client = create_redis_client()
+  try:
+    assert redis_client.connection_pool.connection_kwargs["health_check_interval"] == 5
+    assert redis_pool_stats(redis_client) == {"max_connections": 7, "open": 0, "available": 0, "in_use": 0}
+  finally:
+    await close_redis_client(redis_client)
+
+async def test_reddit_client_shares_one_bounded_session(monkeypatch):
+  monkeypatch.setattr(Config, "REDDIT_MAX_CONNECTIONS", 3)
+  lazy = LazyClient(create_reddit_client)
+  assert reddit_pool_stats(lazy) == {}
+  try:
+    assert reddit_pool_stats(lazy.get()) == {"max_connections": 3, "in_use": 0}
+  finally:
+    await lazy.close()
+
+async def test_reddit_service_reuses_the_app_scoped_clients():
+  state = SimpleNamespace(
+    redis=object(), reddit=object(), reddit_scheduler=object(), openai=object(), extractor=object(), catalogue=None
+  )
+  request = SimpleNamespace(app=SimpleNamespace(state=state))
+  first, second = await get_reddit_service(request), await get_reddit_service(request)
+  assert first is not second
+  for service in (first, second):
+    assert service.redis is state.redis
+    assert service.client is state.reddit
+    assert service.scheduler is state.reddit_scheduler
+    assert service.openai_client is state.openai
@@ -0,0 +1,13 @@
+from backend.benchmarks.cold_start import FORBIDDEN_MODULES, run_once, write_fixture
+
+def test_cheap_routes_dont_import_the_ml_stack(tmp_path, monkeypatch):
+  # the default device, which used to probe CUDA (and so import torch) at startup
+  monkeypatch.setenv("MODEL_DEVICE", "0")
+  monkeypatch.delenv("INFERENCE_SOCKET", raising=False)
+  fixture = tmp_path / "cold_start.json"
+  write_fixture(str(fixture))
+
+  # a fresh interpreter serves / and /subreddits/{name}, so nothing imported by other tests counts
+  report = run_once(str(fixture))
+  assert set(report["first_response"]) == {"/", "/subreddits/buyitforlife"}
+  assert {module: report["loaded"][module] for module in FORBIDDEN_MODULES} == {"transformers": False, "torch": False}
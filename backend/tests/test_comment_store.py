@@ -0,0 +1,80 @@
+from backend.models.comment import Comment
+from backend.models.comment_store import CommentStore
+
+def thread() -> CommentStore:
+  """
+  a
+  |- b
+  |  `- d
+  `- c
+  e (a reply to a comment that isn't stored)
+  """
+  store = CommentStore()
+  # d arrives before its parent, as it can from the flattened PRAW list
+  store.append("d", "the d reply", 4, "b")
+  store.append("a", "top comment", 1)
+  store.append("b", "reply to a", 7, "a")
+  store.append("c", "another reply", 2, "a")
+  store.append("e", "orphan", 5, "gone")
+  return store
+
+def test_each_comment_is_one_row():
+  store = thread()
+  assert not store.append("a", "a duplicate", 99)
+  assert len(store) == 5
+  assert store.get("a").body == "top comment"
+  assert store.parent_id("d") == "b"
+  assert store.parent_id("e") is None
+  assert store.roots() == ["a", "e"]
+
+def test_views_select_rows_without_copying_columns():
+  store = thread()
+  view = store.sorted_by_score()
+  assert view.ids() == ["b", "e", "d", "c", "a"]
+  assert view.scores() == [7, 5, 4, 2, 1]
+  assert view.store is store
+  top = view[:2]
+  assert top.ids() == ["b", "e"] and top.store is store
+  ref = view[0]
+  assert (ref.id, ref.body, ref.score) == ("b", "reply to a", 7)
+  assert ref.to_model() == Comment(id="b", body="reply to a", score=7)
+  assert [comment.id for comment in view] == view.ids()
+
+def test_children_are_indexed_in_insertion_order():
+  store = thread()
+  offsets, rows = store.children()
+  a = store.index["a"]
+  assert [store.ids[row] for row in rows[offsets[a]:offsets[a + 1]]] == ["b", "c"]
+  # appending invalidates the index
+  store.append("f", "late reply", 1, "a")
+  offsets, rows = store.children()
+  assert [store.ids[row] for row in rows[offsets[a]:offsets[a + 1]]] == ["b", "c", "f"]
+
+def test_subtree_lists_parents_before_children():
+  store = thread()
+  assert store.subtree("a").ids() == ["a", "b", "c", "d"]
+  assert store.subtree("b").ids() == ["b", "d"]
+
+def test_prune_keeps_the_ancestors_of_kept_comments():
+  store = thread()
+  pruned = store.prune(["d", "missing"])
+  assert pruned.ids() == ["d", "a", "b"]
+  tree = pruned.tree()
+  assert [comment.id for comment in tree] == ["a"]
+  assert [reply.id for reply in tree[0].replies] == ["b"]
+  assert [reply.id for reply in tree[0].replies[0].replies] == ["d"]
+
+def test_tree_nests_every_comment_once():
+  tree = thread().tree()
+  assert [comment.id for comment in tree] == ["a", "e"]
+  assert [reply.id for reply in tree[0].replies] == ["b", "c"]
+  assert tree[0].replies[0].replies[0].body == "the d reply"
+
+def test_merge_skips_comments_already_stored():
+  store = thread()
+  other = CommentStore()
+  other.append("b", "reply to a", 7, "a")
+  other.append("g", "new", 3, "b")
+  store.merge(other)
+  assert store.ids == ["d", "a", "b", "c", "e", "g"]
+  assert store.subtree("b").ids() == ["b", "d", "g"]
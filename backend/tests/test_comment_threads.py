@@ -0,0 +1,37 @@
+import pytest
+
+from backend.benchmarks.comment_tree import deep_thread, wide_thread
+from backend.models.comment_store import CommentStore
+from backend.services.reddit_service import RedditService
+from backend.tests.conftest import FakeReddit
+
+pytestmark = pytest.mark.anyio
+
+def count_comments(comments) -> int:
+  return sum(1 + count_comments(comment.replies) for comment in comments)
+
+@pytest.mark.parametrize("thread", [deep_thread, wide_thread])
+def test_each_comment_is_stored_and_built_once(thread):
+  praw_comments = thread(200)
+  store = CommentStore.from_praw(praw_comments)
+  assert store.ids == [comment.id for comment in praw_comments]
+  tree = store.tree()
+  # both threads hang off a single top-level comment
+  assert len(tree) == 1
+  assert count_comments(tree) == 200
+
+def test_deep_thread_keeps_its_nesting():
+  tree = CommentStore.from_praw(deep_thread(50)).tree()
+  depth, node = 1, tree[0]
+  while node.replies:
+    assert len(node.replies) == 1
+    depth, node = depth + 1, node.replies[0]
+  assert depth == 50
+
+async def test_submission_comments_reads_the_flattened_list_once(redis, openai_client):
+  reddit = FakeReddit()
+  service = RedditService(redis, client=reddit, openai_client=openai_client)
+  comments = await service.submission_comments("p0")
+  assert comments.ids == ["p0a", "p0b"]
+  assert comments.parent_id("p0b") == "p0a"
+  assert reddit.submission_loads == {"p0": 1}
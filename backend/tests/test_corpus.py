@@ -0,0 +1,93 @@
+import time
+
+import pytest
+from sqlalchemy import event, update
+
+from backend.core.config import Config
+from backend.core.database import create_engine, create_session_factory, create_tables
+from backend.models.submission_db import SearchListingDB
+from backend.services.corpus_service import CorpusService
+from backend.services.reddit_service import RedditService
+from backend.tests.conftest import FakeReddit
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+async def engine(tmp_path):
+  # SQLite stands in for Postgres; the upserts and queries are the same
+  engine = create_engine(f"sqlite+aiosqlite:///{tmp_path}/corpus.db")
+  await create_tables(engine)
+  yield engine
+  await engine.dispose()
+
+@pytest.fixture
+def statements(engine):
+  executed = []
+
+  @event.listens_for(engine.sync_engine, "before_cursor_execute")
+  def record(conn, cursor, statement, parameters, context, executemany):
+    executed.append(statement)
+  return executed
+
+@pytest.fixture
+def corpus(engine):
+  return CorpusService(create_session_factory(engine))
+
+@pytest.fixture
+def reddit():
+  return FakeReddit(listings={"cast iron pan": ["p0", "p1", "p2"], "dutch oven": [f"d{i}" for i in range(9)]})
+
+@pytest.fixture
+def corpus_controller(controller, corpus):
+  controller.corpus = corpus
+  return controller
+
+async def expire_listings(corpus: CorpusService):
+  async with corpus.session_factory() as session, session.begin():
+    await session.execute(update(SearchListingDB).values(searched_utc=int(time.time() - Config.CORPUS_LISTING_TTL - 1)))
+
+async def test_fresh_listing_and_comments_are_served_from_the_corpus(corpus_controller, reddit, search):
+  first = await corpus_controller.execute_search(search())
+  assert len(reddit.searches) == 1
+  assert reddit.submission_loads == {"p0": 1, "p1": 1, "p2": 1}
+
+  # another search for the same category skips the products cache, but not the corpus
+  await corpus_controller.reddit_service.redis.flushall()
+  second = await corpus_controller.execute_search(search())
+  assert len(reddit.searches) == 1
+  assert reddit.submission_loads == {"p0": 1, "p1": 1, "p2": 1}
+  assert second == first
+
+async def test_stale_listing_only_refetches_submissions_with_new_comments(corpus_controller, corpus, reddit, search):
+  await corpus_controller.execute_search(search())
+  await expire_listings(corpus)
+  reddit.num_comments["p1"] = 3
+
+  await corpus_controller.execute_search(search())
+  assert len(reddit.searches) == 2
+  assert reddit.submission_loads == {"p0": 1, "p1": 2, "p2": 1}
+
+async def test_queries_dont_grow_with_the_number_of_submissions(corpus, reddit, redis, openai_client, statements):
+  service = RedditService(redis, client=reddit, openai_client=openai_client)
+
+  async def sync(term: str) -> int:
+    statements.clear()
+    submissions = await corpus.list_submissions(service, "buyitforlife", term)
+    stores = [comments async for _, comments in corpus.sync_submissions(service, "buyitforlife", submissions)]
+    assert len(stores) == len(submissions)
+    return len(statements)
+
+  # 3 and 9 submissions, fetched from Reddit and then served from the corpus
+  assert await sync("cast iron pan") == await sync("dutch oven")
+  assert await sync("cast iron pan") == await sync("dutch oven")
+  assert reddit.submission_loads == {submission_id: 1 for submission_id in ["p0", "p1", "p2"] + [f"d{i}" for i in range(9)]}
+
+async def test_failed_comment_fetch_is_not_marked_synced(corpus, reddit, redis, openai_client):
+  service = RedditService(redis, client=reddit, openai_client=openai_client)
+  submissions = await corpus.list_submissions(service, "buyitforlife", "cast iron pan")
+
+  async def broken(id: str, **kwargs):
+    raise RuntimeError("reddit is down")
+  reddit.submission = broken
+  assert [len(comments) async for _, comments in corpus.sync_submissions(service, "buyitforlife", submissions)] == [0, 0, 0]
+  assert await corpus.stale_submissions(submissions) == {"p0", "p1", "p2"}
@@ -0,0 +1,62 @@
+import json
+
+import httpx
+import pytest
+
+import backend.utils.retry
+from backend.core.config import Config
+from backend.models.comment import Comment
+from backend.services.extractors import OpenAIExtractor
+from backend.services.openai_service import create_openai_client
+from backend.tests.conftest import FakeOpenAI
+
+pytestmark = pytest.mark.anyio
+
+def lodge_skillet(body: dict) -> str:
+  return json.dumps({"products": [{"product": {"brand_name": "Lodge", "product_name": "Skillet"}, "score": 1}]})
+
+def comments(count: int) -> list:
+  return [Comment(id=f"c{i}", body=f"My Lodge skillet {i}", score=1, created_utc=0, replies=[]) for i in range(count)]
+
+@pytest.fixture
+def backoffs(monkeypatch):
+  """Upper bounds of the backoff delays drawn by retry_with_jitter; the delays themselves are zero."""
+  bounds = []
+
+  def uniform(low, high):
+    bounds.append(high)
+    return 0
+  monkeypatch.setattr(backend.utils.retry.random, "uniform", uniform)
+  return bounds
+
+def extractor(fake: FakeOpenAI) -> OpenAIExtractor:
+  return OpenAIExtractor(create_openai_client(transport=httpx.MockTransport(fake.handle)))
+
+async def test_rate_limited_batch_is_retried_with_exponential_backoff(backoffs):
+  fake = FakeOpenAI(tokens=1, token_delay=0, failures=[429, 429, 503], content=lodge_skillet)
+  products = await extractor(fake).extract(comments(3))
+  assert [(p.brand_name, p.product_name) for p in products] == [("Lodge", "Skillet")]
+  assert fake.requests == 4
+  assert backoffs == [0.5, 1.0, 2.0]
+
+async def test_batch_is_dropped_once_retries_run_out(monkeypatch, backoffs):
+  monkeypatch.setattr(Config, "OPENAI_MAX_RETRIES", 2)
+  fake = FakeOpenAI(tokens=1, token_delay=0, failures=[429] * 3, content=lodge_skillet)
+  assert await extractor(fake).extract(comments(3)) == []
+  assert fake.requests == 3
+  assert backoffs == [0.5, 1.0]
+
+async def test_client_errors_are_not_retried(backoffs):
+  fake = FakeOpenAI(tokens=1, token_delay=0, failures=[400], content=lodge_skillet)
+  assert await extractor(fake).extract(comments(3)) == []
+  assert fake.requests == 1
+  assert backoffs == []
+
+async def test_batches_run_concurrently_up_to_the_limit(monkeypatch):
+  monkeypatch.setattr(Config, "OPENAI_MAX_CONCURRENCY", 2)
+  monkeypatch.setattr(Config, "EXTRACTION_BATCH_MAX_COMMENTS", 1)
+  fake = FakeOpenAI(tokens=5, token_delay=0.01, content=lodge_skillet)
+  products = await extractor(fake).extract(comments(6))
+  assert len(products) == 6
+  assert fake.requests == 6
+  assert fake.peak == 2
@@ -0,0 +1,51 @@
+import pytest
+
+from backend.models.comment import Comment
+from backend.models.product import Product
+from backend.services.extractors import HybridExtractor, LocalExtractor, OpenAIExtractor, create_extractor
+from backend.services.gazetteer import BrandGazetteer
+
+pytestmark = pytest.mark.anyio
+
+SKILLET = Product(brand_name="Lodge", product_name="Cast Iron Skillet")
+
+@pytest.fixture
+async def gazetteer(redis):
+  gazetteer = BrandGazetteer(redis, namespace="test:gazetteer")
+  await gazetteer.learn([SKILLET])
+  return gazetteer
+
+def comments(*bodies: str) -> list:
+  return [Comment(id=f"c{i}", body=body, score=1) for i, body in enumerate(bodies)]
+
+async def test_local_extractor_handles_known_products_and_brand_pairs(model_registry, gazetteer):
+  local = LocalExtractor(model_registry, gazetteer)
+  products, uncertain = await local.extract_with_confidence(comments(
+    "my lodge cast iron skillet is 30 years old",
+    # a known brand next to a product entity
+    "the Lodge Dutch Oven is half the price of the rest",
+    # a known product without its brand is ambiguous
+    "any cast iron skillet will do",
+    "Lodge is fine",
+  ))
+  assert products == [SKILLET, Product(brand_name="Lodge", product_name="Dutch Oven")]
+  assert [comment.id for comment in uncertain] == ["c2", "c3"]
+
+async def test_hybrid_extractor_only_sends_uncertain_comments_to_the_llm(model_registry, gazetteer, openai_client, fake_parse):
+  hybrid = create_extractor("hybrid", openai_client, model_registry, gazetteer)
+  assert isinstance(hybrid, HybridExtractor)
+  products = await hybrid.extract(comments("my lodge cast iron skillet", "Lodge is fine"))
+  assert products == [SKILLET, Product(brand_name="Lodge", product_name="Skillet")]
+  assert fake_parse.calls["extract"] == 1
+  # what the LLM found is learned for the next local extraction
+  assert any(product.product_name == "Skillet" for product in gazetteer.products)
+
+async def test_openai_extractor_sends_every_comment(model_registry, gazetteer, openai_client, fake_parse):
+  openai = create_extractor("openai", openai_client, model_registry, gazetteer)
+  assert isinstance(openai, OpenAIExtractor)
+  assert await openai.extract(comments("my lodge cast iron skillet")) == [Product(brand_name="Lodge", product_name="Skillet")]
+  assert fake_parse.calls["extract"] == 1
+
+async def test_unknown_backend_is_rejected(model_registry, gazetteer, openai_client):
+  with pytest.raises(ValueError):
+    create_extractor("regex", openai_client, model_registry, gazetteer)
@@ -0,0 +1,82 @@
+import asyncio
+import threading
+
+import pytest
+
+from backend.core.config import Config
+from backend.inference_server import InferenceServer
+from backend.services.inference_client import InferenceClient, InferenceUnavailable, read_message, write_message
+from backend.services.model_registry import ModelRegistry
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+def socket_path(tmp_path):
+  return str(tmp_path / "inference.sock")
+
+@pytest.fixture(autouse=True)
+def retries(monkeypatch):
+  monkeypatch.setattr(Config, "INFERENCE_RETRIES", 8)
+
+async def test_batches_in_flight_when_the_sidecar_dies_are_resent_to_its_replacement(socket_path, model_registry):
+  started, release = threading.Event(), threading.Event()
+
+  def stuck(bodies, **kwargs):
+    started.set()
+    release.wait(5)
+    return [{"label": "NEGATIVE", "score": 0.1} for _ in bodies]
+
+  dying = InferenceServer(ModelRegistry(device=-1, loader=lambda task, **kwargs: stuck), socket_path, window=0)
+  await dying.start()
+  client = InferenceClient(socket_path)
+  try:
+    request = asyncio.create_task(client.infer("sentiment", ["great pan"]))
+    assert await asyncio.to_thread(started.wait, 5)
+    await dying.close()
+    release.set()
+    # the client sees the connection drop, then the socket go missing, until the new sidecar is up
+    await asyncio.sleep(0.05)
+    replacement = InferenceServer(model_registry, socket_path, window=0)
+    await replacement.start()
+    try:
+      assert await asyncio.wait_for(request, 10) == [{"label": "POSITIVE", "score": 0.9}]
+      assert replacement.stats()["connections"] == 1
+    finally:
+      await replacement.close()
+  finally:
+    release.set()
+    client.close()
+
+async def test_a_request_that_times_out_is_resent_on_a_fresh_connection(socket_path):
+  connections = 0
+
+  async def handle(reader, writer):
+    nonlocal connections
+    connections += 1
+    first = connections == 1
+    try:
+      while True:
+        message = await read_message(reader)
+        # the first connection hangs without answering
+        if not first:
+          write_message(writer, {"id": message["id"], "outputs": [len(text) for text in message["inputs"]]})
+          await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+      pass
+    finally:
+      writer.close()
+
+  server = await asyncio.start_unix_server(handle, socket_path)
+  client = InferenceClient(socket_path, timeout=0.1)
+  try:
+    assert await client.infer("sentiment", ["ok", "fine"]) == [2, 4]
+    assert connections == 2
+  finally:
+    client.close()
+    server.close()
+
+async def test_gives_up_once_the_retries_run_out(socket_path, monkeypatch):
+  monkeypatch.setattr(Config, "INFERENCE_RETRIES", 2)
+  client = InferenceClient(socket_path)
+  with pytest.raises(InferenceUnavailable):
+    await client.infer("sentiment", ["great pan"])
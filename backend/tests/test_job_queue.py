@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+from backend.models.product import ProductList
+from backend.services.job_queue import PROCESSING_KEY, QUEUE_KEY, JobQueue
+
+pytestmark = pytest.mark.anyio
+
+def queue(redis, **kwargs) -> JobQueue:
+  return JobQueue(redis, result_ttl=60, lease_timeout=1, **kwargs)
+
+async def test_identical_requests_share_a_job_until_it_finishes(redis, search):
+  jobs = queue(redis)
+  job_id = await jobs.submit(search())
+  assert await jobs.submit(search()) == job_id
+  picked, _ = await jobs.next_job(timeout=1)
+  assert picked == job_id
+  await jobs.complete(job_id, ProductList(products=[]))
+  assert (await jobs.get(job_id)).status == "completed"
+  assert await jobs.submit(search()) != job_id
+
+async def test_failed_job_releases_its_request(redis, search):
+  jobs = queue(redis)
+  job_id = await jobs.submit(search())
+  await jobs.next_job(timeout=1)
+  await jobs.fail(job_id, "boom")
+  assert (await jobs.get(job_id)).status == "failed"
+  assert await redis.lrange(PROCESSING_KEY, 0, -1) == []
+  assert await jobs.submit(search()) != job_id
+
+async def test_job_of_a_dead_worker_is_requeued(redis, search):
+  jobs = queue(redis)
+  job_id = await jobs.submit(search())
+  await jobs.next_job(timeout=1)
+  # the worker is gone, so nothing renews the lease
+  assert await jobs.requeue_stale() == 0
+  await asyncio.sleep(1.1)
+  assert await jobs.requeue_stale() == 1
+  assert (await jobs.get(job_id)).status == "queued"
+  assert await redis.lrange(PROCESSING_KEY, 0, -1) == []
+
+  picked, request = await jobs.next_job(timeout=1)
+  assert picked == job_id and request == search()
+
+async def test_job_that_waited_in_the_queue_isnt_taken_from_its_worker(redis, search):
+  jobs = queue(redis)
+  job_id = await jobs.submit(search())
+  # queued for longer than the lease timeout
+  await asyncio.sleep(1.1)
+  # a worker has moved it off the queue but not written its lease yet
+  assert (await redis.lmove(QUEUE_KEY, PROCESSING_KEY, "RIGHT", "LEFT")).decode() == job_id
+  assert await jobs.requeue_stale() == 0
+  assert await redis.lrange(PROCESSING_KEY, 0, -1) == [job_id.encode()]
+
+  # ...and if that worker died before writing it, the job is recovered a lease timeout later
+  await asyncio.sleep(0.5)
+  assert await jobs.requeue_stale() == 0
+  await asyncio.sleep(0.6)
+  assert await jobs.requeue_stale() == 1
+  picked, _ = await jobs.next_job(timeout=1)
+  assert picked == job_id
+  assert await jobs.requeue_stale() == 0
+
+async def test_heartbeat_keeps_a_running_job(redis, search):
+  jobs = queue(redis)
+  job_id = await jobs.submit(search())
+  await jobs.next_job(timeout=1)
+  for _ in range(3):
+    await asyncio.sleep(0.4)
+    await jobs.heartbeat(job_id)
+    assert await jobs.requeue_stale() == 0
+  assert (await jobs.get(job_id)).status == "running"
+
+async def test_job_that_keeps_losing_its_worker_is_failed(redis, search):
+  jobs = queue(redis, max_attempts=2)
+  job_id = await jobs.submit(search())
+  for _ in range(2):
+    await jobs.next_job(timeout=1)
+    await asyncio.sleep(1.1)
+    await jobs.requeue_stale()
+  job = await jobs.get(job_id)
+  assert job.status == "failed"
+  assert await redis.llen(QUEUE_KEY) == 0
+  # and the same search can be submitted again
+  assert await jobs.submit(search()) != job_id
+
+async def test_lease_renewed_while_the_reaper_looks_wins(redis, search, monkeypatch):
+  jobs = queue(redis)
+  job_id = await jobs.submit(search())
+  await jobs.next_job(timeout=1)
+  await asyncio.sleep(1.1)
+  pipeline = redis.pipeline
+
+  def racing_pipeline(*args, **kwargs):
+    pipe = pipeline(*args, **kwargs)
+    hmget = pipe.hmget
+
+    async def read_then_heartbeat(*args, **kwargs):
+      # the reaper sees an expired lease, then the worker renews it
+      values = await hmget(*args, **kwargs)
+      await jobs.heartbeat(job_id)
+      return values
+    pipe.hmget = read_then_heartbeat
+    return pipe
+  monkeypatch.setattr(redis, "pipeline", racing_pipeline)
+
+  assert await jobs.requeue_stale() == 0
+  assert await redis.lrange(PROCESSING_KEY, 0, -1) == [job_id.encode()]
+  assert await redis.llen(QUEUE_KEY) == 0
+  assert (await jobs.get(job_id)).status == "running"
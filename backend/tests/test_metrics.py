@@ -0,0 +1,72 @@
+import asyncio
+
+import httpx
+import pytest
+from prometheus_client import REGISTRY
+
+from backend.core.metrics import ProfilingMiddleware, external_call, monitor_event_loop_lag, record_cache
+from backend.utils.timing import StageTimings, current_timings
+
+pytestmark = pytest.mark.anyio
+
+def sample(name: str, **labels) -> float:
+  return REGISTRY.get_sample_value(name, labels) or 0.0
+
+async def test_record_cache_counts_each_result():
+  before = [sample("cache_requests_total", cache="test", result=result) for result in ("hit", "miss", "stale")]
+  record_cache("test", hits=2, misses=1)
+  record_cache("test", stale=3)
+  after = [sample("cache_requests_total", cache="test", result=result) for result in ("hit", "miss", "stale")]
+  assert [a - b for a, b in zip(after, before)] == [2, 1, 3]
+
+async def test_external_call_is_timed_by_outcome_and_added_to_the_request():
+  timings = StageTimings()
+  token = current_timings.set(timings)
+  try:
+    errors = sample("external_call_seconds_count", service="test", operation="op", outcome="error")
+    async with external_call("test", "op"):
+      await asyncio.sleep(0.01)
+    with pytest.raises(RuntimeError):
+      async with external_call("test", "op"):
+        raise RuntimeError("down")
+  finally:
+    current_timings.reset(token)
+  assert sample("external_call_seconds_count", service="test", operation="op", outcome="error") == errors + 1
+  assert timings.summary()["test.op"]["calls"] == 2
+  assert timings.summary()["test.op"]["busy_ms"] >= 10
+
+async def test_stage_timings_place_each_stage_on_the_request_timeline():
+  observed = []
+  timings = StageTimings(observer=lambda stage, seconds: observed.append(stage))
+  await asyncio.gather(
+    timings.run("sentiment", asyncio.sleep(0.02)),
+    timings.run("sentiment", asyncio.sleep(0.02)),
+    timings.run("fetch", asyncio.sleep(0.01))
+  )
+  summary = timings.summary()
+  assert summary["sentiment"]["calls"] == 2
+  # the two sentiment spans overlap, so they're busier than the window they span
+  assert summary["sentiment"]["busy_ms"] > summary["sentiment"]["end_ms"] - summary["sentiment"]["start_ms"]
+  assert sorted(observed) == ["fetch", "sentiment", "sentiment"]
+  assert 'sentiment;desc="2 calls";dur=' in timings.server_timing()
+
+async def test_event_loop_lag_is_sampled_until_cancelled():
+  before = sample("event_loop_lag_seconds_count")
+  monitor = asyncio.create_task(monitor_event_loop_lag(0.01))
+  await asyncio.sleep(0.05)
+  monitor.cancel()
+  await asyncio.gather(monitor, return_exceptions=True)
+  assert sample("event_loop_lag_seconds_count") > before
+
+async def test_profiled_requests_get_a_server_timing_header(search_app, reddit, search):
+  app = ProfilingMiddleware(search_app, header="X-Profile")
+  async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+    response = await client.post("/search/", json=search().model_dump(), headers={"X-Profile": "1"})
+    assert response.status_code == 200
+    server_timing = response.headers["server-timing"]
+    assert server_timing.startswith("total;dur=")
+    for stage in ("fetch", "ner", "sentiment", "ranking", "reddit.submission_comments"):
+      assert f"{stage};" in server_timing
+
+    response = await client.post("/search/", json=search("dutch oven").model_dump())
+    assert "server-timing" not in response.headers
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from backend.core.config import Config
+from backend.services.inference_client import RemoteModelRegistry
+from backend.services import model_registry as registry_module
+from backend.services.model_registry import ModelRegistry, ModelSpec, create_model_registry
+
+pytestmark = pytest.mark.anyio
+
+async def test_concurrent_gets_load_each_model_once(model_registry, fake_models):
+  models = await asyncio.gather(*[asyncio.to_thread(model_registry.get, "ner") for _ in range(8)])
+  assert fake_models.loads == ["ner"]
+  assert all(model == models[0] for model in models)
+  assert model_registry.get("sentiment") == model_registry.get("sentiment")
+  assert fake_models.loads == ["ner", "sentiment-analysis"]
+
+def test_warm_loads_every_model_with_its_spec():
+  seen = []
+  registry = ModelRegistry(
+    specs={"ner": ModelSpec(task="ner", model="some/ner", kwargs={"grouped_entities": True})},
+    device=-1, loader=lambda task, **kwargs: seen.append((task, kwargs))
+  )
+  registry.warm()
+  assert seen == [("ner", {"device": -1, "grouped_entities": True, "model": "some/ner"})]
+  assert set(registry.stats()) == {"ner"}
+  assert registry.stats()["ner"].backend == "eager"
+
+def test_close_drops_loaded_models(model_registry, fake_models):
+  model_registry.get("ner")
+  model_registry.close()
+  model_registry.get("ner")
+  assert fake_models.loads == ["ner", "ner"]
+
+@pytest.mark.parametrize("backend", ["quantized", "onnx"])
+def test_cpu_backends_load_through_their_loader_on_the_cpu(monkeypatch, backend):
+  loaded = []
+
+  def load(spec: ModelSpec, device: int, threads: int):
+    loaded.append((spec.task, device, threads))
+    return spec.task
+  monkeypatch.setitem(registry_module._BACKEND_LOADERS, backend, load)
+  # a GPU is requested, but quantized and ONNX models only run on the CPU
+  registry = ModelRegistry(device=0, backend=backend, threads=2)
+  assert registry.get("sentiment") == "sentiment-analysis"
+  assert loaded == [("sentiment-analysis", -1, 2)]
+  assert registry.stats()["sentiment"].backend == backend
+  assert registry.stats()["sentiment"].device == -1
+
+def test_backend_defaults_to_the_configured_one(monkeypatch):
+  monkeypatch.setattr(Config, "MODEL_BACKEND", "quantized")
+  assert ModelRegistry(loader=lambda task, **kwargs: None).backend == "quantized"
+
+def test_unknown_backend_is_rejected():
+  with pytest.raises(ValueError):
+    ModelRegistry(backend="tensorrt")
+
+def test_sidecar_registry_when_a_socket_is_configured(monkeypatch):
+  monkeypatch.setattr(Config, "INFERENCE_SOCKET", "/tmp/inference.sock")
+  assert isinstance(create_model_registry(), RemoteModelRegistry)
+  monkeypatch.setattr(Config, "INFERENCE_SOCKET", "")
+  assert isinstance(create_model_registry(), ModelRegistry)
@@ -0,0 +1,41 @@
+import threading
+
+import pytest
+
+from backend.core.config import Config
+from backend.services.inference_client import InferenceClient, RemoteModelRegistry, RemotePipeline
+from backend.services.ner_filter import extract_entities, ner_pipeline_for
+
+pytestmark = pytest.mark.anyio
+
+def test_thread_executor_uses_the_registry_pipeline(monkeypatch, model_registry, fake_models):
+  monkeypatch.setattr(Config, "NER_EXECUTOR", "thread")
+  assert ner_pipeline_for(model_registry) is not None
+  assert fake_models.loads == ["ner"]
+
+def test_process_executor_leaves_the_model_to_the_pool(monkeypatch, model_registry, fake_models):
+  monkeypatch.setattr(Config, "NER_EXECUTOR", "process")
+  assert ner_pipeline_for(model_registry) is None
+  assert fake_models.loads == []
+
+def test_sidecar_pipeline_is_used_with_any_executor(monkeypatch):
+  monkeypatch.setattr(Config, "NER_EXECUTOR", "process")
+  registry = RemoteModelRegistry(InferenceClient("/nonexistent.sock"))
+  assert isinstance(ner_pipeline_for(registry), RemotePipeline)
+
+async def test_bodies_are_batched_off_the_loop_and_cached(monkeypatch, fake_models):
+  monkeypatch.setattr(Config, "NER_EXECUTOR", "thread")
+  batches = []
+
+  def pipeline(bodies, **kwargs):
+    batches.append((len(bodies), threading.current_thread() is threading.main_thread()))
+    return fake_models.ner(bodies)
+
+  bodies = [f"Lodge skillet {i}" for i in range(10)] + ["Lodge skillet 0"]
+  entities = await extract_entities(bodies, pipeline, batch_size=4)
+  assert sorted(batches) == [(2, False), (4, False), (4, False)]
+  assert entities[0] == entities[-1] == [{"entity_group": "ORG", "word": "Lodge", "score": 0.9}]
+
+  # a second pass over the same bodies is answered from the cache
+  assert await extract_entities(bodies, pipeline, batch_size=4) == entities
+  assert len(batches) == 3
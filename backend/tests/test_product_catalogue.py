@@ -0,0 +1,128 @@
+import asyncio
+
+import fakeredis
+import fakeredis.aioredis
+import pytest
+
+from backend.models.product import Product
+from backend.services.product_catalogue import ProductCatalogue
+
+pytestmark = pytest.mark.anyio
+
+def product(brand: str, name: str) -> Product:
+  return Product(brand_name=brand, product_name=name)
+
+class CountingRedis(fakeredis.aioredis.FakeRedis):
+  """Counts full catalogue loads."""
+  def __init__(self, *args, **kwargs):
+    super().__init__(*args, **kwargs)
+    self.loads = 0
+
+  async def hgetall(self, name):
+    self.loads += 1
+    return await super().hgetall(name)
+
+@pytest.fixture
+def server():
+  return fakeredis.FakeServer()
+
+async def test_refresh_picks_up_entries_when_the_counts_match(server):
+  first = ProductCatalogue(fakeredis.aioredis.FakeRedis(server=server))
+  second = ProductCatalogue(fakeredis.aioredis.FakeRedis(server=server))
+  # same number of entries on each side, but not the same entries
+  second.add(product("Lodge", "Skillet"))
+  first.add(product("Zojirushi", "Neuro Fuzzy"))
+  await first.save()
+
+  await second.refresh(force=True)
+  assert second.find(product("Zojirushi", "Neuro Fuzzy")) is not None
+  assert len(second) == 2
+
+async def test_refresh_only_reads_the_saves_it_missed(server):
+  redis = CountingRedis(server=server)
+  catalogue = ProductCatalogue(redis)
+  await catalogue.refresh(force=True)
+  catalogue.add(product("Lodge", "Skillet"))
+  await catalogue.save()
+  loads = redis.loads
+
+  # our own save, nothing to read
+  await catalogue.refresh(force=True)
+  assert redis.loads == loads
+
+  other = ProductCatalogue(fakeredis.aioredis.FakeRedis(server=server))
+  await other.refresh(force=True)
+  other.add(product("OXO", "Good Grips Peeler"))
+  await other.save()
+  other.add(product("Lodge", "Skilet"))
+  await other.save()
+
+  await catalogue.refresh(force=True)
+  assert redis.loads == loads
+  assert catalogue.find(product("OXO", "Good Grips Peeler")) is not None
+  assert catalogue.aliases_for([product("Lodge", "Skillet")]) == {("Lodge", "Skillet"): ["Skilet"]}
+  assert len(catalogue) == 2
+
+async def test_refresh_reloads_everything_past_the_changelog(server):
+  redis = CountingRedis(server=server)
+  catalogue = ProductCatalogue(redis)
+  await catalogue.refresh(force=True)
+  other = ProductCatalogue(fakeredis.aioredis.FakeRedis(server=server))
+  for i in range(3):
+    other.add(product(f"Brand{i}", "Kettle"))
+    await other.save()
+  await redis.xtrim(catalogue.changes_key, maxlen=1, approximate=False)
+  loads = redis.loads
+
+  await catalogue.refresh(force=True)
+  assert redis.loads > loads
+  assert len(catalogue) == 3
+
+  # and it's back on the changelog after that
+  other.add(product("Brand3", "Kettle"))
+  await other.save()
+  loads = redis.loads
+  await catalogue.refresh(force=True)
+  assert redis.loads == loads and len(catalogue) == 4
+
+async def test_failed_save_keeps_its_entries_for_the_next_one(server):
+  catalogue = ProductCatalogue(fakeredis.aioredis.FakeRedis(server=server))
+  catalogue.add(product("Lodge", "Skillet"))
+  server.connected = False
+  await catalogue.save()
+  server.connected = True
+  catalogue.add(product("OXO", "Good Grips Peeler"))
+  await catalogue.save()
+
+  other = ProductCatalogue(fakeredis.aioredis.FakeRedis(server=server))
+  await other.refresh(force=True)
+  assert other.find(product("Lodge", "Skillet")) is not None
+  assert other.find(product("OXO", "Good Grips Peeler")) is not None
+
+async def test_concurrent_saves_write_each_entry_once(server):
+  catalogue = ProductCatalogue(fakeredis.aioredis.FakeRedis(server=server))
+  catalogue.add(product("Lodge", "Skillet"))
+  await asyncio.gather(catalogue.save(), catalogue.save())
+  changes = await catalogue.redis.xrange(catalogue.changes_key)
+  assert len(changes) == 1
+
+async def test_least_recently_used_entries_are_dropped_past_the_limit(redis):
+  catalogue = ProductCatalogue(redis, max_entries=10)
+  hot = product("Lodge", "Skillet")
+  hot_id = catalogue.add(hot)
+  catalogue._add_alias("lodge|cast iron skillet", hot_id, "Cast Iron Skillet")
+  for i in range(40):
+    catalogue.add(product(f"Brand{i}", f"Widget {chr(97 + i % 26)}{i}"))
+    assert catalogue.find(hot) is not None
+
+  assert len(catalogue) <= 10
+  assert catalogue.evictions >= 30
+  assert catalogue.products[catalogue.find(hot)] == hot
+  assert catalogue.find(product("Lodge", "Cast Iron Skillet")) == catalogue.find(hot)
+  assert catalogue.aliases_for([hot]) == {("Lodge", "Skillet"): ["Cast Iron Skillet"]}
+  assert catalogue.find(product("Brand0", "Widget a0")) is None
+
+async def test_canonicalize_across_an_eviction(redis):
+  catalogue = ProductCatalogue(redis, max_entries=3)
+  products = [product(f"Brand{i}", "Kettle") for i in range(6)] + [product("Brand5", "Kettles")]
+  assert catalogue.canonicalize(products) == products[:6]
@@ -0,0 +1,38 @@
+from types import SimpleNamespace
+
+from backend.models.product import Product
+from backend.services.product_matcher import ProductMatcher
+
+LODGE = Product(brand_name="Lodge", product_name="Cast Iron Skillet")
+OXO = Product(brand_name="OXO", product_name="Good Grips Peeler")
+LE_CREUSET = Product(brand_name="Le Creuset", product_name="Dutch Oven")
+
+def test_every_product_in_a_comment_is_found_in_one_pass():
+  matcher = ProductMatcher([LODGE, OXO, LE_CREUSET])
+  assert matcher.match_products("My lodge cast iron skillet and an OXO peeler, both great") == [LODGE, OXO]
+  assert matcher.match_products("nothing relevant here") == []
+
+def test_only_whole_words_match():
+  matcher = ProductMatcher([OXO])
+  assert matcher.match("I keep everything in a boxOXOne") == set()
+  assert matcher.match("oxo!") == {0}
+
+def test_multi_word_brands_also_match_run_together():
+  matcher = ProductMatcher([LE_CREUSET])
+  assert matcher.match("my LeCreuset is 20 years old") == {0}
+  assert matcher.match("le creuset forever") == {0}
+
+def test_aliases_count_as_mentions():
+  matcher = ProductMatcher([LODGE], aliases={("Lodge", "Cast Iron Skillet"): ["10 inch skillet"]}, match_brands=False)
+  assert matcher.match("the 10 inch skillet is all you need") == {0}
+  # with match_brands off, a bare brand isn't enough
+  assert matcher.match("lodge makes good stuff") == set()
+
+def test_analyze_sentiments_scores_each_mention(controller):
+  comments = [
+    SimpleNamespace(body="Lodge skillet rules"),
+    SimpleNamespace(body="oxo peeler broke"),
+    SimpleNamespace(body="lodge and oxo both fine"),
+  ]
+  sentiments = controller.analyze_sentiments(comments, [LODGE, OXO], [0.9, -0.8, 0.1])
+  assert sentiments == {("Lodge", "Cast Iron Skillet"): [0.9, 0.1], ("OXO", "Good Grips Peeler"): [-0.8, 0.1]}
@@ -0,0 +1,84 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from asyncprawcore.rate_limit import RateLimiter
+
+from backend.core.config import Config
+from backend.services.reddit_scheduler import RedditScheduler
+from backend.services.reddit_service import RedditService
+from backend.tests.conftest import FakeReddit
+
+pytestmark = pytest.mark.anyio
+
+class RateLimitedReddit:
+  """Stands in for asyncpraw.Reddit: every call takes `latency` and answers with `headers`."""
+  def __init__(self, latency: float, headers: dict):
+    self._core = SimpleNamespace(_rate_limiter=RateLimiter(window_size=600))
+    self.latency = latency
+    self.headers = headers
+    self.active = 0
+    self.peak = 0
+    self.calls = 0
+
+  async def fetch(self):
+    self.active += 1
+    self.peak = max(self.peak, self.active)
+    try:
+      await asyncio.sleep(self.latency)
+      self._core._rate_limiter.update(response_headers=self.headers)
+      self.calls += 1
+    finally:
+      self.active -= 1
+
+def headers(remaining: int, used: int, reset: int) -> dict:
+  return {"x-ratelimit-remaining": str(remaining), "x-ratelimit-used": str(used), "x-ratelimit-reset": str(reset)}
+
+async def run_calls(scheduler: RedditScheduler, client: RateLimitedReddit, count: int) -> float:
+  started = time.perf_counter()
+  await asyncio.gather(*[scheduler.run(client.fetch) for _ in range(count)])
+  return time.perf_counter() - started
+
+async def test_concurrency_is_bounded_without_throttling():
+  client = RateLimitedReddit(0.05, headers(remaining=500, used=100, reset=300))
+  scheduler = RedditScheduler(client, max_concurrency=3, min_remaining=5)
+  elapsed = await run_calls(scheduler, client, 9)
+  assert client.calls == 9
+  assert client.peak == 3
+  # three rounds of 50ms, no rate-limit waits
+  assert elapsed < 0.5
+
+async def test_waits_for_reset_once_the_window_is_used_up():
+  client = RateLimitedReddit(0.01, headers(remaining=0, used=600, reset=1))
+  scheduler = RedditScheduler(client, max_concurrency=1, min_remaining=5)
+  await run_calls(scheduler, client, 1)
+  assert 0.8 < scheduler._rate_limit_delay() <= 1.0
+  assert await run_calls(scheduler, client, 1) >= 0.8
+
+async def test_wait_is_capped():
+  client = RateLimitedReddit(0.01, headers(remaining=2, used=598, reset=300))
+  scheduler = RedditScheduler(client, max_concurrency=1, min_remaining=5, max_wait=0.2)
+  await run_calls(scheduler, client, 1)
+  elapsed = await run_calls(scheduler, client, 1)
+  assert 0.2 <= elapsed < 0.5
+
+def test_no_wait_before_the_first_response():
+  client = RateLimitedReddit(0.01, headers(remaining=0, used=600, reset=60))
+  assert RedditScheduler(client)._rate_limit_delay() == 0.0
+
+def test_unexpected_rate_limiter_is_ignored():
+  client = RateLimitedReddit(0.01, {})
+  client._core._rate_limiter = SimpleNamespace(reset_timestamp=time.time() + 60)
+  scheduler = RedditScheduler(client)
+  assert scheduler._rate_limit_delay() == 0.0
+  assert scheduler._warned
+
+async def test_submissions_of_every_subreddit_are_fanned_out(monkeypatch, redis, openai_client, search):
+  monkeypatch.setattr(Config, "SEARCH_SUBREDDITS", ["buyitforlife", "cooking"])
+  reddit = FakeReddit()
+  service = RedditService(redis, client=reddit, openai_client=openai_client)
+  stores = [store async for store in service.iter_submission_comments(search())]
+  assert sorted(reddit.searches) == [("buyitforlife", "cast iron pan"), ("cooking", "cast iron pan")]
+  assert len(stores) == 6
+  assert reddit.submission_loads == {"p0": 2, "p1": 2, "p2": 2}
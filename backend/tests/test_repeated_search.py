@@ -0,0 +1,31 @@
+import pytest
+
+from backend.services.sentiment_cache import SentimentCache
+
+pytestmark = pytest.mark.anyio
+
+async def test_repeated_search_makes_no_model_calls(controller, fake_models, search):
+  first = await controller.execute_search(search())
+  assert fake_models.calls["ner"] > 0 and fake_models.calls["sentiment"] > 0
+  seen = fake_models.calls.copy()
+
+  second = await controller.execute_search(search())
+  assert fake_models.calls == seen
+  assert second == first
+  assert [p.product.product_name for p in first.products] == ["Skillet"]
+
+async def test_sentiment_scores_are_kept_apart_per_backend(redis):
+  inferred = []
+
+  def scorer(score: float):
+    async def infer(bodies):
+      inferred.append(bodies)
+      return [score for _ in bodies]
+    return infer
+
+  eager, quantized = SentimentCache(redis, backend="eager"), SentimentCache(redis, backend="quantized")
+  assert await eager.score(["great pan"], scorer(0.9)) == [0.9]
+  # the int8 model scores it again instead of reusing the fp32 score
+  assert await quantized.score(["great  pan "], scorer(0.8)) == [0.8]
+  assert await SentimentCache(redis, backend="eager").score(["great pan"], scorer(0.1)) == [0.9]
+  assert inferred == [["great pan"], ["great  pan "]]
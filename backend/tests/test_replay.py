@@ -0,0 +1,79 @@
+import json
+
+import httpx
+import pytest
+
+from backend.api.endpoints.search import SearchController
+from backend.core.replay import (
+  Cassette, RecordingReddit, RecordingTransport, ReplayMiss, ReplayRedis, ReplayReddit, ReplayTransport, _decode, _encode
+)
+from backend.services.openai_service import OpenAIService, create_openai_client
+from backend.services.reddit_service import RedditService
+from backend.tests.conftest import FakeOpenAI
+
+pytestmark = pytest.mark.anyio
+
+def structured_content(body: dict) -> str:
+  # what the parse() calls in OpenAIService and the extractor expect back
+  if body["response_format"]["json_schema"]["name"] == "ProductList":
+    return json.dumps({"products": [{"product": {"brand_name": "Lodge", "product_name": "Skillet"}, "score": 1}]})
+  return json.dumps({"included_words": ["skillet"], "excluded_words": []})
+
+async def test_cassette_prefers_the_most_specific_key_and_cycles_responses(tmp_path):
+  cassette = Cassette(str(tmp_path / "fixture.json"), latency_scale=0)
+  cassette.record("redis", ["GET abc", "GET"], "first", 0.1)
+  cassette.record("redis", ["GET abc", "GET"], "second", 0.1)
+  cassette.record("redis", ["GET def", "GET"], "other", 0.1)
+  assert [await cassette.replay("redis", ["GET abc", "GET"]) for _ in range(3)] == ["first", "second", "first"]
+  # nothing under the exact key, so the coarser one answers
+  assert await cassette.replay("redis", ["GET xyz", "GET"]) == "first"
+  with pytest.raises(ReplayMiss):
+    await cassette.replay("openai", ["POST /chat/completions"])
+  assert cassette.misses == 1
+
+async def test_cassette_round_trips_through_its_file(tmp_path):
+  path = str(tmp_path / "nested" / "fixture.json")
+  cassette = Cassette(path)
+  cassette.record("reddit", ["comments p0"], [{"id": "p0a"}], 0.5)
+  cassette.save()
+
+  loaded = Cassette.load(path, latency_scale=2, latency={"redis": 0.01})
+  assert loaded.interactions == cassette.interactions
+  assert loaded.delay("reddit", loaded.interactions[0]) == 1.0
+  assert loaded.delay("redis", loaded.interactions[0]) == 0.01
+
+  with open(path, "w") as f:
+    json.dump({"version": 0, "interactions": []}, f)
+  with pytest.raises(ValueError):
+    Cassette.load(path)
+
+def test_redis_replies_survive_json():
+  reply = [b"raw", {b"field": b"value"}, {b"member"}, None, 3]
+  assert _decode(json.loads(json.dumps(_encode(reply)))) == reply
+
+async def test_recorded_search_replays_without_the_network(tmp_path, redis, reddit, model_registry, search):
+  path = str(tmp_path / "fixture.json")
+  fake_openai = FakeOpenAI(token_delay=0, content=structured_content)
+
+  def controller(redis_client, reddit_client, openai_client) -> SearchController:
+    return SearchController(
+      RedditService(redis_client, client=reddit_client, openai_client=openai_client), OpenAIService(openai_client), model_registry
+    )
+
+  cassette = Cassette(path)
+  openai_client = create_openai_client(transport=RecordingTransport(cassette, httpx.MockTransport(fake_openai.handle)))
+  recorded = await controller(redis, RecordingReddit(reddit, cassette), openai_client).execute_search(search())
+  await openai_client.close()
+  cassette.save()
+  requests, searches, loads = fake_openai.requests, list(reddit.searches), dict(reddit.submission_loads)
+
+  replay = Cassette.load(path, latency_scale=0)
+  openai_client = create_openai_client(transport=ReplayTransport(replay))
+  replayed = await controller(ReplayRedis(replay), ReplayReddit(replay), openai_client).execute_search(search())
+  await openai_client.close()
+  assert replayed == recorded
+  assert [p.product.product_name for p in replayed.products] == ["Skillet"]
+  # nothing reached the fakes the second time
+  assert (fake_openai.requests, reddit.searches, dict(reddit.submission_loads)) == (requests, searches, loads)
+  # Redis wasn't recorded; its lookups miss and read as an empty database, so the search reran in full
+  assert {interaction["service"] for interaction in replay.interactions} == {"reddit", "openai"}
@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+from backend.models.product import Product, ProductList, ProductWithScore
+from backend.services.search_cache import SearchResultCache, search_request_key
+from backend.tests.conftest import make_search as search
+
+pytestmark = pytest.mark.anyio
+
+def result(score: float) -> ProductList:
+  return ProductList(products=[ProductWithScore(product=Product(brand_name="Lodge", product_name="Skillet"), score=score)])
+
+class CountingSearch:
+  """Stands in for the pipeline: takes `delay` seconds and counts its runs."""
+  def __init__(self, delay: float = 0.05):
+    self.delay = delay
+    self.runs = 0
+
+  async def __call__(self) -> ProductList:
+    self.runs += 1
+    await asyncio.sleep(self.delay)
+    return result(self.runs)
+
+def test_equivalent_requests_share_a_key():
+  key = search_request_key(search("Cast Iron  Pan", sites=["Amazon", "ebay "], retailers=["b", "a", "a"]))
+  assert key == search_request_key(search(" cast iron pan", sites=["ebay", "amazon"], retailers=["a", "b"]))
+  assert key != search_request_key(search("cast iron pans"))
+  assert key != search_request_key(search("cast iron pan", max_price=50))
+
+async def test_concurrent_identical_searches_run_once(redis):
+  cache = SearchResultCache(redis, ttl=60, stale_ttl=60)
+  compute = CountingSearch()
+  results = await asyncio.gather(*[
+    cache.get_or_compute(search(category), compute) for category in ["cast iron pan", "Cast Iron Pan", " cast iron  pan"] * 5
+  ])
+  assert compute.runs == 1
+  assert all(r == result(1) for r in results)
+  # and later requests are answered from the cache
+  assert await cache.get_or_compute(search(), compute) == result(1)
+  assert compute.runs == 1
+
+async def test_results_are_shared_through_redis(redis):
+  compute = CountingSearch()
+  await SearchResultCache(redis, ttl=60).get_or_compute(search(), compute)
+  # a fresh LRU, as in another worker
+  assert await SearchResultCache(redis, ttl=60).get_or_compute(search(), compute) == result(1)
+  assert compute.runs == 1
+
+async def test_stale_result_is_served_while_one_refresh_runs(redis):
+  cache = SearchResultCache(redis, ttl=0.05, stale_ttl=60)
+  compute = CountingSearch(delay=0.1)
+  await cache.get_or_compute(search(), compute)
+  await asyncio.sleep(0.1)
+
+  # stale: answered right away with the old result, one refresh starts behind them
+  results = await asyncio.wait_for(asyncio.gather(*[cache.get_or_compute(search(), compute) for _ in range(5)]), 0.05)
+  assert all(r == result(1) for r in results)
+  assert cache.refreshes == 1
+
+  await asyncio.sleep(0.15)
+  assert compute.runs == 2
+  assert await cache.get(search()) == result(2)
+
+async def test_failed_search_is_not_cached(redis):
+  cache = SearchResultCache(redis, ttl=60)
+  calls = []
+
+  async def failing():
+    calls.append(1)
+    await asyncio.sleep(0.01)
+    raise RuntimeError("reddit is down")
+
+  outcomes = await asyncio.gather(*[cache.get_or_compute(search(), failing) for _ in range(3)], return_exceptions=True)
+  assert all(isinstance(outcome, RuntimeError) for outcome in outcomes)
+  assert len(calls) == 1
+  assert await cache.get(search()) is None
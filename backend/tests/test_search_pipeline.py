@@ -0,0 +1,32 @@
+import asyncio
+
+import pytest
+
+from backend.core.metrics import use_request_timings
+from backend.tests.conftest import GatedReddit
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+def reddit():
+  return GatedReddit("p2")
+
+async def test_submissions_are_processed_while_others_still_load(controller, reddit, fake_parse, search):
+  seen_at_first_ranking = {}
+
+  def on_event(event):
+    if event.event == "ranking" and not reddit.gate.is_set():
+      # p2 can only load after an earlier submission went all the way through the pipeline
+      seen_at_first_ranking.update(fake_parse.calls)
+      reddit.gate.set()
+
+  result = await asyncio.wait_for(controller.execute_search(search(), on_event=on_event), 5)
+  assert [p.product.product_name for p in result.products] == ["Skillet"]
+  # subject phrases didn't wait for the fetch to finish
+  assert seen_at_first_ranking["subject_phrases"] == 1
+  assert reddit.submission_loads == {"p0": 1, "p1": 1, "p2": 1}
+
+async def test_stage_timings_cover_every_stage(controller, reddit, search):
+  reddit.gate.set()
+  await controller.execute_search(search())
+  assert {"subject_phrases", "products_cache", "fetch", "ner", "sentiment", "extraction", "ranking"} <= set(use_request_timings().summary())
@@ -0,0 +1,84 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from backend.services.search_cache import search_request_key
+from backend.tests.conftest import GatedReddit
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+def reddit():
+  return GatedReddit("p2")
+
+async def collect(events) -> list:
+  return [event async for event in events]
+
+async def test_streams_and_blocking_searches_share_one_run(controller, reddit, search_cache, search):
+  runs = []
+
+  async def compute(on_event=None):
+    runs.append(1)
+    return await controller.execute_search(search(), on_event=on_event)
+
+  streams = [asyncio.create_task(collect(search_cache.stream(search(), compute))) for _ in range(3)]
+  blocking = asyncio.create_task(search_cache.get_or_compute(search(), compute))
+  await asyncio.sleep(0.05)
+  reddit.gate.set()
+
+  events = await asyncio.gather(*streams)
+  result = await blocking
+  assert len(runs) == 1
+  # streams that joined late still get every event from the start
+  assert events[0] == events[1] == events[2]
+  assert [event.event for event in events[0]].count("ranking") == 3
+  assert events[0][-1].event == "result" and events[0][-1].data == result
+  assert await search_cache.get(search()) == result
+
+async def test_stream_endpoint_returns_events_then_the_cached_result(search_app, reddit, search_cache, search):
+  reddit.gate.set()
+  async with httpx.AsyncClient(transport=httpx.ASGITransport(app=search_app), base_url="http://test") as client:
+    response = await client.post("/search/stream", json=search().model_dump())
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert events[-1]["event"] == "result"
+    assert {event["event"] for event in events[:-1]} == {"progress", "ranking"}
+    assert (await search_cache.get(search())).model_dump() == events[-1]["data"]
+
+    # answered from the cache the second time
+    response = await client.post("/search/stream", json=search().model_dump())
+    assert [json.loads(line) for line in response.text.splitlines()] == [events[-1]]
+
+async def test_disconnect_cancels_the_search_without_waiting_for_an_event(search_app, search_cache, search):
+  body = search().model_dump_json().encode()
+  requested = False
+  disconnected = asyncio.Event()
+  sent = []
+
+  async def receive():
+    nonlocal requested
+    if not requested:
+      requested = True
+      return {"type": "http.request", "body": body, "more_body": False}
+    await disconnected.wait()
+    return {"type": "http.disconnect"}
+
+  async def send(message):
+    if message["type"] == "http.response.body" and message.get("body"):
+      sent.append(message["body"])
+      # leave once the search is stuck waiting for p2, so no further event would reveal it
+      if b"ranking" in message["body"] and len(sent) > 4:
+        disconnected.set()
+
+  scope = {
+    "type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "http_version": "1.1", "method": "POST",
+    "scheme": "http", "path": "/search/stream", "raw_path": b"/search/stream", "query_string": b"", "root_path": "",
+    "headers": [(b"content-type", b"application/json")], "client": ("test", 1), "server": ("test", 80)
+  }
+  await asyncio.wait_for(search_app(scope, receive, send), 5)
+  assert disconnected.is_set()
+  # the search was the only thing waiting on p2; it's gone instead of running on in the background
+  await asyncio.sleep(0.05)
+  assert search_request_key(search()) not in search_cache.inflight
+  assert await search_cache.get(search()) is None
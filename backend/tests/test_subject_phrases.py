@@ -0,0 +1,65 @@
+import pytest
+
+from backend.services.openai_service import SubjectPhrasesRequest
+from backend.services.product_matcher import singularize
+from backend.services.subject_phrases import SubjectPhraseCache, normalize_category
+
+pytestmark = pytest.mark.anyio
+
+@pytest.mark.parametrize("category, expected", [
+  ("Best Rice Cookers", "rice cooker"),
+  ("good best rice-cookers", "rice cooker"),
+  ("best", "best"),
+  ("tank top", "tank top"),
+  ("vitamin a", "vitamin a"),
+  ("top load washer", "top load washer"),
+  ("rice cooker for sushi", "rice cooker for sushi"),
+  ("AA Batteries", "aa battery"),
+])
+def test_normalize_category(category, expected):
+  assert normalize_category(category) == expected
+
+@pytest.mark.parametrize("token, expected", [
+  ("cookers", "cooker"),
+  ("boxes", "box"),
+  ("benches", "bench"),
+  ("glasses", "glass"),
+  ("lens", "lens"),
+  ("news", "news"),
+  ("series", "series"),
+  ("species", "species"),
+  ("cactus", "cactus"),
+  ("dress", "dress"),
+  ("batteries", "battery"),
+  ("accessories", "accessory"),
+  ("fries", "fry"),
+  ("ties", "tie"),
+  ("hoodies", "hoodie"),
+  ("cookies", "cookie"),
+])
+def test_singularize(token, expected):
+  assert singularize(token) == expected
+
+def phrases(word: str) -> SubjectPhrasesRequest:
+  return SubjectPhrasesRequest(included_words=[word], excluded_words=[])
+
+async def test_near_duplicates_share_an_entry_and_different_categories_dont(redis):
+  cache = SubjectPhraseCache(redis)
+  await cache.set("best hair dryers", phrases("hair"))
+  await cache.set("tank top", phrases("tank top"))
+
+  assert (await cache.get("Hair Dryer")).included_words == ["hair"]
+  assert (await cache.get("dryer hair")).included_words == ["hair"]
+  assert cache.resolve("dryer hair") == ("hair dryer", True)
+  for category in ["air dryer", "hair dryer stand", "tank", "tank tops for men"]:
+    assert await cache.get(category) is None
+
+async def test_known_categories_are_shared_through_redis(redis):
+  await SubjectPhraseCache(redis).set("rice cookers", phrases("rice"))
+  other = SubjectPhraseCache(redis)
+  assert (await other.get("cooker rice")).included_words == ["rice"]
+
+async def test_y_plurals_share_an_entry_with_their_singular(redis):
+  cache = SubjectPhraseCache(redis)
+  await cache.set("phone batteries", phrases("battery"))
+  assert (await cache.get("Phone Battery")).included_words == ["battery"]
@@ -0,0 +1,194 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+class LRUCache:
+  """
+  Small in-process LRU cache with an optional per-entry TTL. Least recently used
+  entries are evicted once `maxsize` is reached. Not thread-safe; use it from the
+  event loop.
+  """
+  def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+    self.maxsize = maxsize
+    self.ttl = ttl
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+    self._data: "OrderedDict[Hashable, tuple[Any, Optional[float]]]" = OrderedDict()
+
+  def __len__(self) -> int:
+    return len(self._data)
+
+  def __contains__(self, key: Hashable) -> bool:
+    return self.get(key, _MISSING, count=False) is not _MISSING
+
+  def get(self, key: Hashable, default: Any = None, count: bool = True) -> Any:
+    entry = self._data.get(key)
+    if entry is not None:
+      value, expires_at = entry
+      if expires_at is None or expires_at > time.monotonic():
+        self._data.move_to_end(key)
+        if count:
+          self.hits += 1
+        return value
+      del self._data[key]
+    if count:
+      self.misses += 1
+    return default
+
+  def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+    ttl = self.ttl if ttl is None else ttl
+    self._data[key] = (value, time.monotonic() + ttl if ttl else None)
+    self._data.move_to_end(key)
+    while len(self._data) > self.maxsize:
+      self._data.popitem(last=False)
+      self.evictions += 1
+
+  def delete(self, key: Hashable):
+    self._data.pop(key, None)
+
+  def clear(self):
+    self._data.clear()
+
+  def stats(self) -> dict:
+    lookups = self.hits + self.misses
+    return {
+      "size": len(self._data),
+      "maxsize": self.maxsize,
+      "hits": self.hits,
+      "misses": self.misses,
+      "evictions": self.evictions,
+      "hit_rate": self.hits / lookups if lookups else 0.0
+    }
+
+class SingleFlight:
+  """
+  De-duplicates concurrent work by key: while a call for `key` is running, other
+  callers await the same task instead of starting their own. The shared task is
+  shielded, so one caller being cancelled doesn't cancel it for the others.
+  """
+  def __init__(self):
+    self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+  def __contains__(self, key: Hashable) -> bool:
+    return key in self._inflight
+
+  def start(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+    task = self._inflight.get(key)
+    if task is None:
+      task = asyncio.ensure_future(func())
+      self._inflight[key] = task
+      task.add_done_callback(lambda _: self._inflight.pop(key, None))
+    return task
+
+  async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+    return await asyncio.shield(self.start(key, func))
+
+class TieredCache:
+  """
+  JSON-serializable values cached in an in-process LRU in front of Redis.
+  Entries are fresh for `ttl` seconds and may then be served stale for another
+  `stale_ttl` seconds while a refresh runs. Redis failures degrade to LRU-only.
+  """
+  def __init__(self, redis_client, namespace: str, maxsize: int = 1024, ttl: float = 3600, stale_ttl: float = 0):
+    self.redis = redis_client
+    self.namespace = namespace
+    self.ttl = ttl
+    self.stale_ttl = stale_ttl
+    self.local = LRUCache(maxsize=maxsize, ttl=ttl + stale_ttl)
+    self.redis_hits = 0
+
+  def _redis_key(self, key: str) -> str:
+    return f"{self.namespace}:{key}"
+
+  async def get(self, key: str) -> Optional[Tuple[Any, bool]]:
+    """Return `(value, is_stale)` or None on a miss."""
+    entry = self.local.get(key)
+    if entry is None and self.redis is not None:
+      try:
+        raw = await self.redis.get(self._redis_key(key))
+      except Exception as e:
+        logger.warning(f"Redis get failed for {self._redis_key(key)}: {e}")
+        raw = None
+      if raw:
+        try:
+          entry = json.loads(raw)
+          self.redis_hits += 1
+          self.local.set(key, entry, ttl=max(entry["fresh_until"] + self.stale_ttl - time.time(), 1))
+        except (json.JSONDecodeError, KeyError, TypeError):
+          logger.warning(f"Cache data invalid for key: {self._redis_key(key)}")
+          entry = None
+    if entry is None:
+      return None
+    return entry["value"], entry["fresh_until"] <= time.time()
+
+  async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+    ttl = self.ttl if ttl is None else ttl
+    entry = {"value": value, "fresh_until": time.time() + ttl}
+    self.local.set(key, entry, ttl=ttl + self.stale_ttl)
+    if self.redis is not None:
+      try:
+        await self.redis.set(self._redis_key(key), json.dumps(entry), ex=int(ttl + self.stale_ttl))
+      except Exception as e:
+        logger.warning(f"Redis set failed for {self._redis_key(key)}: {e}")
+
+  async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+    """Fresh-or-stale values for the keys that are cached, with one Redis MGET for local misses."""
+    found: Dict[str, Any] = {}
+    remote_keys = []
+    for key in keys:
+      entry = self.local.get(key)
+      if entry is None:
+        remote_keys.append(key)
+      else:
+        found[key] = entry["value"]
+    if remote_keys and self.redis is not None:
+      try:
+        raw_values = await self.redis.mget([self._redis_key(key) for key in remote_keys])
+      except Exception as e:
+        logger.warning(f"Redis mget failed for {self.namespace}: {e}")
+        raw_values = []
+      for key, raw in zip(remote_keys, raw_values):
+        if not raw:
+          continue
+        try:
+          entry = json.loads(raw)
+          self.local.set(key, entry, ttl=max(entry["fresh_until"] + self.stale_ttl - time.time(), 1))
+        except (json.JSONDecodeError, KeyError, TypeError):
+          continue
+        self.redis_hits += 1
+        found[key] = entry["value"]
+    return found
+
+  async def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None):
+    ttl = self.ttl if ttl is None else ttl
+    fresh_until = time.time() + ttl
+    entries = {key: {"value": value, "fresh_until": fresh_until} for key, value in items.items()}
+    for key, entry in entries.items():
+      self.local.set(key, entry, ttl=ttl + self.stale_ttl)
+    if entries and self.redis is not None:
+      try:
+        async with self.redis.pipeline(transaction=False) as pipe:
+          for key, entry in entries.items():
+            pipe.set(self._redis_key(key), json.dumps(entry), ex=int(ttl + self.stale_ttl))
+          await pipe.execute()
+      except Exception as e:
+        logger.warning(f"Redis pipeline set failed for {self.namespace}: {e}")
+
+  async def delete(self, key: str):
+    self.local.delete(key)
+    if self.redis is not None:
+      try:
+        await self.redis.delete(self._redis_key(key))
+      except Exception as e:
+        logger.warning(f"Redis delete failed for {self._redis_key(key)}: {e}")
+
+  def stats(self) -> dict:
+    return {**self.local.stats(), "redis_hits": self.redis_hits}
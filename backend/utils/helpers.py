@@ -3,4 +3,22 @@ from typing import Generator, List, Any
 def chunk_list(lst: List[Any], chunk_size: int):
   """Chunk giant comment lists up so it's easier to batch to OpenAI"""
   for i in range(0, len(lst), chunk_size):
-    yield lst[i:i + chunk_size]
\ No newline at end of file
+    yield lst[i:i + chunk_size]
+
+def estimate_tokens(text: str) -> int:
+  """Rough token count (~4 characters per token for English text)"""
+  return len(text) // 4 + 1
+
+def chunk_by_token_budget(texts: List[str], max_tokens: int, max_items: int | None = None) -> Generator[List[int], None, None]:
+  """Group text indices so each group stays under a token budget (a single oversized text gets its own group)"""
+  chunk: List[int] = []
+  used = 0
+  for i, text in enumerate(texts):
+    tokens = estimate_tokens(text)
+    if chunk and (used + tokens > max_tokens or (max_items and len(chunk) >= max_items)):
+      yield chunk
+      chunk, used = [], 0
+    chunk.append(i)
+    used += tokens
+  if chunk:
+    yield chunk
\ No newline at end of file
@@ -0,0 +1,38 @@
+import asyncio
+import logging
+import random
+import sys
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+def is_retryable(error: Exception) -> bool:
+  """Rate limits, 5xx responses, timeouts and dropped connections are worth retrying."""
+  # our own errors say so themselves (e.g. a busy inference sidecar)
+  if getattr(error, "retryable", False):
+    return True
+  # if the SDK was never imported the error can't have come from it
+  openai = sys.modules.get("openai")
+  if openai is None:
+    return False
+  if isinstance(error, (openai.RateLimitError, openai.APIConnectionError)):
+    return True
+  return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+async def retry_with_jitter(func: Callable[..., Awaitable[Any]], *args, retries: int = 3,
+                            base_delay: float = 0.5, max_delay: float = 8.0, **kwargs) -> Any:
+  """
+  Await `func(*args, **kwargs)`, retrying retryable errors with full-jitter
+  exponential backoff. The last error is re-raised once retries run out.
+  """
+  attempt = 0
+  while True:
+    try:
+      return await func(*args, **kwargs)
+    except Exception as e:
+      if attempt >= retries or not is_retryable(e):
+        raise
+      delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+      attempt += 1
+      logger.warning(f"Retryable error ({e.__class__.__name__}), attempt {attempt}/{retries} in {delay:.2f}s")
+      await asyncio.sleep(delay)
@@ -0,0 +1,70 @@
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+@dataclass
+class StageTiming:
+  calls: int = 0
+  busy_seconds: float = 0.0
+  first_start: float | None = None
+  last_end: float = 0.0
+
+class StageTimings:
+  """
+  Per-request stage timings. A stage may run several times (e.g. once per
+  submission); offsets are relative to when the request started, so the
+  first_start/last_end window shows where each stage sits on the critical path.
+  `observer`, if given, also receives (stage, seconds) for every finished span.
+  """
+  def __init__(self, observer: Optional[Callable[[str, float], None]] = None):
+    self.started = time.perf_counter()
+    self.stages: Dict[str, StageTiming] = {}
+    self.observer = observer
+
+  def record(self, name: str, started: float, ended: float):
+    """Add a span given as absolute time.perf_counter() readings."""
+    start = started - self.started
+    end = ended - self.started
+    stage = self.stages.setdefault(name, StageTiming())
+    stage.calls += 1
+    stage.busy_seconds += end - start
+    stage.first_start = start if stage.first_start is None else min(stage.first_start, start)
+    stage.last_end = max(stage.last_end, end)
+
+  @asynccontextmanager
+  async def span(self, name: str):
+    started = time.perf_counter()
+    try:
+      yield
+    finally:
+      ended = time.perf_counter()
+      self.record(name, started, ended)
+      if self.observer is not None:
+        self.observer(name, ended - started)
+
+  async def run(self, name: str, awaitable: Awaitable[Any]) -> Any:
+    async with self.span(name):
+      return await awaitable
+
+  def summary(self) -> Dict[str, dict]:
+    return {
+      name: {
+        "calls": stage.calls,
+        "busy_ms": round(stage.busy_seconds * 1000, 1),
+        "start_ms": round((stage.first_start or 0.0) * 1000, 1),
+        "end_ms": round(stage.last_end * 1000, 1)
+      }
+      for name, stage in sorted(self.stages.items(), key=lambda item: item[1].first_start or 0.0)
+    }
+
+  def server_timing(self) -> str:
+    """The breakdown as a Server-Timing header value."""
+    return ", ".join(
+      f'{name};desc="{stage["calls"]} calls";dur={stage["busy_ms"]}'
+      for name, stage in self.summary().items()
+    )
+
+# timings of the request being handled, so nested calls (e.g. to external services) can add spans to it
+current_timings: ContextVar[Optional[StageTimings]] = ContextVar("current_timings", default=None)
@@ -0,0 +1,149 @@
+"""
+Background search worker. Runs queued search jobs in separate processes so the
+NER and sentiment stages never compete with the web tier for CPU.
+
+  python -m backend.worker
+"""
+import asyncio
+import multiprocessing
+
+from backend.core.config import Config
+from backend.core.logger import logger
+from backend.core.clients import create_redis_client, close_redis_client, create_reddit_client
+from backend.services.extractors import create_extractor
+from backend.services.gazetteer import BrandGazetteer
+from backend.services.job_queue import JobQueue
+from backend.services.product_catalogue import ProductCatalogue
+from backend.services.model_registry import create_model_registry
+from backend.services.openai_service import OpenAIService, create_openai_client
+from backend.services.reddit_scheduler import RedditScheduler
+from backend.services.reddit_service import RedditService
+from backend.services.search_cache import SearchResultCache
+from backend.services.sentiment_cache import SentimentCache
+from backend.services.subject_phrases import SubjectPhraseCache
+from backend.api.endpoints.search import SearchController
+
+async def keep_lease(job_queue: JobQueue, job_id: str):
+  while True:
+    await asyncio.sleep(job_queue.lease_timeout / 3)
+    try:
+      await job_queue.heartbeat(job_id)
+    except Exception as e:
+      logger.warning(f"Heartbeat for search job {job_id} failed: {e}")
+
+async def requeue_stale_jobs(job_queue: JobQueue):
+  # jobs of workers that crashed or were killed mid-run
+  while True:
+    try:
+      requeued = await job_queue.requeue_stale()
+      if requeued:
+        logger.info(f"Requeued {requeued} search jobs that lost their worker")
+    except Exception as e:
+      logger.warning(f"Checking for stale search jobs failed: {e}")
+    await asyncio.sleep(job_queue.lease_timeout / 2)
+
+async def run_job(job_queue: JobQueue, controller: SearchController, search_cache: SearchResultCache, job_id: str, search_request):
+  pending_updates = set()
+
+  def on_progress(message: str):
+    update = asyncio.create_task(job_queue.add_progress(job_id, message))
+    pending_updates.add(update)
+    update.add_done_callback(pending_updates.discard)
+
+  logger.info(f"Running search job {job_id}")
+  lease = asyncio.create_task(keep_lease(job_queue, job_id))
+  try:
+    # provisional rankings are only useful to streaming clients, so don't have them computed
+    result = await controller.execute_search(search_request, on_event=None, on_progress=on_progress)
+  except Exception as e:
+    logger.exception(f"Search job {job_id} failed")
+    await job_queue.fail(job_id, f"Internal Server Error: {e}")
+    return
+  finally:
+    lease.cancel()
+    await asyncio.gather(*pending_updates, return_exceptions=True)
+  await search_cache.set(search_request, result)
+  await job_queue.complete(job_id, result)
+  logger.info(f"Search job {job_id} completed")
+
+async def worker_loop():
+  redis_client = create_redis_client()
+  reddit_client = create_reddit_client()
+  openai_client = create_openai_client()
+  model_registry = create_model_registry()
+  await asyncio.to_thread(model_registry.warm)
+
+  db_engine = None
+  corpus = None
+  if Config.CORPUS_ENABLED:
+    # SQLAlchemy is only imported when the corpus is used
+    from backend.core.database import create_engine, create_session_factory, create_tables
+    from backend.services.corpus_service import CorpusService
+
+    db_engine = create_engine()
+    await create_tables(db_engine)
+    corpus = CorpusService(create_session_factory(db_engine))
+
+  reddit_service = RedditService(
+    redis_client,
+    client=reddit_client,
+    scheduler=RedditScheduler(reddit_client),
+    openai_client=openai_client,
+    extractor=create_extractor(Config.EXTRACTION_BACKEND, openai_client, model_registry, BrandGazetteer(redis_client)),
+    catalogue=ProductCatalogue(redis_client)
+  )
+  controller = SearchController(
+    reddit_service, OpenAIService(openai_client, SubjectPhraseCache(redis_client)), model_registry, corpus, SentimentCache(redis_client)
+  )
+  job_queue = JobQueue(redis_client)
+  search_cache = SearchResultCache(redis_client)
+  slots = asyncio.Semaphore(Config.JOB_WORKER_CONCURRENCY)
+  running = set()
+  recovery = asyncio.create_task(requeue_stale_jobs(job_queue))
+
+  logger.info(f"Search worker ready, running up to {Config.JOB_WORKER_CONCURRENCY} jobs at once")
+  try:
+    while True:
+      await slots.acquire()
+      job = await job_queue.next_job()
+      if job is None:
+        slots.release()
+        continue
+      task = asyncio.create_task(run_job(job_queue, controller, search_cache, *job))
+      running.add(task)
+      task.add_done_callback(lambda t: (running.discard(t), slots.release()))
+  finally:
+    recovery.cancel()
+    for task in running:
+      task.cancel()
+    await asyncio.gather(recovery, *running, return_exceptions=True)
+    model_registry.close()
+    await openai_client.close()
+    await reddit_client.close()
+    if db_engine is not None:
+      await db_engine.dispose()
+    await close_redis_client(redis_client)
+
+def run_worker_process():
+  try:
+    asyncio.run(worker_loop())
+  except KeyboardInterrupt:
+    pass
+
+def main():
+  processes = [
+    multiprocessing.Process(target=run_worker_process, name=f"search-worker-{i}")
+    for i in range(Config.JOB_WORKER_PROCESSES)
+  ]
+  for process in processes:
+    process.start()
+  try:
+    for process in processes:
+      process.join()
+  except KeyboardInterrupt:
+    logger.info("Stopping search workers")
+    for process in processes:
+      process.join()
+
+if __name__ == "__main__":
+  main()